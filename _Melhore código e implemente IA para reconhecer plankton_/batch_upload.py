@@ -0,0 +1,161 @@
+"""
+Leitura incremental dos envios de /predict_batch e /jobs: multipart com vários
+arquivos, um arquivo .zip/.tar com as imagens ou uma lista de caminhos locais.
+
+O corpo da requisição é primeiro copiado para um único arquivo temporário (o
+cliente termina de enviar antes de a resposta começar, e a memória não cresce
+com o tamanho do envio). Depois as imagens são lidas uma a uma desse arquivo:
+o multipart com o decodificador incremental do Werkzeug e os arquivos
+compactados com zipfile/tarfile, de modo que só a imagem em processamento fica
+em memória. Cada item é (nome, bytes, erro), com bytes None quando o item não
+pode ser classificado; um item com problema não interrompe os demais.
+"""
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+
+CHUNK_SIZE = 1024 * 1024
+
+ARCHIVE_SUFFIXES = {".zip": "zip", ".tar": "tar", ".tgz": "tar", ".tar.gz": "tar", ".tar.bz2": "tar", ".tar.xz": "tar"}
+ARCHIVE_CONTENT_TYPES = {
+    "application/zip": "zip",
+    "application/x-zip-compressed": "zip",
+    "application/x-tar": "tar",
+    "application/gzip": "tar",
+    "application/x-gzip": "tar",
+    "application/x-gtar": "tar",
+}
+
+
+def archive_kind(filename):
+    """'zip' ou 'tar' pela extensão do nome; None se não for um arquivo compactado."""
+    name = (filename or "").lower()
+    for suffix, kind in ARCHIVE_SUFFIXES.items():
+        if name.endswith(suffix):
+            return kind
+    return None
+
+
+def spool_stream(stream, chunk_size=CHUNK_SIZE):
+    """Copia o corpo da requisição para um arquivo temporário e o retorna posicionado no início."""
+    body = tempfile.TemporaryFile()
+    shutil.copyfileobj(stream, body, chunk_size)
+    body.seek(0)
+    return body
+
+
+def _too_large(filename, size, max_file_size):
+    return (filename, None, f"Arquivo muito grande: {size / 1024 / 1024:.1f}MB "
+                            f"(máximo: {max_file_size / 1024 / 1024:.1f}MB)")
+
+
+def _ignored(name):
+    """Diretórios e metadados de compactadores (resource forks do macOS)."""
+    base = os.path.basename(name.rstrip("/"))
+    return not base or base.startswith("._") or name.startswith("__MACOSX/")
+
+
+def iter_archive(fileobj, kind, max_file_size):
+    """Itens de um arquivo .zip ou .tar (lidos sob demanda).
+
+    Raises:
+        ValueError: Se o arquivo compactado estiver corrompido
+    """
+    try:
+        if kind == "zip":
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or _ignored(info.filename):
+                        continue
+                    if info.file_size > max_file_size:
+                        yield _too_large(info.filename, info.file_size, max_file_size)
+                        continue
+                    with archive.open(info) as member:
+                        yield info.filename, member.read(max_file_size + 1), None
+        else:
+            # Modo de fluxo: os membros são lidos em ordem, sem manter o índice do arquivo
+            with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                for member in archive:
+                    if not member.isfile() or _ignored(member.name):
+                        continue
+                    if member.size > max_file_size:
+                        yield _too_large(member.name, member.size, max_file_size)
+                        continue
+                    yield member.name, archive.extractfile(member).read(), None
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+        raise ValueError(f"Arquivo compactado inválido: {str(e)}")
+
+
+def iter_paths(paths, max_file_size):
+    """Itens de uma lista de arquivos locais (manifesto de /jobs), lidos um por vez."""
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+            if size > max_file_size:
+                yield _too_large(path, size, max_file_size)
+                continue
+            with open(path, "rb") as f:
+                yield path, f.read(), None
+        except OSError as e:
+            yield path, None, f"Não foi possível ler o arquivo: {e.strerror or str(e)}"
+
+
+def list_images(directory, extensions):
+    """Arquivos com as extensões dadas sob directory (recursivo, em ordem alfabética)."""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        found.extend(os.path.join(root, name) for name in sorted(files)
+                     if not _ignored(name) and name.rsplit(".", 1)[-1].lower() in extensions)
+    return found
+
+
+def iter_multipart(fileobj, boundary, max_file_size, chunk_size=CHUNK_SIZE):
+    """Itens dos arquivos de um corpo multipart/form-data, na ordem do envio.
+
+    Arquivos .zip/.tar entre as partes são abertos e seus membros viram itens.
+    Campos de formulário são ignorados.
+
+    Raises:
+        ValueError: Se o corpo multipart estiver malformado ou truncado
+    """
+    decoder = MultipartDecoder(boundary.encode("latin-1"))
+    filename = buffer = kind = None
+    size = 0
+    while True:
+        event = decoder.next_event()
+        if isinstance(event, NeedData):
+            decoder.receive_data(fileobj.read(chunk_size) or None)
+        elif isinstance(event, File):
+            filename, kind, size = event.filename or event.name, archive_kind(event.filename), 0
+            # Arquivos compactados vão para o disco; imagens ficam em memória, uma por vez
+            buffer = tempfile.TemporaryFile() if kind else io.BytesIO()
+        elif isinstance(event, Data):
+            if buffer is None:
+                continue  # dados de um campo de formulário
+            size += len(event.data)
+            if kind or size <= max_file_size:
+                buffer.write(event.data)
+            if event.more_data:
+                continue
+            if kind:
+                buffer.seek(0)
+                try:
+                    yield from iter_archive(buffer, kind, max_file_size)
+                finally:
+                    buffer.close()
+            elif size > max_file_size:
+                yield _too_large(filename, size, max_file_size)
+            else:
+                yield filename, buffer.getvalue(), None
+            buffer = None
+        elif isinstance(event, Epilogue):
+            return
+        else:
+            buffer = None  # Field: o próximo Data pertence a um campo
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos backends de imagem (PIL x OpenCV).
+
+Mede a latência de decodificação + redimensionamento para 224x224 por formato
+(JPEG/PNG/TIFF/BMP) e por tamanho de imagem, para escolher o backend mais rápido
+em cada instalação (variável PLANKTON_IMAGE_BACKEND do servidor).
+
+Uso:
+    python benchmark_backends.py
+    python benchmark_backends.py --repeat 20 --no-fast-decode
+"""
+
+import argparse
+import io
+import statistics
+import time
+
+from benchmark_decode import synthetic_image
+from plankton_ai import IMAGE_BACKENDS, OPENCV_AVAILABLE, get_image_backend
+
+FORMATS = ["JPEG", "PNG", "TIFF", "BMP"]
+SIZES = [(640, 480), (1600, 1200), (4000, 3000)]
+MODEL_INPUT = (224, 224)
+
+
+def encode(img, fmt):
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def measure(backend, image_data, repeat, fast_decode):
+    """Mediana (ms) de decodificação + redimensionamento a partir dos bytes."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        array, error_msg = backend.load(image_data, MODEL_INPUT, fast_decode)
+        timings.append((time.perf_counter() - start) * 1000)
+        if array is None:
+            raise ValueError(error_msg)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de imagem PIL e OpenCV")
+    parser.add_argument("--repeat", type=int, default=10, help="Repetições por combinação")
+    parser.add_argument("--no-fast-decode", action="store_true", help="Desativa a decodificação em escala reduzida")
+    args = parser.parse_args()
+
+    if not OPENCV_AVAILABLE:
+        print("⚠️ OpenCV não está instalado; apenas o backend PIL será medido.")
+    backends = [get_image_backend(name) for name in IMAGE_BACKENDS
+                if name != "opencv" or OPENCV_AVAILABLE]
+    fast_decode = not args.no_fast_decode
+
+    header = f"{'Formato':<8} {'Tamanho':<11}" + "".join(f"{b.name + ' (ms)':>14}" for b in backends)
+    print(header + f"{'Mais rápido':>14}")
+    print("-" * (len(header) + 14))
+
+    wins = {b.name: 0 for b in backends}
+    for width, height in SIZES:
+        img = synthetic_image(width, height, seed=width)
+        for fmt in FORMATS:
+            image_data = encode(img, fmt)
+            timings = {b.name: measure(b, image_data, args.repeat, fast_decode) for b in backends}
+            fastest = min(timings, key=timings.get)
+            wins[fastest] += 1
+            print(f"{fmt:<8} {f'{width}x{height}':<11}"
+                  + "".join(f"{timings[b.name]:>14.2f}" for b in backends) + f"{fastest:>14}")
+
+    print("-" * (len(header) + 14))
+    print("Vitórias por backend: " + ", ".join(f"{name}: {count}" for name, count in wins.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark da decodificação em resolução reduzida (JPEG draft / reduce).
+
+Compara, para cada imagem, o caminho completo (decodifica tudo e só então
+redimensiona para 224x224) com o caminho rápido do classificador, medindo o
+tempo de decodificação + pré-processamento e a deriva nas probabilidades.
+
+Uso:
+    python benchmark_decode.py                      # imagens sintéticas
+    python benchmark_decode.py --images-dir amostras --repeat 10
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from plankton_ai import PlanktonClassifierPyTorch
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.gif', '.webp')
+SYNTHETIC_SIZES = [(640, 480), (1000, 1000), (2000, 1500), (4000, 3000), (4000, 4000)]
+
+
+def synthetic_image(width, height, seed):
+    """Gera uma imagem suave com ruído, parecida com um quadro de câmera de plâncton."""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (height // 64 + 2, width // 64 + 2, 3), dtype=np.uint8)
+    img = Image.fromarray(coarse).resize((width, height), Image.BICUBIC)
+    noise = rng.normal(0, 6, (height, width, 3))
+    return Image.fromarray(np.clip(np.asarray(img) + noise, 0, 255).astype(np.uint8))
+
+
+def load_images(images_dir):
+    """Retorna uma lista de (nome, bytes) a partir de um diretório ou de imagens sintéticas."""
+    images = []
+    if images_dir:
+        for name in sorted(os.listdir(images_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(images_dir, name), 'rb') as f:
+                    images.append((name, f.read()))
+        return images
+
+    for i, (width, height) in enumerate(SYNTHETIC_SIZES):
+        img = synthetic_image(width, height, seed=i)
+        for fmt in ('JPEG', 'PNG'):
+            buffer = io.BytesIO()
+            img.save(buffer, format=fmt, quality=90)
+            images.append((f"sintetica_{width}x{height}.{fmt.lower()}", buffer.getvalue()))
+    return images
+
+
+def time_preprocess(classifier, image_data, repeat):
+    """Mediana (ms) do tempo de decodificação + pré-processamento, e o último tensor."""
+    timings = []
+    tensor = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tensor, error_msg = classifier.preprocess_input(image_data)
+        timings.append((time.perf_counter() - start) * 1000)
+        if tensor is None:
+            raise ValueError(error_msg)
+    return statistics.median(timings), tensor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da decodificação em resolução reduzida")
+    parser.add_argument("--images-dir", help="Diretório com imagens reais (padrão: imagens sintéticas)")
+    parser.add_argument("--model", help="Checkpoint do modelo (.pth)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetições por imagem")
+    args = parser.parse_args()
+
+    classifier = PlanktonClassifierPyTorch(model_path=args.model)
+    images = load_images(args.images_dir)
+    if not images:
+        print("Nenhuma imagem encontrada.")
+        return
+
+    print(f"{'Imagem':<32} {'Completo (ms)':>14} {'Reduzido (ms)':>14} {'Ganho':>7} "
+          f"{'Dif. entrada':>13} {'Deriva máx.':>12} {'Top-1':>6}")
+    print("-" * 104)
+
+    speedups = []
+    drifts = []
+    agreements = 0
+    for name, image_data in images:
+        classifier.fast_decode = False
+        full_ms, full_tensor = time_preprocess(classifier, image_data, args.repeat)
+        classifier.fast_decode = True
+        fast_ms, fast_tensor = time_preprocess(classifier, image_data, args.repeat)
+
+        full_result, fast_result = classifier.predict_tensors([full_tensor, fast_tensor])
+        drift = max(abs(full_result["all_predictions"][c] - fast_result["all_predictions"][c])
+                    for c in classifier.class_names)
+        same_top1 = full_result["predicted_class"] == fast_result["predicted_class"]
+        input_diff = float((full_tensor - fast_tensor).abs().mean())
+
+        speedups.append(full_ms / fast_ms if fast_ms else 0.0)
+        drifts.append(drift)
+        agreements += int(same_top1)
+        print(f"{name:<32} {full_ms:>14.2f} {fast_ms:>14.2f} {speedups[-1]:>6.1f}x "
+              f"{input_diff:>13.5f} {drift:>12.5f} {'ok' if same_top1 else 'DIF':>6}")
+
+    print("-" * 104)
+    print(f"Ganho médio: {statistics.mean(speedups):.1f}x | Deriva máxima de probabilidade: {max(drifts):.5f} | "
+          f"Concordância top-1: {agreements}/{len(images)}")
+
+
+if __name__ == "__main__":
+    main()
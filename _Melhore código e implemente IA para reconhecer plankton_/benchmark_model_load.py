@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Compara o tempo de carga do checkpoint eager: caminho antigo x caminho atual.
+
+- imagenet: monta o MobileNetV2 com os pesos ImageNet (lidos do cache do torch
+  hub ou baixados), troca a camada final e sobrescreve tudo com load_state_dict
+  (o que load_model fazia antes).
+- meta: monta a arquitetura no dispositivo meta, sem alocar nem inicializar
+  pesos, e atribui os tensores do checkpoint (load_state_dict(assign=True)).
+- meta+mmap: igual, com o checkpoint mapeado em memória (torch.load(mmap=True)),
+  o caminho usado por PlanktonClassifierPyTorch.load_model.
+
+Um pacote .safetensors é sempre mapeado em memória (model_bundle.load_bundle):
+com ele, meta e meta+mmap medem o mesmo caminho.
+
+Cada medição roda em um processo novo, com o torch já importado antes do
+cronômetro. Informa a mediana da montagem do grafo, da carga dos pesos, do total
+e o pico de memória residente (RSS) do processo.
+
+Uso:
+    python benchmark_model_load.py
+    python benchmark_model_load.py --checkpoint models/plankton_model.safetensors --runs 7
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import model_bundle
+
+# Executado em um processo novo para cada medição
+LOAD_SCRIPT = """
+import json, resource, sys, time
+import torch
+import torch.nn as nn
+from torchvision import models
+import model_bundle
+
+checkpoint, method = sys.argv[1], sys.argv[2]
+
+def load_weights(mmap=False):
+    if model_bundle.is_bundle(checkpoint):
+        return model_bundle.load_bundle(checkpoint)[0]
+    return torch.load(checkpoint, map_location='cpu', weights_only=True, mmap=mmap)
+
+start = time.perf_counter()
+if method == 'imagenet':
+    model = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.IMAGENET1K_V1)
+    model.classifier[1] = nn.Linear(model.classifier[1].in_features, int(sys.argv[3]))
+    built = time.perf_counter()
+    model.load_state_dict(load_weights())
+else:
+    with torch.device('meta'):
+        model = models.mobilenet_v2(weights=None, num_classes=int(sys.argv[3]))
+    built = time.perf_counter()
+    state_dict = load_weights(mmap=method == 'meta+mmap')
+    model.load_state_dict(state_dict, assign=True)
+model.eval()
+loaded = time.perf_counter()
+print(json.dumps({'graph_build': built - start, 'weight_load': loaded - built, 'total': loaded - start,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+METHODS = ("imagenet", "meta", "meta+mmap")
+
+
+def read_num_classes(checkpoint):
+    """Número de classes dos metadados do pacote ou de <nome>_info.json (10 se não houver)."""
+    try:
+        if model_bundle.is_bundle(checkpoint):
+            return len(model_bundle.read_metadata(checkpoint)["classes"])
+        with open(os.path.splitext(checkpoint)[0] + "_info.json", encoding="utf-8") as f:
+            return int(json.load(f)["num_classes"])
+    except (OSError, ValueError, KeyError):
+        return 10
+
+
+def measure(checkpoint, method, num_classes, runs):
+    """Medianas de cada métrica em processos novos; None se o método falhar (ex.: sem rede)."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", LOAD_SCRIPT, checkpoint, method, str(num_classes)],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if output.returncode != 0:
+            print(f"⚠️ {method} falhou: {output.stderr.strip().splitlines()[-1] if output.stderr else '?'}")
+            return None
+        samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o tempo de carga do checkpoint eager")
+    parser.add_argument("--checkpoint", default=model_bundle.default_model_path(),
+                        help="Checkpoint float (.pth) ou pacote (.safetensors)")
+    parser.add_argument("--runs", type=int, default=5, help="Processos novos por método")
+    args = parser.parse_args()
+
+    num_classes = read_num_classes(args.checkpoint)
+    print(f"Checkpoint: {args.checkpoint} ({num_classes} classes) | {args.runs} processos por método")
+    print(f"{'Método':<11} {'Grafo (ms)':>11} {'Pesos (ms)':>11} {'Total (ms)':>11} {'Pico RSS (MB)':>14}")
+    print("-" * 62)
+    results = {}
+    for method in METHODS:
+        data = measure(args.checkpoint, method, num_classes, args.runs)
+        if data is None:
+            continue
+        results[method] = data
+        print(f"{method:<11} {data['graph_build'] * 1000:>11.1f} {data['weight_load'] * 1000:>11.1f} "
+              f"{data['total'] * 1000:>11.1f} {data['peak_rss_mb']:>14.0f}")
+
+    if "imagenet" in results and "meta+mmap" in results:
+        speedup = results["imagenet"]["total"] / results["meta+mmap"]["total"]
+        print(f"\nmeta+mmap carrega {speedup:.1f}x mais rápido que o caminho com pesos ImageNet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compara N modelos separados com N cabeças sobre um único backbone (multi_head.py).
+
+Cria N pacotes que diferem só na camada final (mesmo backbone do modelo base) e
+mede, para cada N, o tempo por lote e a memória dos pesos:
+
+- separados: N classificadores completos, um forward de cada por lote
+- cabeças: um backbone e as N camadas finais concatenadas, um forward por lote
+
+Uso:
+    python benchmark_multi_head.py
+    python benchmark_multi_head.py --model models/plankton_model.safetensors --heads 1 2 4 8 --batch-size 8
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+import model_bundle
+from multi_head import MultiHeadClassifier
+from plankton_ai import PlanktonClassifierPyTorch
+
+
+def write_heads(base_path, count, output_dir):
+    """Grava count pacotes com o backbone de base_path e camadas finais aleatórias."""
+    state_dict, metadata = model_bundle.load_model_file(base_path)
+    generator = torch.Generator().manual_seed(0)
+    paths = {}
+    for i in range(count):
+        num_classes = 5 + i % 6
+        heads = dict(state_dict)
+        heads["classifier.1.weight"] = torch.randn(num_classes, 1280, generator=generator) * 0.05
+        heads["classifier.1.bias"] = torch.zeros(num_classes)
+        paths[f"cabeca_{i}"] = os.path.join(output_dir, f"cabeca_{i}.safetensors")
+        model_bundle.save_bundle(heads, paths[f"cabeca_{i}"], [f"classe_{j}" for j in range(num_classes)],
+                                 metadata["input_shape"])
+    return paths
+
+
+def time_batches(predict, tensors, runs):
+    predict(tensors)  # aquecimento
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict(tensors)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara N modelos separados com N cabeças sobre um backbone")
+    parser.add_argument("--model", default=model_bundle.default_model_path(), help="Modelo base (pacote ou .pth)")
+    parser.add_argument("--heads", type=int, nargs="+", default=[1, 2, 4, 8], help="Números de modelos comparados")
+    parser.add_argument("--batch-size", type=int, default=8, help="Imagens por lote")
+    parser.add_argument("--runs", type=int, default=10, help="Lotes medidos por configuração")
+    parser.add_argument("--threads", type=int, default=None, help="Threads do PyTorch")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Um pacote base com o mesmo layout das cabeças (o .pth legado é convertido)
+        base_path = os.path.join(tmp_dir, "base.safetensors")
+        state_dict, metadata = model_bundle.load_model_file(args.model)
+        model_bundle.save_bundle(state_dict, base_path, metadata["classes"], metadata["input_shape"])
+        paths = write_heads(base_path, max(args.heads), tmp_dir)
+
+        base = PlanktonClassifierPyTorch(model_path=base_path, input_mode="uint8", cache_max_bytes=0)
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 256, (*base.img_size, 3), dtype=np.uint8) for _ in range(args.batch_size)]
+        tensors = [base.preprocess_input(image)[0] for image in images]
+
+        print(f"Modelo base: {args.model} | lote de {args.batch_size} imagens | {torch.get_num_threads()} threads")
+        print(f"{'Modelos':>7} {'Separados (ms)':>15} {'Cabeças (ms)':>13} {'Ganho':>7} "
+              f"{'Pesos separados (MB)':>21} {'Pesos cabeças (MB)':>19}")
+        print("-" * 89)
+        for count in args.heads:
+            model_ids = list(paths)[:count]
+            separate = [PlanktonClassifierPyTorch(model_path=paths[model_id], input_mode="uint8", cache_max_bytes=0)
+                        for model_id in model_ids]
+            multi = MultiHeadClassifier(base)
+            for model_id in model_ids:
+                multi.add_head(model_id, paths[model_id])
+
+            separate_time = time_batches(lambda batch: [c.predict_tensors(batch) for c in separate], tensors, args.runs)
+            multi_time = time_batches(multi.predict_tensors, tensors, args.runs)
+            separate_bytes = sum(c.memory_bytes() for c in separate)
+            multi_bytes = base.memory_bytes() + multi.get_stats()["head_bytes"]
+            print(f"{count:>7} {separate_time * 1000:>15.1f} {multi_time * 1000:>13.1f} "
+                  f"{separate_time / multi_time:>6.1f}x {separate_bytes / 1024 / 1024:>21.1f} "
+                  f"{multi_bytes / 1024 / 1024:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Relatório do modelo int8 contra o modelo float.
+
+Precisão: concordância top-1 e diferença de probabilidades entre os dois modelos
+e, quando as imagens estão organizadas em subdiretórios com o nome da classe,
+a acurácia de cada um. Desempenho: latência por lote e vazão (imagens/s) para
+vários tamanhos de lote, para decidir por local se o modo quantizado compensa.
+
+Uso:
+    python benchmark_quantization.py --images-dir amostras
+    python benchmark_quantization.py --checkpoint models/plankton_model.safetensors --batch-sizes 1,8,32
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import torch
+
+import model_bundle
+import model_quantization
+from benchmark_decode import synthetic_image
+from quantize_model import MODEL_INPUT, find_images, load_class_names, normalized_batches
+
+
+def predict_all(model, batches):
+    with torch.inference_mode():
+        return torch.cat([torch.softmax(model(batch), dim=1) for batch in batches])
+
+
+def accuracy_report(float_model, int8_model, sources, labels, class_names):
+    batches = list(normalized_batches(sources, batch_size=16))
+    float_probs = predict_all(float_model, batches)
+    int8_probs = predict_all(int8_model, batches)
+
+    float_top1 = float_probs.argmax(dim=1)
+    int8_top1 = int8_probs.argmax(dim=1)
+    diff = (float_probs - int8_probs).abs()
+
+    print(f"\n=== Precisão ({len(float_probs)} imagens) ===")
+    print(f"Concordância top-1 int8 x float: {(float_top1 == int8_top1).float().mean().item() * 100:.1f}%")
+    print(f"Diferença de probabilidade: média {diff.mean().item():.5f} | máxima {diff.max().item():.5f}")
+
+    known = [(i, class_names.index(label)) for i, label in enumerate(labels) if label in class_names]
+    if known:
+        positions = torch.tensor([i for i, _ in known])
+        targets = torch.tensor([c for _, c in known])
+        float_acc = (float_top1[positions] == targets).float().mean().item() * 100
+        int8_acc = (int8_top1[positions] == targets).float().mean().item() * 100
+        print(f"Acurácia ({len(known)} imagens rotuladas): float {float_acc:.1f}% | int8 {int8_acc:.1f}% "
+              f"| variação {int8_acc - float_acc:+.1f} p.p.")
+    else:
+        print("Sem rótulos (use subdiretórios com o nome das classes para medir a acurácia)")
+
+
+def measure(model, batch, repeat):
+    """Mediana (ms) de um forward sobre o lote, após um aquecimento."""
+    with torch.inference_mode():
+        model(batch)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def latency_report(float_model, int8_model, batch_sizes, repeat):
+    print("\n=== Latência e vazão ===")
+    print(f"{'Lote':>5} {'float (ms)':>11} {'int8 (ms)':>10} {'float img/s':>12} {'int8 img/s':>11} {'Ganho':>7}")
+    print("-" * 61)
+    for batch_size in batch_sizes:
+        batch = torch.randn(batch_size, 3, *MODEL_INPUT)
+        float_ms = measure(float_model, batch, repeat)
+        int8_ms = measure(int8_model, batch, repeat)
+        print(f"{batch_size:>5} {float_ms:>11.2f} {int8_ms:>10.2f} {batch_size * 1000 / float_ms:>12.1f} "
+              f"{batch_size * 1000 / int8_ms:>11.1f} {float_ms / int8_ms:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o modelo int8 com o modelo float")
+    parser.add_argument("--checkpoint", default=model_bundle.default_model_path(),
+                        help="Checkpoint float (.pth) ou pacote (.safetensors)")
+    parser.add_argument("--quantized", help="Artefato int8 (padrão: <checkpoint>_int8.pt)")
+    parser.add_argument("--images-dir", help="Imagens de avaliação (padrão: imagens sintéticas)")
+    parser.add_argument("--max-images", type=int, default=500, help="Máximo de imagens de avaliação")
+    parser.add_argument("--batch-sizes", default="1,4,8,16,32", help="Tamanhos de lote, separados por vírgula")
+    parser.add_argument("--repeat", type=int, default=10, help="Repetições por tamanho de lote")
+    args = parser.parse_args()
+
+    quantized_path = args.quantized or model_quantization.quantized_model_path(args.checkpoint)
+    for path in (args.checkpoint, quantized_path):
+        if not os.path.exists(path):
+            parser.error(f"Arquivo não encontrado: {path}")
+
+    float_model = model_quantization.load_float_checkpoint(args.checkpoint)
+    int8_model, metadata = model_quantization.load_quantized_model(quantized_path)
+    class_names = metadata.get("classes") or load_class_names(args.checkpoint, float_model.classifier[1].out_features)
+    print(f"Modelo int8: {quantized_path} (engine: {metadata.get('engine')}, "
+          f"calibração: {metadata.get('calibration_images')} imagens)")
+    print(f"Threads de CPU: {torch.get_num_threads()}")
+
+    if args.images_dir:
+        sources = find_images(args.images_dir, args.max_images)
+        labels = [os.path.basename(os.path.dirname(path)) for path in sources]
+    else:
+        sources = [synthetic_image(640, 480, seed=i) for i in range(32)]
+        labels = [None] * len(sources)
+
+    accuracy_report(float_model, int8_model, sources, labels, class_names)
+    latency_report(float_model, int8_model, [int(b) for b in args.batch_sizes.split(",")], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
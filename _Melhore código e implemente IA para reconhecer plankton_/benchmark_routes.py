@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compara as três rotas de predição: bytes enviados e CPU do servidor por requisição.
+
+- /predict: multipart/form-data com o arquivo
+- /predict_base64: JSON com a imagem em base64 (33% maior)
+- /predict_raw: os bytes da imagem no corpo (application/octet-stream)
+
+O servidor roda neste processo (cliente de teste do Flask, sem rede) com o cache
+de predições desativado. Os corpos das requisições são montados antes da medição,
+de modo que o tempo de CPU do processo (todas as threads, inclusive a de
+inferência) é o custo do servidor: leitura do corpo, multipart/JSON/base64,
+validação, decodificação e forward. O forward é o mesmo nas três rotas; a coluna
+"Δ vs raw" isola o custo do transporte.
+
+Uso:
+    python benchmark_routes.py
+    python benchmark_routes.py --image minha_imagem.jpg --requests 100
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+# Cache desativado: a mesma imagem reenviada não pode vir do cache
+os.environ["PLANKTON_CACHE_MAX_MB"] = "0"
+os.environ.setdefault("PLANKTON_WARMUP_BATCH_SIZES", "1")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_image(width, height):
+    """JPEG com gradiente e ruído, com tamanho de arquivo próximo ao de uma ROI real."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    pixels = np.clip(pixels + rng.normal(0, 20, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def build_requests(image_data, filename):
+    """(rota, Content-Type, corpo) de cada rota para a mesma imagem."""
+    from werkzeug.datastructures import FileStorage
+    from werkzeug.test import encode_multipart
+
+    boundary, multipart = encode_multipart({"file": FileStorage(io.BytesIO(image_data), filename=filename,
+                                                                content_type="image/jpeg")})
+    payload = json.dumps({"image": base64.b64encode(image_data).decode("ascii")}).encode("utf-8")
+    return [
+        ("/predict", f"multipart/form-data; boundary={boundary}", multipart),
+        ("/predict_base64", "application/json", payload),
+        ("/predict_raw", "application/octet-stream", image_data),
+    ]
+
+
+def measure(client, route, content_type, body, requests):
+    """CPU do processo e tempo de parede por requisição (segundos)."""
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        response = client.post(route, data=body, content_type=content_type)
+        if response.status_code != 200:
+            raise RuntimeError(f"{route} respondeu {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return (time.process_time() - cpu_start) / requests, (time.perf_counter() - wall_start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara bytes e CPU por requisição entre as rotas de predição")
+    parser.add_argument("--image", help="Imagem enviada (padrão: JPEG sintético)")
+    parser.add_argument("--size", default="1024x768", help="Dimensões do JPEG sintético (LxA)")
+    parser.add_argument("--requests", type=int, default=50, help="Requisições por rota em cada rodada")
+    parser.add_argument("--rounds", type=int, default=3, help="Rodadas alternando as rotas (mediana)")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_data = f.read()
+        filename = os.path.basename(args.image)
+    else:
+        width, height = (int(value) for value in args.size.lower().split("x"))
+        image_data, filename = synthetic_image(width, height), "roi.jpg"
+
+    import flask_server
+    if not flask_server.MODEL_LOADER.wait(600) or not flask_server.MODEL_LOADER.ready:
+        print("❌ O modelo não carregou; veja logs/flask_server.log")
+        return
+    client = flask_server.app.test_client()
+
+    requests_by_route = build_requests(image_data, filename)
+    for route, content_type, body in requests_by_route:
+        measure(client, route, content_type, body, 3)  # aquecimento da rota
+
+    samples = {route: [] for route, _, _ in requests_by_route}
+    for _ in range(args.rounds):
+        for route, content_type, body in requests_by_route:
+            samples[route].append(measure(client, route, content_type, body, args.requests))
+
+    print(f"Imagem: {filename} ({len(image_data) / 1024:.1f}KB) | {args.rounds} x {args.requests} requisições por rota")
+    print(f"{'Rota':<16} {'Corpo (KB)':>11} {'vs imagem':>10} {'CPU/req (ms)':>13} {'Δ vs raw':>10} {'Parede (ms)':>12}")
+    print("-" * 76)
+    cpu = {route: statistics.median(cpu for cpu, _ in values) for route, values in samples.items()}
+    for route, _, body in requests_by_route:
+        wall = statistics.median(wall for _, wall in samples[route])
+        overhead = (len(body) / len(image_data) - 1) * 100
+        print(f"{route:<16} {len(body) / 1024:>11.1f} {overhead:>+9.1f}% {cpu[route] * 1000:>13.2f} "
+              f"{(cpu[route] - cpu['/predict_raw']) * 1000:>+10.2f} {wall * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
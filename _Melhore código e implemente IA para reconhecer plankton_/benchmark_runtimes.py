@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos formatos de execução do modelo: eager, TorchScript e onnxruntime.
+
+Mede o tempo de início (processo novo: importação + carga do modelo até a
+primeira predição), que pesa quando o launcher reinicia workers, e a latência por
+lote para vários tamanhos de lote. Com o onnxruntime o processo não importa o
+PyTorch.
+
+Uso:
+    python export_model.py                  # gera models/plankton_model_torchscript.pt
+    python export_model.py --format onnx    # gera models/plankton_model.onnx
+    python benchmark_runtimes.py
+    python benchmark_runtimes.py --checkpoint models/plankton_model.safetensors --batch-sizes 1,8,32
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import torch
+
+import model_bundle
+import model_export
+from onnx_backend import ONNXRUNTIME_AVAILABLE, onnx_model_path
+from plankton_ai import INPUT_MODES, PlanktonClassifierPyTorch
+
+# Executado em um processo novo para medir o início a frio
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import numpy as np
+from plankton_ai import PlanktonClassifierPyTorch
+imported = time.perf_counter()
+classifier = PlanktonClassifierPyTorch(model_path=sys.argv[1], input_mode=sys.argv[2],
+                                       prefer_torchscript=sys.argv[3] == '1', inference_backend=sys.argv[4],
+                                       cache_max_bytes=0)
+loaded = time.perf_counter()
+sample, _ = classifier.preprocess_input(np.zeros((*classifier.img_size, 3), dtype=np.uint8))
+classifier.predict_tensors([sample])
+first = time.perf_counter()
+print(json.dumps({'format': classifier.get_model_info()['model_format'], 'import': imported - start,
+                  'load': loaded - imported, 'first_prediction': first - loaded}))
+"""
+
+# (rótulo, prefer_torchscript, backend de inferência)
+RUNTIMES = [("eager", False, "pytorch"), ("torchscript", True, "pytorch"), ("onnxruntime", False, "onnxruntime")]
+
+
+def measure_startup(checkpoint, input_mode, prefer_torchscript, inference_backend, runs):
+    """Medianas (s) de importação, carga e primeira predição em processos novos."""
+    samples = []
+    model_format = None
+    env = dict(os.environ, PLANKTON_INFERENCE_BACKEND=inference_backend)
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, checkpoint, input_mode, "1" if prefer_torchscript else "0",
+             inference_backend],
+            capture_output=True, text=True, check=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        total = time.perf_counter() - start
+        data = json.loads(output.stdout.strip().splitlines()[-1])
+        model_format = data.pop("format")
+        samples.append(dict(data, total=total))
+    return model_format, {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def measure_latency(classifier, batch_size, repeat):
+    """Mediana (ms) de um forward sobre um lote, após um aquecimento."""
+    sample, _ = classifier.preprocess_input(np.zeros((*classifier.img_size, 3), dtype=np.uint8))
+    if classifier.model_format == "onnx":
+        batch = np.stack([sample] * batch_size)
+    else:
+        batch = torch.stack([sample] * batch_size)
+
+    timings = []
+    with torch.inference_mode():
+        classifier.model(batch)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            classifier.model(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os formatos de execução do modelo")
+    parser.add_argument("--checkpoint", default=model_bundle.default_model_path(),
+                        help="Checkpoint float (.pth) ou pacote (.safetensors)")
+    parser.add_argument("--input-mode", choices=INPUT_MODES, default="uint8", help="Modo de entrada")
+    parser.add_argument("--batch-sizes", default="1,4,8,16,32", help="Tamanhos de lote, separados por vírgula")
+    parser.add_argument("--repeat", type=int, default=10, help="Repetições por tamanho de lote")
+    parser.add_argument("--startup-runs", type=int, default=3, help="Processos novos por formato")
+    args = parser.parse_args()
+
+    runtimes = [RUNTIMES[0]]
+    if os.path.exists(model_export.torchscript_path(args.checkpoint)):
+        runtimes.append(RUNTIMES[1])
+    else:
+        print(f"⚠️ Sem artefato TorchScript (python export_model.py --checkpoint {args.checkpoint})")
+    if ONNXRUNTIME_AVAILABLE and os.path.exists(onnx_model_path(args.checkpoint)):
+        runtimes.append(RUNTIMES[2])
+    else:
+        print(f"⚠️ Sem modelo ONNX ou onnxruntime (python export_model.py --format onnx --checkpoint {args.checkpoint})")
+
+    print("=== Início a frio (mediana, segundos) ===")
+    print(f"{'Formato':<12} {'Importação':>11} {'Carga':>8} {'1ª predição':>12} {'Processo':>9}")
+    print("-" * 56)
+    for label, prefer, backend in runtimes:
+        model_format, times = measure_startup(args.checkpoint, args.input_mode, prefer, backend, args.startup_runs)
+        if model_format == "eager" and label != "eager":
+            print(f"⚠️ {label} não pôde ser usado (veja o log do processo)")
+        print(f"{label:<12} {times['import']:>11.2f} {times['load']:>8.2f} "
+              f"{times['first_prediction']:>12.2f} {times['total']:>9.2f}")
+
+    classifiers = [(label, PlanktonClassifierPyTorch(model_path=args.checkpoint, input_mode=args.input_mode,
+                                                     prefer_torchscript=prefer, inference_backend=backend,
+                                                     cache_max_bytes=0))
+                   for label, prefer, backend in runtimes]
+
+    print(f"\n=== Latência por lote (mediana, ms; {torch.get_num_threads()} threads) ===")
+    print(f"{'Lote':>5}" + "".join(f"{label:>13}" for label, _ in classifiers)
+          + "".join(f"{'ganho ' + label:>19}" for label, _ in classifiers[1:]))
+    print("-" * (5 + 13 * len(classifiers) + 19 * (len(classifiers) - 1)))
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        timings = [measure_latency(classifier, batch_size, args.repeat) for _, classifier in classifiers]
+        print(f"{batch_size:>5}" + "".join(f"{ms:>13.2f}" for ms in timings)
+              + "".join(f"{timings[0] / ms:>18.2f}x" for ms in timings[1:]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Varredura do orçamento de threads: forwards simultâneos x threads intra-op.
+
+Compara workers do agendador de micro-lotes (threads de um único processo) e o
+pool de processos de inferência (inference_pool.py). Cada combinação roda em um
+processo novo (o pool inter-op do PyTorch e as variáveis OMP_* só valem se
+definidos antes da primeira inferência), atendendo clientes concorrentes que
+enviam imagens codificadas. Mede vazão, latência (p50/p95) por requisição e a
+memória total (PSS do servidor + workers, no Linux), e indica a melhor divisão
+para a máquina atual, a ser usada em PLANKTON_INFERENCE_WORKERS ou
+PLANKTON_INFERENCE_PROCESSES e PLANKTON_INTRA_OP_THREADS. As combinações que
+excedem os núcleos (ex.: cada worker usando todos eles, o comportamento sem
+orçamento) entram para comparação.
+
+Uso:
+    python benchmark_threads.py
+    python benchmark_threads.py --concurrency 16 --requests 128 --backend onnxruntime
+    python benchmark_threads.py --workers 1 --processes 2,4,8,16,32
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import model_bundle
+from plankton_ai import INFERENCE_BACKENDS, INPUT_MODES
+from runtime_config import detect_cpu_count
+
+# Executado em um processo novo para cada combinação
+WORKLOAD_SCRIPT = """
+import io, json, os, statistics, sys, threading, time
+from runtime_config import RuntimeConfig
+config = RuntimeConfig.from_env()
+config.export_environment()
+import numpy as np
+from PIL import Image
+from inference_pool import InferencePool
+from inference_scheduler import MicroBatchScheduler
+from plankton_ai import PlanktonClassifierPyTorch
+
+checkpoint, input_mode, backend = sys.argv[1:4]
+concurrency, total, max_batch, max_wait = int(sys.argv[4]), int(sys.argv[5]), int(sys.argv[6]), float(sys.argv[7])
+classifier = PlanktonClassifierPyTorch(model_path=checkpoint, input_mode=input_mode, inference_backend=backend,
+                                       intra_op_threads=config.intra_op_threads, cache_max_bytes=0)
+config.apply()
+if config.use_process_pool:
+    scheduler = InferencePool(classifier, processes=config.inference_processes, max_batch_size=max_batch,
+                              max_wait_ms=max_wait, intra_op_threads=config.intra_op_threads).start()
+else:
+    scheduler = MicroBatchScheduler(classifier, max_batch_size=max_batch, max_wait_ms=max_wait,
+                                    workers=config.inference_workers).start()
+
+rng = np.random.default_rng(0)
+images = []
+for _ in range(8):
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)).save(buffer, "JPEG", quality=90)
+    images.append(buffer.getvalue())
+for image in images * config.concurrent_forwards:
+    scheduler.predict(image)
+
+latencies = []
+lock = threading.Lock()
+counter = iter(range(total))
+
+def client():
+    for i in counter:
+        start = time.perf_counter()
+        scheduler.predict(images[i % len(images)], timeout=120)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+start = time.perf_counter()
+threads = [threading.Thread(target=client) for _ in range(concurrency)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+elapsed = time.perf_counter() - start
+
+def pss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("Pss:")) / 1024
+    except (OSError, StopIteration):
+        return None
+
+pids = [os.getpid()] + [worker.pid for worker in getattr(scheduler, "_workers", [])]
+memory = [pss_mb(pid) for pid in pids]
+average_batch = scheduler.get_stats()["average_batch_size"]
+scheduler.stop()
+
+latencies.sort()
+print(json.dumps({'throughput': len(latencies) / elapsed, 'p50': statistics.median(latencies) * 1000,
+                  'p95': latencies[int(0.95 * (len(latencies) - 1))] * 1000, 'average_batch': average_batch,
+                  'memory_mb': sum(memory) if None not in memory else None}))
+"""
+
+
+def candidate_splits(cpu_count, workers_list=None, processes_list=None):
+    """Combinações (modo, forwards simultâneos, threads intra-op) a medir.
+
+    Para cada número de forwards, a divisão que cabe nos núcleos; para os workers
+    em threads, também a que usa todos os núcleos por worker.
+    """
+    workers_list = workers_list or sorted({w for w in (1, 2, 4, 8) if w <= cpu_count} | {cpu_count})
+    if processes_list is None:
+        processes_list = sorted({p for p in (2, 4, 8, 16, 32) if p <= cpu_count} | ({cpu_count} - {1}))
+    splits = []
+    for workers in workers_list:
+        splits.append(("threads", workers, max(1, cpu_count // workers)))
+        if workers > 1 and cpu_count > 1:
+            splits.append(("threads", workers, cpu_count))
+    for processes in processes_list:
+        if processes > 1:
+            splits.append(("processos", processes, max(1, cpu_count // processes)))
+    return list(dict.fromkeys(splits))
+
+
+def run_split(args, mode, forwards, intra_op_threads):
+    env = dict(os.environ, PLANKTON_INTRA_OP_THREADS=str(intra_op_threads), PLANKTON_INTEROP_THREADS="1",
+               PLANKTON_INFERENCE_BACKEND=args.backend,
+               PLANKTON_INFERENCE_WORKERS=str(forwards if mode == "threads" else 1),
+               PLANKTON_INFERENCE_PROCESSES=str(forwards if mode == "processos" else 1))
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        env.pop(name, None)
+    output = subprocess.run(
+        [sys.executable, "-c", WORKLOAD_SCRIPT, args.checkpoint, args.input_mode, args.backend,
+         str(args.concurrency), str(args.requests), str(args.batch_max_size), str(args.batch_max_wait_ms)],
+        capture_output=True, text=True, check=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def parse_list(value):
+    return [int(item) for item in value.split(",")] if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encontra a melhor divisão de threads para a inferência")
+    parser.add_argument("--checkpoint", default=model_bundle.default_model_path(),
+                        help="Checkpoint float (.pth) ou pacote (.safetensors)")
+    parser.add_argument("--backend", choices=INFERENCE_BACKENDS, default="pytorch", help="Backend de inferência")
+    parser.add_argument("--input-mode", choices=INPUT_MODES, default="uint8", help="Modo de entrada")
+    parser.add_argument("--workers", help="Números de workers (threads) a testar, separados por vírgula")
+    parser.add_argument("--processes", help="Números de processos do pool a testar, separados por vírgula")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultâneos")
+    parser.add_argument("--requests", type=int, default=64, help="Requisições por combinação")
+    parser.add_argument("--batch-max-size", type=int, default=16, help="Tamanho máximo do lote do agendador")
+    parser.add_argument("--batch-max-wait-ms", type=float, default=5, help="Espera máxima do agendador (ms)")
+    args = parser.parse_args()
+
+    cpu_count = detect_cpu_count()
+    splits = candidate_splits(cpu_count, parse_list(args.workers), parse_list(args.processes))
+
+    print(f"Núcleos disponíveis: {cpu_count} | backend: {args.backend} | {args.concurrency} clientes, "
+          f"{args.requests} requisições por combinação")
+    print(f"{'Modo':<10} {'Forwards':>8} {'Intra-op':>9} {'img/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} "
+          f"{'Lote médio':>11} {'Memória (MB)':>13}")
+    print("-" * 83)
+    results = []
+    for mode, forwards, intra_op_threads in splits:
+        data = run_split(args, mode, forwards, intra_op_threads)
+        results.append((mode, forwards, intra_op_threads, data))
+        memory = f"{data['memory_mb']:.0f}" if data["memory_mb"] is not None else "-"
+        note = "  (excede os núcleos)" if forwards * intra_op_threads > cpu_count else ""
+        print(f"{mode:<10} {forwards:>8} {intra_op_threads:>9} {data['throughput']:>8.1f} {data['p50']:>9.1f} "
+              f"{data['p95']:>9.1f} {data['average_batch']:>11.2f} {memory:>13}{note}")
+
+    mode, forwards, intra_op_threads, data = max(results, key=lambda item: item[3]["throughput"])
+    variable = "PLANKTON_INFERENCE_WORKERS" if mode == "threads" else "PLANKTON_INFERENCE_PROCESSES"
+    print(f"\nMelhor vazão: {data['throughput']:.1f} img/s com")
+    print(f"    {variable}={forwards} PLANKTON_INTRA_OP_THREADS={intra_op_threads}")
+
+
+if __name__ == "__main__":
+    main()
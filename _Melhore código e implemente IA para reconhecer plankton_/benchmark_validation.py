@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Mede o custo de recusar entradas inválidas em cada forma de validação de upload.
+
+- validate_image (antiga): grava o upload em disco, os.path.getsize, imghdr.what
+  e Image.open (só em Pythons que ainda têm imghdr, removido no 3.13)
+- Image.open: a validação em memória anterior (Image.open testando os plugins
+  do PIL e conferindo img.size)
+- cabeçalho: image_validation.open_validated (assinatura e dimensões lidas do
+  cabeçalho com struct antes do PIL)
+
+As entradas cobrem os casos recusados (bytes aleatórios, texto com extensão de
+imagem, imagem pequena demais, grande demais e uma bomba de descompressão: um
+PNG de poucos KB que declara 50000x50000 pixels) e uma imagem válida como
+referência do custo de aceitar.
+
+Uso:
+    python benchmark_validation.py
+    python benchmark_validation.py --runs 2000
+"""
+
+import argparse
+import io
+import os
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import warnings
+import zlib
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import image_validation
+
+MAX_FILE_SIZE = 16 * 1024 * 1024
+MIN_DIMENSION = 50
+MAX_DIMENSION = 4000
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import imghdr
+    except ImportError:
+        imghdr = None
+
+
+def encode(pixels, image_format, **options):
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def gradient(width, height):
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1).astype(np.uint8)
+
+
+def decompression_bomb(width, height):
+    """PNG pequeno com o IHDR reescrito para declarar width x height pixels (CRC corrigido)."""
+    data = bytearray(encode(gradient(64, 64), "PNG"))
+    data[16:24] = struct.pack(">II", width, height)
+    data[29:33] = struct.pack(">I", zlib.crc32(bytes(data[12:29])))
+    return bytes(data)
+
+
+def build_inputs():
+    rng = np.random.default_rng(0)
+    return [
+        ("bytes aleatórios (64KB)", rng.integers(0, 256, 64 * 1024, dtype=np.uint8).tobytes()),
+        ("texto como .png", ("nome,classe\n" * 200).encode("utf-8")),
+        ("imagem 20x20", encode(rng.integers(0, 256, (20, 20, 3), dtype=np.uint8), "PNG")),
+        ("imagem 6000x4500", encode(gradient(6000, 4500), "JPEG", quality=80)),
+        ("bomba 50000x50000", decompression_bomb(50000, 50000)),
+        ("válida 1024x768", encode(gradient(1024, 768), "JPEG", quality=90)),
+    ]
+
+
+def validate_legacy(data):
+    """O caminho antigo de validate_image: arquivo em disco, imghdr e Image.open."""
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as f:
+        f.write(data)
+        f.flush()
+        file_size = os.path.getsize(f.name)
+        if file_size > MAX_FILE_SIZE or file_size < image_validation.MIN_FILE_SIZE:
+            return False
+        if imghdr.what(f.name) is None:
+            return False
+        try:
+            img = Image.open(f.name)
+        except Exception:
+            return False
+        return not image_validation.check_dimensions(*img.size, MIN_DIMENSION, MAX_DIMENSION)
+
+
+def validate_pil(data):
+    """A validação em memória anterior: Image.open com todos os plugins e img.size."""
+    if len(data) > MAX_FILE_SIZE or len(data) < image_validation.MIN_FILE_SIZE:
+        return False
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Exception:
+        return False
+    return not image_validation.check_dimensions(*img.size, MIN_DIMENSION, MAX_DIMENSION)
+
+
+def validate_header(data):
+    img, _ = image_validation.open_validated(data, MAX_FILE_SIZE, MIN_DIMENSION, MAX_DIMENSION)
+    return img is not None
+
+
+def time_per_call(validate, data, runs, rounds=5):
+    """Mediana, entre as rodadas, do tempo médio por chamada (segundos)."""
+    validate(data)  # aquecimento (carga dos plugins do PIL)
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(runs):
+            validate(data)
+        samples.append((time.perf_counter() - start) / runs)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo de recusar uploads inválidos em cada forma de validação")
+    parser.add_argument("--runs", type=int, default=500, help="Validações por rodada")
+    args = parser.parse_args()
+
+    methods = [("Image.open", validate_pil), ("cabeçalho", validate_header)]
+    if imghdr is not None:
+        methods.insert(0, ("validate_image", validate_legacy))
+
+    print(f"Limites: {MIN_DIMENSION}-{MAX_DIMENSION}px por lado, até {MAX_FILE_SIZE / 1024 / 1024:.0f}MB | "
+          f"{args.runs} validações por rodada")
+    header = f"{'Entrada':<26} {'Tamanho':>9} {'Aceita':>7}" + "".join(f" {name + ' (µs)':>21}" for name, _ in methods)
+    print(header)
+    print("-" * len(header))
+    for name, data in build_inputs():
+        accepted = validate_header(data)
+        row = f"{name:<26} {len(data) / 1024:>7.1f}KB {'sim' if accepted else 'não':>7}"
+        for _, validate in methods:
+            if validate(data) != accepted:
+                row += f" {'(diverge)':>21}"
+                continue
+            row += f" {time_per_call(validate, data, args.runs) * 1e6:>21.1f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Exporta o checkpoint do classificador para TorchScript congelado e otimizado ou para ONNX.
+
+TorchScript: o artefato é gravado ao lado do checkpoint
+(models/plankton_model_torchscript.pt) e passa a ser usado automaticamente pelo
+classificador quando presente e exportado a partir do mesmo checkpoint. Para
+voltar ao modo eager, apague o arquivo ou defina PLANKTON_PREFER_TORCHSCRIPT=0.
+
+ONNX: gera models/plankton_model.onnx, usado pelo servidor com
+PLANKTON_INFERENCE_BACKEND=onnxruntime. A exportação confere se as saídas do
+onnxruntime coincidem com as do PyTorch.
+
+Uso:
+    python export_model.py
+    python export_model.py --format onnx
+    python export_model.py --checkpoint models/plankton_model.pth --input-mode float
+"""
+
+import argparse
+import os
+import time
+
+import torch
+
+import model_bundle
+import model_export
+from onnx_backend import ONNXRUNTIME_AVAILABLE, OnnxModel, onnx_model_path, softmax
+from plankton_ai import INPUT_MODES, PlanktonClassifierPyTorch, _checkpoint_digest
+
+# Diferença máxima aceita nas probabilidades entre o onnxruntime e o PyTorch
+ONNX_TOLERANCE = 1e-4
+
+
+def check_onnx_equivalence(model, onnx_path, example):
+    """Compara logits e probabilidades do onnxruntime com os do PyTorch.
+
+    Returns:
+        tuple: (diferença máx. nos logits, diferença máx. nas probabilidades)
+    """
+    with torch.inference_mode():
+        expected = model(example).numpy()
+    actual = OnnxModel(onnx_path)(example.numpy())
+    return float(abs(expected - actual).max()), float(abs(softmax(expected) - softmax(actual)).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o modelo de plâncton para TorchScript ou ONNX")
+    parser.add_argument("--checkpoint", default=model_bundle.default_model_path(), help="Checkpoint float (.pth) ou pacote (.safetensors)")
+    parser.add_argument("--format", choices=("torchscript", "onnx"), default="torchscript", help="Formato exportado")
+    parser.add_argument("--output", help="Arquivo de saída (padrão: <checkpoint>_torchscript.pt ou <checkpoint>.onnx)")
+    parser.add_argument("--input-mode", choices=INPUT_MODES, default="uint8",
+                        help="Entrada do grafo exportado (deve coincidir com PLANKTON_INPUT_MODE)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.checkpoint):
+        parser.error(f"Checkpoint não encontrado: {args.checkpoint}")
+    if args.format == "onnx" and not ONNXRUNTIME_AVAILABLE:
+        parser.error("Instale o onnxruntime (e o pacote onnx) para exportar e validar o modelo ONNX")
+    default_path = onnx_model_path if args.format == "onnx" else model_export.torchscript_path
+    output_path = args.output or default_path(args.checkpoint)
+
+    source_digest = _checkpoint_digest(args.checkpoint)
+    classifier = PlanktonClassifierPyTorch(model_path=args.checkpoint, input_mode=args.input_mode,
+                                           prefer_torchscript=False, cache_max_bytes=0)
+    if classifier.model_version != source_digest:
+        parser.error(f"Não foi possível carregar {args.checkpoint}")
+
+    model = classifier.model.to("cpu").eval()
+    height, width = classifier.img_size
+    if args.input_mode == "uint8":
+        example = torch.randint(0, 256, (4, 3, height, width), dtype=torch.uint8)
+    else:
+        example = torch.randn(4, 3, height, width)
+
+    start = time.perf_counter()
+    metadata = model_export.build_metadata(source_digest, classifier.class_names, classifier.img_size,
+                                           args.input_mode, model_format=args.format)
+    if args.format == "onnx":
+        model_export.export_onnx(model, output_path, example[:1], metadata)
+        export_time = time.perf_counter() - start
+
+        # Lote maior que o de exemplo: confere também o eixo de lote dinâmico
+        logits_diff, probs_diff = check_onnx_equivalence(model, output_path, example)
+        status = "✅" if probs_diff <= ONNX_TOLERANCE else "❌"
+        print(f"✅ Modelo ONNX salvo em {output_path} ({export_time:.1f}s)")
+        print(f"{status} Equivalência onnxruntime x PyTorch: logits {logits_diff:.2e}, "
+              f"probabilidades {probs_diff:.2e} (tolerância {ONNX_TOLERANCE:.0e})")
+        if probs_diff > ONNX_TOLERANCE:
+            raise SystemExit(1)
+        print("   Use com: PLANKTON_INFERENCE_BACKEND=onnxruntime")
+        return
+
+    exported = model_export.export_torchscript(model, output_path, example[:1], metadata)
+    export_time = time.perf_counter() - start
+
+    # Conferência de equivalência com o modelo eager em um lote diferente do exemplo
+    with torch.inference_mode():
+        diff = (model(example) - exported(example)).abs().max().item()
+
+    print(f"✅ Modelo TorchScript salvo em {output_path} ({export_time:.1f}s)")
+    print(f"   Entrada: {args.input_mode} | Classes: {len(classifier.class_names)} | "
+          f"Diferença máx. nos logits (eager x TorchScript): {diff:.2e}")
+    print("   Compare início e latência com: python benchmark_runtimes.py")
+
+
+if __name__ == "__main__":
+    main()
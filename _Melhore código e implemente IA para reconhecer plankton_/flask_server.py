@@ -1,34 +1,45 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, render_template_string, stream_with_context
 from flask_cors import CORS
 import os
 import base64
 import logging
 import time
 import traceback
-import imghdr
 import json
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-import tempfile
-import uuid
-from PIL import Image
-import io
 import sys
+import threading
+import collections
+import itertools
+import shutil
+import functools
 
-# Definir variável global para disponibilidade do PyTorch
+from runtime_config import RuntimeConfig
+from model_loader import BackgroundModelLoader
+from model_bundle import default_model_path
+from model_reloader import ModelReloader
+from model_registry import ModelRegistry
+import batch_upload
+import image_validation
+import jobs
+
+# Orçamento de threads (workers de inferência x threads intra-op); os limites de ambiente
+# precisam ser definidos antes de importar PyTorch, NumPy e OpenCV
+RUNTIME_CONFIG = RuntimeConfig.from_env()
+RUNTIME_CONFIG.export_environment()
+
+# Disponibilidade do PyTorch/onnxruntime: definida pelo carregamento em segundo plano
+# (load_inference_runtime), que importa plankton_ai fora do caminho de início do servidor HTTP
 pytorch_available = False
+ONNXRUNTIME_AVAILABLE = False
 
-# Importar apenas o necessário do plankton_ai.py
-try:
-    # Adicionar o diretório atual ao path para garantir que o módulo seja encontrado
-    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    
-    # Importar apenas a função create_plankton_classifier e a variável PYTORCH_AVAILABLE
-    from plankton_ai import create_plankton_classifier, PYTORCH_AVAILABLE
-    pytorch_available = PYTORCH_AVAILABLE
-    print(f"PyTorch disponível: {pytorch_available}")
-except ImportError as e:
-    print(f"Erro ao importar do módulo plankton_ai: {e}")
-    pytorch_available = False
+# Adicionar o diretório atual ao path para garantir que os módulos sejam encontrados
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from inference_scheduler import BULK, INTERACTIVE, PRIORITIES, MicroBatchScheduler, expired_result, wait_timeout
+from inference_pool import FORK_AVAILABLE, InferencePool
+from single_flight import SingleFlight
 
 # Importação do NumPy com tratamento de erro
 try:
@@ -67,132 +78,717 @@ MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 MIN_IMAGE_SIZE = 50  # Dimensão mínima (largura ou altura) em pixels
 MAX_IMAGE_SIZE = 4000  # Dimensão máxima (largura ou altura) em pixels
 
-# Mapeamento de extensões para formatos suportados pelo PIL
-EXTENSION_FORMAT_MAP = {
-    'jpg': 'JPEG',
-    'jpeg': 'JPEG',
-    'png': 'PNG',
-    'gif': 'GIF',
-    'bmp': 'BMP',
-    'tiff': 'TIFF',
-    'webp': 'WEBP',
-    'heic': 'JPEG',  # Convertido para JPEG
-    'heif': 'JPEG',  # Convertido para JPEG
-    'raw': 'JPEG',   # Convertido para JPEG
-    'svg': 'PNG',    # Convertido para PNG
-    'psd': 'PNG'     # Convertido para PNG
-}
+# Modelo: pacote único (models/plankton_model.safetensors, ver model_bundle.py) ou checkpoint .pth;
+# sem ele o servidor usa o MobileNetV2 ImageNet com uma nova camada final
+MODEL_PATH = os.environ.get('PLANKTON_MODEL_PATH') or default_model_path()
+# Modelos selecionáveis por requisição (campo 'model' de /predict): os arquivos deste diretório,
+# carregados sob demanda e descarregados por LRU acima do orçamento de memória dos pesos (MB; 0 = sem limite)
+MODELS_DIR = os.environ.get('PLANKTON_MODELS_DIR') or os.path.dirname(MODEL_PATH) or '.'
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get('PLANKTON_MODEL_MEMORY_MB', 512))
+# Usa o grafo TorchScript exportado por export_model.py (<checkpoint>_torchscript.pt) quando presente
+PREFER_TORCHSCRIPT = os.environ.get('PLANKTON_PREFER_TORCHSCRIPT', '1') != '0'
+# Backend de inferência: 'pytorch' ou 'onnxruntime' (usa <checkpoint>.onnx, de export_model.py --format onnx,
+# e não importa o PyTorch)
+INFERENCE_BACKEND = os.environ.get('PLANKTON_INFERENCE_BACKEND', 'pytorch')
+
+# A classificação depende do PyTorch, exceto com o backend onnxruntime (definido após as importações)
+inference_available = False
+
+# Segundos sugeridos no cabeçalho Retry-After enquanto o modelo carrega
+READINESS_RETRY_AFTER = 2
+
+# Micro-lotes de inferência: requisições concorrentes são agrupadas em um único forward
+BATCH_MAX_SIZE = int(os.environ.get('PLANKTON_BATCH_MAX_SIZE', 16))  # Imagens por lote
+BATCH_MAX_WAIT_MS = float(os.environ.get('PLANKTON_BATCH_MAX_WAIT_MS', 5))  # Espera máxima para formar um lote
+INFERENCE_TIMEOUT = 30  # Tempo máximo (segundos) que uma requisição aguarda seu lote
+
+# Controle de admissão: requisições interativas na fila de inferência acima das quais novas recebem 429
+# (0 = sem limite), e o Retry-After sugerido
+MAX_QUEUE_DEPTH = int(os.environ.get('PLANKTON_MAX_QUEUE_DEPTH', 128))
+OVERLOAD_RETRY_AFTER = 1
+# Cabeçalho opcional com o tempo (ms) que o cliente ainda vai esperar: depois dele a imagem é
+# descartada antes do forward e a resposta é 504
+DEADLINE_HEADER = 'X-Deadline-Ms'
+
+# Prioridades na fila de inferência: 'interactive' (padrão de /predict, /predict_base64 e /predict_raw)
+# ou 'bulk' (padrão de /predict_batch; os trabalhos de /jobs são sempre 'bulk'); o cabeçalho muda o padrão da rota.
+# Com as duas filas ocupadas, saem até PLANKTON_INTERACTIVE_WEIGHT lotes interativos por lote em massa
+PRIORITY_HEADER = 'X-Priority'
+INTERACTIVE_WEIGHT = int(os.environ.get('PLANKTON_INTERACTIVE_WEIGHT', 4))
+
+# /predict_batch: tamanho máximo do envio (multipart ou .zip/.tar) e de imagens por requisição
+PREDICT_BATCH_MAX_UPLOAD_MB = float(os.environ.get('PLANKTON_BATCH_UPLOAD_MAX_MB', 2048))
+PREDICT_BATCH_MAX_IMAGES = int(os.environ.get('PLANKTON_BATCH_MAX_IMAGES', 20000))
+
+# Trabalhos assíncronos (/jobs): diretório do banco SQLite e dos envios, e máximo de trabalhos na fila ou em execução
+JOBS_DIR = os.environ.get('PLANKTON_JOBS_DIR', 'jobs')
+JOBS_MAX_ACTIVE = int(os.environ.get('PLANKTON_JOBS_MAX_ACTIVE', 16))
+# Diretório que contém os caminhos aceitos nos manifestos; vazio desativa os manifestos (só envios de arquivos)
+JOBS_DATA_ROOT = os.environ.get('PLANKTON_JOBS_DATA_ROOT', '')
+JOBS_RETRY_AFTER = 60  # Segundos sugeridos no Retry-After com a fila de trabalhos cheia
+JOB_INFERENCE_TIMEOUT = 600  # O trabalho de fundo cede a vez às requisições interativas: espera mais por lote
+
+# Aquecimento antes de o modelo ficar pronto: tamanhos de lote separados por vírgula
+# (vazio = todos de 1 a PLANKTON_BATCH_MAX_SIZE; '0' desativa) e execuções por tamanho
+WARMUP_BATCH_SIZES = os.environ.get('PLANKTON_WARMUP_BATCH_SIZES', '')
+WARMUP_REPEATS = int(os.environ.get('PLANKTON_WARMUP_REPEATS', 2))
+WARMUP_TIMEOUT = 300  # Tempo máximo (segundos) do aquecimento dos processos do pool
+
+# Recarga do modelo sem reiniciar o servidor (POST /admin/reload ou observação do arquivo do modelo)
+MODEL_WATCH_INTERVAL = float(os.environ.get('PLANKTON_MODEL_WATCH_INTERVAL', 0))  # Segundos; 0 desativa
+# Token exigido no cabeçalho X-Admin-Token das rotas /admin; sem ele, só aceitas a partir de localhost
+ADMIN_TOKEN = os.environ.get('PLANKTON_ADMIN_TOKEN', '')
+
+# Cache de predições por conteúdo (hash da imagem + versão do modelo)
+PREDICTION_CACHE_MAX_MB = float(os.environ.get('PLANKTON_CACHE_MAX_MB', 64))  # 0 desativa o cache
+PREDICTION_CACHE_TTL = float(os.environ.get('PLANKTON_CACHE_TTL', 0))  # Segundos; 0 = sem expiração
+
+# Requisições simultâneas com a mesma imagem e o mesmo modelo compartilham uma única decodificação e forward
+COALESCE_REQUESTS = os.environ.get('PLANKTON_COALESCE', '1') != '0'
+
+# Decodificação em resolução reduzida (JPEG draft / reduce) antes do redimensionamento para 224x224.
+# Desligada por padrão: em imagens acima de 448px a entrada do modelo muda (meça com benchmark_decode.py)
+FAST_DECODE = os.environ.get('PLANKTON_FAST_DECODE', '0') == '1'
+
+# Backend de decodificação/redimensionamento de imagens: 'pil' ou 'opencv'
+IMAGE_BACKEND = os.environ.get('PLANKTON_IMAGE_BACKEND', 'pil')
+
+# Entrada do modelo: 'float' usa o pré-processamento normalizado original; 'uint8' embute a normalização
+# na primeira convolução e mantém imagens monocromáticas com um canal. Artefatos exportados usam o modo
+# com que foram exportados
+INPUT_MODE = os.environ.get('PLANKTON_INPUT_MODE', 'float')
+
+# Modelo int8 gerado por quantize_model.py (opcional; apenas CPU). Vazio usa o modelo float
+QUANTIZED_MODEL_PATH = os.environ.get('PLANKTON_QUANTIZED_MODEL', '')
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.config['BATCH_MAX_SIZE'] = BATCH_MAX_SIZE
+app.config['BATCH_MAX_WAIT_MS'] = BATCH_MAX_WAIT_MS
 
 # Cria a pasta de uploads se não existir
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Inicializa o classificador de plâncton
+# Estado preenchido pelo carregamento em segundo plano
 plankton_classifier = None
+inference_scheduler = None
+inference_pool_active = False
+# Agendador em processo dos modelos do registro quando o modelo padrão roda no pool de processos
+registry_scheduler = None
+# Cabeças de vários modelos sobre o backbone do modelo padrão (campo 'models'; criado no primeiro uso)
+multi_head_classifier = None
 
-# Verificar se PyTorch está disponível
-if not pytorch_available:
-    logger.warning("PyTorch não está disponível. O servidor iniciará, mas a classificação de imagens não funcionará.")
+def warmup_batch_sizes(max_batch_size):
+    """Tamanhos de lote aquecidos: PLANKTON_WARMUP_BATCH_SIZES ou todos os que o agendador pode formar."""
+    if not WARMUP_BATCH_SIZES.strip():
+        return list(range(1, max_batch_size + 1))
+    return sorted({size for size in (int(item) for item in WARMUP_BATCH_SIZES.split(',')) if 0 < size <= max_batch_size})
 
-# Tentar inicializar o classificador
-try:
-    # Usar a função create_plankton_classifier que já tem tratamento para PyTorch não disponível
-    plankton_classifier = create_plankton_classifier()
-    if plankton_classifier is not None:
-        logger.info("Classificador de plâncton inicializado com sucesso")
+def warm_up(scheduler, classifier, concurrent_requests):
+    """Aquece o modelo em cada tamanho de lote e cada worker para que o primeiro cliente não pague a inicialização."""
+    if inference_pool_active:
+        # Cada processo aquece a própria cópia ao iniciar: o servidor não pode executar forwards antes do fork
+        classifier.warmup_info = scheduler.wait_warm(WARMUP_TIMEOUT)
     else:
-        logger.warning("Classificador de plâncton inicializado como None (PyTorch não disponível)")
-except Exception as e:
-    logger.error(f"Erro ao inicializar classificador: {str(e)}")
-    logger.debug(traceback.format_exc())
-    plankton_classifier = None
+        classifier.warmup(warmup_batch_sizes(app.config['BATCH_MAX_SIZE']), WARMUP_REPEATS)
+
+    # Uma predição por worker, passando pelo agendador e pela decodificação
+    image = np.zeros((*classifier.img_size, 3), dtype=np.uint8)
+    threads = [threading.Thread(target=scheduler.predict, args=(image,), kwargs={'timeout': INFERENCE_TIMEOUT})
+               for _ in range(concurrent_requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def load_inference_runtime(loader):
+    """Importa o PyTorch, carrega o classificador, inicia o agendador e aquece o modelo.
+
+    Executado em segundo plano pelo MODEL_LOADER; as rotas de predição respondem 503
+    até o fim desta função.
+    """
+    global pytorch_available, ONNXRUNTIME_AVAILABLE, inference_available
+    global plankton_classifier, inference_scheduler, inference_pool_active
+
+    with loader.step('imports', phase='importing'):
+        try:
+            import plankton_ai
+        except ImportError as e:
+            raise RuntimeError(f"Erro ao importar do módulo plankton_ai: {e}")
+    pytorch_available = plankton_ai.PYTORCH_AVAILABLE
+    ONNXRUNTIME_AVAILABLE = plankton_ai.ONNXRUNTIME_AVAILABLE
+    print(f"PyTorch disponível: {pytorch_available}")
+
+    if not (pytorch_available or (INFERENCE_BACKEND == 'onnxruntime' and ONNXRUNTIME_AVAILABLE)):
+        raise RuntimeError("PyTorch não está disponível. O servidor continua ativo, mas a classificação de imagens não funcionará.")
+    inference_available = True
+
+    loader.set_phase('loading_model')
+    classifier = create_classifier(plankton_ai, MODEL_PATH)
+    loader.add_timings(classifier.startup_timings)
+    if classifier.model is None:
+        raise RuntimeError("Classificador de plâncton não inicializado")
+    logger.info("Classificador de plâncton inicializado com sucesso")
+    RUNTIME_CONFIG.apply()
+
+    # Agendador de micro-lotes entre as rotas e o classificador; com PLANKTON_INFERENCE_PROCESSES > 1,
+    # um pool de processos que compartilham os pesos e recebem as imagens ainda codificadas
+    with loader.step('workers', phase='starting_workers'):
+        scheduler = None
+        if RUNTIME_CONFIG.use_process_pool:
+            if FORK_AVAILABLE:
+                scheduler = start_inference_pool(classifier)
+                inference_pool_active = True
+            else:
+                logger.warning("Pool de processos indisponível nesta plataforma (sem fork); usando o agendador em processo")
+        if scheduler is None:
+            scheduler = MicroBatchScheduler(
+                classifier,
+                max_batch_size=app.config['BATCH_MAX_SIZE'],
+                max_wait_ms=app.config['BATCH_MAX_WAIT_MS'],
+                workers=RUNTIME_CONFIG.inference_workers,
+                max_queue_depth=MAX_QUEUE_DEPTH,
+                interactive_weight=INTERACTIVE_WEIGHT
+            ).start()
+
+    with loader.step('warmup', phase='warming_up'):
+        warm_up(scheduler, classifier, RUNTIME_CONFIG.concurrent_forwards)
+
+    inference_scheduler = scheduler
+    plankton_classifier = classifier
+    MODEL_REGISTRY.scan()
+    MODEL_REGISTRY.pin(MODEL_PATH, classifier)
+    MODEL_RELOADER.set_current((classifier, scheduler))
+    MODEL_RELOADER.watch(MODEL_WATCH_INTERVAL)
+    start_jobs()
+
+    model_info = classifier.get_model_info()
+    logger.info("✅ Modelo de IA carregado com sucesso!")
+    logger.info(f"🔬 Classes suportadas: {', '.join(model_info.get('classes', []))}")
+    logger.info(f"💻 Dispositivo: {model_info.get('device')} | formato: {model_info.get('model_format')}")
+
+def create_classifier(plankton_ai, model_path):
+    """Instancia o classificador com a configuração do servidor."""
+    return plankton_ai.create_plankton_classifier(**classifier_options(model_path))
+
+def classifier_options(model_path):
+    """Argumentos de create_plankton_classifier com a configuração do servidor."""
+    return dict(
+        model_path=model_path,
+        prefer_torchscript=PREFER_TORCHSCRIPT,
+        inference_backend=INFERENCE_BACKEND,
+        intra_op_threads=RUNTIME_CONFIG.intra_op_threads,
+        cache_max_bytes=int(PREDICTION_CACHE_MAX_MB * 1024 * 1024),
+        cache_ttl=PREDICTION_CACHE_TTL or None,
+        fast_decode=FAST_DECODE,
+        image_backend=IMAGE_BACKEND,
+        input_mode=INPUT_MODE,
+        quantized_model_path=QUANTIZED_MODEL_PATH or None
+    )
+
+def start_inference_pool(classifier, classifier_factory=None):
+    """Inicia o pool de processos de inferência; cada processo aquece sua cópia do modelo.
+
+    Com classifier_factory os processos são criados por spawn e carregam o modelo por conta própria
+    (ver InferencePool); sem ela, por fork, o que exige que o servidor ainda não tenha executado forwards.
+    """
+    return InferencePool(
+        classifier,
+        processes=RUNTIME_CONFIG.inference_processes,
+        max_batch_size=app.config['BATCH_MAX_SIZE'],
+        max_wait_ms=app.config['BATCH_MAX_WAIT_MS'],
+        intra_op_threads=RUNTIME_CONFIG.intra_op_threads,
+        warmup_batch_sizes=warmup_batch_sizes(app.config['BATCH_MAX_SIZE']),
+        warmup_repeats=WARMUP_REPEATS,
+        max_queue_depth=MAX_QUEUE_DEPTH,
+        interactive_weight=INTERACTIVE_WEIGHT,
+        classifier_factory=classifier_factory
+    ).start()
+
+def prepare_reload(model_path):
+    """Carrega e aquece o novo modelo em uma segunda instância, sem tocar no modelo em uso.
+
+    Returns:
+        tuple: (classificador, pool de processos ou None com o agendador em processo)
+    """
+    import plankton_ai
+    if not os.path.exists(model_path):
+        raise RuntimeError(f"Arquivo do modelo não encontrado: {model_path}")
+    classifier = create_classifier(plankton_ai, model_path)
+    if classifier.model is None:
+        raise RuntimeError(f"Não foi possível carregar {model_path}")
+
+    if inference_pool_active:
+        # O agendador do registro e as cabeças já executaram forwards neste processo, e o pool OpenMP
+        # do PyTorch não sobrevive ao fork: os novos processos são criados por spawn
+        factory = functools.partial(plankton_ai.create_plankton_classifier, **classifier_options(model_path))
+        pool = start_inference_pool(classifier, classifier_factory=factory)
+        try:
+            classifier.warmup_info = pool.wait_warm(WARMUP_TIMEOUT)
+        except Exception:
+            pool.stop()
+            raise
+        return classifier, pool
+    classifier.warmup(warmup_batch_sizes(app.config['BATCH_MAX_SIZE']), WARMUP_REPEATS)
+    return classifier, None
+
+def activate_reload(runtime):
+    """Troca o modelo em uso pelo recarregado e retorna o anterior (classificador, pool ou None)."""
+    global plankton_classifier, inference_scheduler, multi_head_classifier
+    classifier, pool = runtime
+    previous = (plankton_classifier, inference_scheduler if pool is not None else None)
+    if pool is not None:
+        inference_scheduler = pool
+        with REGISTRY_SCHEDULER_LOCK:
+            if registry_scheduler is not None:
+                # Padrão do agendador do registro: sem a troca, ele manteria o modelo anterior em memória
+                registry_scheduler.classifier = classifier
+    else:
+        # Lotes já enfileirados guardam o classificador anterior e terminam nele
+        inference_scheduler.classifier = classifier
+    plankton_classifier = classifier
+    MODEL_REGISTRY.pin(classifier.model_path, classifier)
+    # As cabeças são recarregadas sobre o novo backbone no próximo pedido
+    multi_head_classifier = None
+    return previous
+
+def retire_runtime(previous):
+    """Aguarda as requisições do modelo anterior e encerra seu pool de processos, se houver."""
+    classifier, pool = previous
+    if pool is not None:
+        # Os processos terminam as tarefas já enfileiradas e o trabalho em massa retido no pool antes de sair
+        pool.stop(timeout=INFERENCE_TIMEOUT)
+    elif not inference_scheduler.wait_drained(classifier, INFERENCE_TIMEOUT):
+        logger.warning("Requisições do modelo anterior ainda em andamento após a recarga")
+    classifier.prediction_cache.clear()
+
+def load_registered_model(model_path):
+    """Carrega um modelo do registro (pedido pelo campo 'model') com a configuração do servidor."""
+    import plankton_ai
+    classifier = create_classifier(plankton_ai, model_path)
+    if classifier.model is None:
+        raise RuntimeError(f"Não foi possível carregar {model_path}")
+    return classifier
+
+def scheduler_for_registry():
+    """Agendador dos modelos do registro: o do servidor, ou um em processo quando o padrão usa o pool."""
+    global registry_scheduler
+    if not inference_pool_active:
+        return inference_scheduler
+    with REGISTRY_SCHEDULER_LOCK:
+        if registry_scheduler is None:
+            # O pool só conhece o modelo padrão; cada requisição informa o classificador do seu modelo
+            registry_scheduler = MicroBatchScheduler(
+                plankton_classifier,
+                max_batch_size=app.config['BATCH_MAX_SIZE'],
+                max_wait_ms=app.config['BATCH_MAX_WAIT_MS'],
+                workers=1,
+                max_queue_depth=MAX_QUEUE_DEPTH,
+                interactive_weight=INTERACTIVE_WEIGHT
+            ).start()
+    return registry_scheduler
+
+def get_multi_head_classifier():
+    """Classificador de várias cabeças sobre o backbone do modelo padrão (criado no primeiro uso).
+
+    Raises:
+        ValueError: Se o modelo padrão não puder servir de backbone (ex.: backend onnxruntime)
+    """
+    global multi_head_classifier
+    with REGISTRY_SCHEDULER_LOCK:
+        if multi_head_classifier is None:
+            import plankton_ai
+            import multi_head
+            base = plankton_classifier
+            if base.model_format != 'eager':
+                # TorchScript, int8 e ONNX não expõem o backbone: carrega o modelo eager do mesmo arquivo
+                base = plankton_ai.create_plankton_classifier(
+                    model_path=base.model_path, prefer_torchscript=False, cache_max_bytes=0,
+                    fast_decode=FAST_DECODE, image_backend=IMAGE_BACKEND, input_mode=INPUT_MODE)
+            multi_head_classifier = multi_head.MultiHeadClassifier(base)
+        return multi_head_classifier
+
+REGISTRY_SCHEDULER_LOCK = threading.Lock()
+MODEL_REGISTRY = ModelRegistry(MODELS_DIR, load_registered_model, budget_bytes=MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
+
+MODEL_RELOADER = ModelReloader(prepare_reload, activate_reload, retire_runtime, MODEL_PATH,
+                               version_fn=lambda runtime: runtime[0].model_version)
+
+def job_items(job):
+    """Itens de batch_upload com as imagens de um trabalho (manifesto ou envio gravado)."""
+    if job.source_kind == jobs.MANIFEST:
+        yield from batch_upload.iter_paths(job.manifest, MAX_CONTENT_LENGTH)
+        return
+    with open(JOB_STORE.upload_path(job.id), 'rb') as body:
+        if job.source_kind == jobs.MULTIPART:
+            yield from batch_upload.iter_multipart(body, job.source, MAX_CONTENT_LENGTH)
+        else:
+            yield from batch_upload.iter_archive(body, job.source_kind, MAX_CONTENT_LENGTH)
+
+def run_job(job, skip):
+    """Resultados de um trabalho a partir da imagem skip, como trabalho de fundo do agendador.
+
+    O modelo é resolvido a cada imagem: uma recarga no meio de um trabalho longo passa a valer nas seguintes.
+    """
+    return stream_predictions(job_items(job), lambda: batch_runtime(job.model_id, job.heads), priority=BULK,
+                              skip=skip, timeout=JOB_INFERENCE_TIMEOUT)
+
+# Predições em andamento por (classificador, hash da imagem + versão do modelo), ver predict_with_cache
+PREDICTIONS_IN_FLIGHT = SingleFlight()
+
+# Fila de trabalhos e executor, criados quando o modelo fica pronto (start_jobs): importar o módulo não toca em JOBS_DIR
+JOB_STORE = None
+JOB_RUNNER = None
+
+def start_jobs():
+    """Abre a fila de trabalhos em JOBS_DIR e inicia o executor; trabalhos interrompidos voltam à fila."""
+    global JOB_STORE, JOB_RUNNER
+    JOB_STORE = jobs.JobStore(JOBS_DIR, max_active=JOBS_MAX_ACTIVE)
+    JOB_RUNNER = jobs.JobRunner(JOB_STORE, run_job).start()
+
+def jobs_unavailable_response():
+    """503 enquanto a fila de trabalhos não foi aberta (modelo carregando ou falha no início); None depois."""
+    if JOB_STORE is not None:
+        return None
+    return model_loading_response() or (jsonify({'success': False, 'error': 'Fila de trabalhos indisponível'}), 503)
+
+# O servidor HTTP atende imediatamente; o modelo carrega em paralelo (acompanhe em /readyz)
+MODEL_LOADER = BackgroundModelLoader(load_inference_runtime)
+if __name__ != '__mp_main__':
+    # Processos do pool criados por spawn reimportam este módulo como __mp_main__ e não carregam o servidor
+    MODEL_LOADER.start()
+
+def model_loading_response():
+    """Resposta 503 com Retry-After enquanto o modelo carrega; None depois (pronto ou falha)."""
+    if MODEL_LOADER.ready or MODEL_LOADER.failed:
+        return None
+    response = jsonify({
+        'success': False,
+        'error': 'Modelo em carregamento; tente novamente em instantes',
+        'phase': MODEL_LOADER.phase
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(READINESS_RETRY_AFTER)
+    return response
+
+def overload_response(priority=INTERACTIVE):
+    """429 com Retry-After quando a fila de inferência interativa está cheia; None caso contrário.
+
+    Verificado antes de ler o corpo: sob rajadas, a requisição recusada não custa decodificação.
+    O trabalho em massa não ocupa a fila interativa e não é recusado aqui.
+    """
+    scheduler = inference_scheduler
+    if scheduler is None or priority != INTERACTIVE or scheduler.admit():
+        return None
+    logger.warning(f"Requisição recusada: fila de inferência cheia ({MAX_QUEUE_DEPTH})")
+    return shed_response('Servidor sobrecarregado: fila de inferência cheia; tente novamente em instantes')
+
+def shed_response(message):
+    response = jsonify({'success': False, 'error': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(OVERLOAD_RETRY_AFTER)
+    return response
+
+def request_deadline():
+    """Prazo da requisição (em time.monotonic) pelo cabeçalho X-Deadline-Ms, ou None sem o cabeçalho."""
+    value = request.headers.get(DEADLINE_HEADER)
+    if not value:
+        return None
+    try:
+        return time.monotonic() + max(0.0, float(value)) / 1000.0
+    except ValueError:
+        logger.warning(f"Cabeçalho {DEADLINE_HEADER} inválido ignorado: {value}")
+        return None
+
+def request_priority(default=INTERACTIVE):
+    """Prioridade da requisição pelo cabeçalho X-Priority ('interactive' ou 'bulk'), ou o padrão da rota."""
+    value = request.headers.get(PRIORITY_HEADER, '').strip().lower()
+    if not value:
+        return default
+    if value not in PRIORITIES:
+        logger.warning(f"Cabeçalho {PRIORITY_HEADER} inválido ignorado: {value}")
+        return default
+    return value
+
+def admission_error_response(result):
+    """429 para uma predição recusada pela fila cheia, 504 para uma com o prazo vencido; None para as demais."""
+    if result.get('shed'):
+        logger.warning(result['error'])
+        return shed_response(result['error'])
+    if result.get('expired'):
+        logger.warning(f"Predição descartada: {result['error']}")
+        return jsonify({'success': False, 'error': result['error']}), 504
+    return None
 
 def allowed_file(filename):
     """Verifica se o arquivo tem uma extensão permitida."""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def validate_image(file_path):
-    """Valida uma imagem verificando formato, tamanho e dimensões.
-    Converte formatos não suportados diretamente para formatos compatíveis.
-    
+def open_image_bytes(image_data):
+    """Valida uma imagem recebida na requisição e a abre sem gravá-la em disco.
+
+    Tamanho, assinatura e dimensões são verificados nos bytes do cabeçalho, antes
+    de qualquer decodificação (image_validation.py); o PIL só abre o cabeçalho e
+    os pixels são decodificados uma única vez, no pré-processamento do classificador.
+
     Args:
-        file_path (str): Caminho para o arquivo de imagem
-        
+        image_data (bytes): Conteúdo do arquivo de imagem
+
     Returns:
-        tuple: (is_valid, error_message, converted_path)
-            converted_path será None se não houve conversão ou o caminho do novo arquivo se houve conversão
+        tuple: (img, error_message) com img None se a validação falhar
+    """
+    return image_validation.open_validated(image_data, MAX_CONTENT_LENGTH, MIN_IMAGE_SIZE, MAX_IMAGE_SIZE)
+
+def requested_model(data=None):
+    """Identificador do modelo pedido no campo 'model' (formulário, JSON ou query string); None = padrão."""
+    model_id = (request.form if data is None else data).get('model') or request.args.get('model')
+    if not model_id or model_id == MODEL_REGISTRY.default_id:
+        return None
+    return model_id
+
+def requested_heads(data=None):
+    """Modelos pedidos no campo 'models' (lista JSON ou nomes separados por vírgula); None se ausente."""
+    model_ids = (request.form if data is None else data).get('models') or request.args.get('models')
+    if not model_ids:
+        return None
+    if isinstance(model_ids, str):
+        model_ids = model_ids.split(',')
+    return list(dict.fromkeys(str(model_id).strip() for model_id in model_ids if str(model_id).strip())) or None
+
+def unknown_model_response(model_id, heads=None):
+    """404 para um modelo que não está no diretório de modelos; None se todos existirem."""
+    for requested in ([model_id] if model_id else []) + (heads or []):
+        if MODEL_REGISTRY.known(requested):
+            continue
+        logger.warning(f"Modelo desconhecido pedido: {requested}")
+        return jsonify({
+            'success': False,
+            'error': f'Modelo desconhecido: {requested}',
+            'available_models': MODEL_REGISTRY.scan()
+        }), 404
+    return None
+
+def load_heads(heads):
+    """Carrega as cabeças pedidas sobre o backbone comum.
+
+    Returns:
+        tuple: (classificador de várias cabeças, None) ou (None, mensagem de erro)
     """
-    # Verificar se o arquivo existe
-    if not os.path.exists(file_path):
-        return False, "Arquivo não encontrado", None
-        
-    # Verificar tamanho do arquivo
-    file_size = os.path.getsize(file_path)
-    if file_size > MAX_CONTENT_LENGTH:
-        return False, f"Arquivo muito grande: {file_size/1024/1024:.1f}MB (máximo: {MAX_CONTENT_LENGTH/1024/1024:.1f}MB)", None
-    if file_size < 100:  # 100 bytes é muito pequeno para uma imagem válida
-        return False, f"Arquivo muito pequeno: {file_size} bytes", None
-    
-    # Obter extensão do arquivo
-    file_ext = os.path.splitext(file_path)[1].lower().replace('.', '')
-    
-    # Verificar se é realmente uma imagem
-    img_type = imghdr.what(file_path)
-    if img_type is None and file_ext not in ['svg', 'psd', 'heic', 'heif', 'raw']:
-        return False, "Arquivo não é uma imagem válida", None
-        
-    # Tentar abrir a imagem com PIL para validar e possivelmente converter
     try:
-        # Verificar se precisamos converter o formato
-        converted_path = None
-        if file_ext in EXTENSION_FORMAT_MAP and file_ext not in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff']:
-            # Formatos que precisam de conversão
-            try:
-                img = Image.open(file_path)
-                # Criar um novo nome de arquivo para a versão convertida
-                converted_path = os.path.join(os.path.dirname(file_path), 
-                                             f"converted_{os.path.basename(file_path).split('.')[0]}.{EXTENSION_FORMAT_MAP[file_ext].lower()}")
-                # Salvar no formato de destino
-                img.save(converted_path, format=EXTENSION_FORMAT_MAP[file_ext])
-                logger.info(f"Imagem convertida de {file_ext} para {EXTENSION_FORMAT_MAP[file_ext]}: {converted_path}")
-                
-                # Usar o arquivo convertido para o restante da validação
-                file_path = converted_path
-                img = Image.open(file_path)  # Reabrir a imagem convertida
-            except Exception as e:
-                logger.error(f"Erro ao converter imagem: {str(e)}")
-                return False, f"Erro ao processar formato de imagem {file_ext}: {str(e)}", None
+        classifier = get_multi_head_classifier()
+        for model_id in heads:
+            classifier.add_head(model_id, MODEL_REGISTRY.path(model_id))
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Cabeças {heads} recusadas: {str(e)}")
+        return None, str(e)
+    return classifier, None
+
+def resolve_models(model_id, heads):
+    """Confere os modelos pedidos e carrega as cabeças uma única vez por requisição.
+
+    Returns:
+        tuple: (classificador de várias cabeças, ou None sem 'models'; resposta 404/400, ou None se válidos)
+    """
+    invalid = unknown_model_response(model_id, heads)
+    if invalid or not heads:
+        return None, invalid
+    classifier, error = load_heads(heads)
+    if error:
+        # As cabeças pedidas não podem rodar sobre o backbone comum
+        return None, (jsonify({'success': False, 'error': error}), 400)
+    return classifier, None
+
+def classify(image_data, img, model_id=None, heads=None, heads_classifier=None, deadline=None,
+             priority=INTERACTIVE):
+    """Classifica uma imagem validada com um modelo (com cache) ou com várias cabeças sobre um só backbone.
+
+    Args:
+        heads_classifier: Classificador das cabeças pedidas, de resolve_models (obrigatório com heads)
+
+    Returns:
+        tuple: (resultado, campos da resposta: 'model'/'prediction' ou 'models'/'predictions')
+    """
+    if not heads:
+        result = predict_with_cache(image_data, img, model_id, deadline, priority)
+        return result, {'model': model_id or MODEL_REGISTRY.default_id, 'prediction': result}
+
+    result = scheduler_for_registry().predict(heads_classifier.upload_source(image_data, img),
+                                              timeout=INFERENCE_TIMEOUT, classifier=heads_classifier,
+                                              deadline=deadline, priority=priority)
+    if not result.get('success', False):
+        return result, {}
+    predictions = {head: result['heads'][head] for head in heads}
+    return result, {'models': heads, 'predictions': predictions}
+
+def describe_prediction(prediction_fields):
+    """Resumo da predição para o log: classe e confiança de cada modelo."""
+    predictions = prediction_fields.get('predictions') or {prediction_fields['model']: prediction_fields['prediction']}
+    return ', '.join(f"{result.get('predicted_class')} ({result.get('confidence', 0):.2f})" +
+                     (f" [{model_id}]" if len(predictions) > 1 else '')
+                     for model_id, result in predictions.items())
+
+def runtime_for(model_id=None):
+    """(classificador, agendador, pool ativo) que atendem o modelo pedido; None = modelo padrão.
+
+    As referências são lidas uma vez: uma recarga do modelo no meio da requisição não a afeta.
+    """
+    if model_id is not None:
+        return MODEL_REGISTRY.get(model_id), scheduler_for_registry(), False
+    MODEL_REGISTRY.touch(MODEL_REGISTRY.default_id)
+    return plankton_classifier, inference_scheduler, inference_pool_active
+
+def predict_with_cache(image_data, img, model_id=None, deadline=None, priority=INTERACTIVE):
+    """Classifica uma imagem validada, consultando antes o cache de predições.
+
+    Sem resultado no cache, uma requisição com a mesma imagem e o mesmo modelo já em
+    andamento é aguardada em vez de repetida (PREDICTIONS_IN_FLIGHT).
+
+    Args:
+        image_data (bytes): Bytes originais da imagem (usados na chave do cache)
+        img (PIL.Image.Image): A mesma imagem já aberta por open_image_bytes
+        model_id (str): Modelo do registro; None usa o modelo padrão
+        deadline (float): Prazo da requisição (time.monotonic), ver request_deadline
+        priority (str): Fila de inferência (INTERACTIVE ou BULK), ver request_priority
+
+    Returns:
+        dict: Resultado da predição, com 'cached': True quando veio do cache e 'coalesced': True
+            quando veio de outra requisição em andamento
+    """
+    classifier, scheduler, pooled = runtime_for(model_id)
+    cache = classifier.prediction_cache
+    key = classifier.cache_key(image_data)
+    cached = cache.get(key)
+    if cached is not None:
+        cached['cached'] = True
+        return cached
+
+    def predict():
+        if pooled:
+            # O pool decodifica nos workers: os bytes originais são menores que os pixels
+            result = scheduler.predict(image_data, timeout=INFERENCE_TIMEOUT, deadline=deadline, priority=priority)
         else:
-            # Formatos suportados diretamente
-            img = Image.open(file_path)
-            
-        # Verificar dimensões
-        width, height = img.size
-        if width < MIN_IMAGE_SIZE or height < MIN_IMAGE_SIZE:
-            return False, f"Imagem muito pequena: {width}x{height}px (mínimo: {MIN_IMAGE_SIZE}x{MIN_IMAGE_SIZE}px)", converted_path
-        if width > MAX_IMAGE_SIZE or height > MAX_IMAGE_SIZE:
-            return False, f"Imagem muito grande: {width}x{height}px (máximo: {MAX_IMAGE_SIZE}x{MAX_IMAGE_SIZE}px)", converted_path
-            
-        return True, "", converted_path
-    except Exception as e:
-        logger.error(f"Erro ao validar imagem: {str(e)}")
-        return False, f"Erro ao processar imagem: {str(e)}", None
-    
-    # Verificar dimensões da imagem
+            result = scheduler.predict(classifier.upload_source(image_data, img), timeout=INFERENCE_TIMEOUT,
+                                       classifier=classifier, deadline=deadline, priority=priority)
+        if result.get('success', False):
+            cache.put(key, result)
+        return result
+
+    if not COALESCE_REQUESTS:
+        return predict()
     try:
-        with Image.open(file_path) as img:
-            width, height = img.size
-            if width < MIN_IMAGE_SIZE or height < MIN_IMAGE_SIZE:
-                return False, f"Imagem muito pequena: {width}x{height}px (mínimo: {MIN_IMAGE_SIZE}px)"
-            if width > MAX_IMAGE_SIZE or height > MAX_IMAGE_SIZE:
-                return False, f"Imagem muito grande: {width}x{height}px (máximo: {MAX_IMAGE_SIZE}px)"
-    except Exception as e:
-        return False, f"Erro ao processar imagem: {str(e)}"
-    
-    return True, ""
+        result, shared = PREDICTIONS_IN_FLIGHT.do((classifier, key), predict,
+                                                  timeout=wait_timeout(INFERENCE_TIMEOUT, deadline))
+    except TimeoutError:
+        if deadline is not None and time.monotonic() >= deadline:
+            return expired_result()
+        return {'error': f'Tempo limite de inferência excedido ({INFERENCE_TIMEOUT}s)', 'success': False}
+    if not shared:
+        return result
+    if result.get('shed') or result.get('expired'):
+        # A requisição seguida foi recusada ou venceu pelo prazo dela: esta tenta com os seus
+        return predict()
+    return dict(result, coalesced=True)
+
+def batch_runtime(model_id=None, heads=None, heads_classifier=None):
+    """(classificador, agendador, pool ativo, campos do modelo nos resultados) de uma predição em lote.
+
+    Com heads_classifier (de resolve_models) as cabeças não são carregadas de novo.
+
+    Raises:
+        RuntimeError: Se o modelo pedido não puder ser carregado
+        ValueError: Se as cabeças pedidas não puderem rodar sobre o backbone comum
+    """
+    if heads:
+        classifier = heads_classifier
+        if classifier is None:
+            classifier, error = load_heads(heads)
+            if error:
+                raise ValueError(error)
+        return classifier, scheduler_for_registry(), False, {'models': heads}
+    classifier, scheduler, pooled = runtime_for(model_id)
+    return classifier, scheduler, pooled, {'model': model_id or MODEL_REGISTRY.default_id}
+
+def stream_predictions(items, runtime_fn, priority=BULK, skip=0, timeout=INFERENCE_TIMEOUT):
+    """Classifica os itens (nome, bytes, erro) de batch_upload, com uma janela de imagens no agendador.
+
+    Args:
+        items: Iterador de itens de batch_upload
+        runtime_fn: Função sem argumentos que retorna o batch_runtime de cada imagem
+        priority (str): Fila de inferência das imagens; BULK cede a vez às requisições interativas
+        skip (int): Imagens iniciais já classificadas (lidas, mas não enviadas)
+        timeout (float): Espera máxima (segundos) pelo resultado de cada imagem
+
+    Yields:
+        dict: Por imagem, na ordem dos itens: índice, nome do arquivo e predição ou erro
+
+    Raises:
+        ValueError: Do leitor dos itens (envio malformado), depois dos resultados das imagens já lidas
+    """
+    # Imagens no agendador antes de esperar a primeira: lotes cheios em todos os workers
+    window = 2 * app.config['BATCH_MAX_SIZE'] * RUNTIME_CONFIG.concurrent_forwards
+    pending = collections.deque()
+
+    def submit(runtime, image_data, img):
+        """Envia a imagem sem bloquear; retorna (pedido, None, chave do cache) ou (None, resultado imediato, None)."""
+        classifier, scheduler, pooled, model_fields = runtime
+        cache = None if 'models' in model_fields else classifier.prediction_cache
+        key = classifier.cache_key(image_data) if cache is not None else None
+        cached = cache.get(key) if key is not None else None
+        if cached is not None:
+            cached['cached'] = True
+            return runtime, None, cached, None
+        if pooled:
+            return runtime, scheduler.submit(image_data, priority=priority), None, key
+        tensor, error_message = classifier.preprocess_input(classifier.upload_source(image_data, img))
+        if tensor is None:
+            return runtime, None, {'error': error_message, 'success': False}, None
+        return runtime, scheduler.submit(tensor, classifier, priority=priority), None, key
+
+    def finish(entry):
+        index, filename, runtime, request_, result, key = entry
+        if result is None:
+            result = request_.wait(timeout)
+            if key is not None and result.get('success', False):
+                runtime[0].prediction_cache.put(key, result)
+        record = {'index': index, 'filename': filename, 'success': result.get('success', False)}
+        if not record['success']:
+            record['error'] = result.get('error', 'Erro na predição')
+            return record
+        model_fields = runtime[3]
+        if 'models' in model_fields:
+            return {**record, **model_fields,
+                    'predictions': {head: result['heads'][head] for head in model_fields['models']}}
+        return {**record, **model_fields, 'prediction': result}
+
+    try:
+        for index, (filename, image_data, error_message) in enumerate(items):
+            if index < skip:
+                continue
+            img = None
+            if error_message is None and not allowed_file(filename):
+                error_message = 'Tipo de arquivo não permitido'
+            if error_message is None:
+                img, error_message = open_image_bytes(image_data)
+            if img is None:
+                pending.append((index, filename, None, None, {'error': error_message, 'success': False}, None))
+            else:
+                runtime = runtime_fn()
+                scheduler = runtime[1]
+                # Fila interativa cheia: espera as imagens mais antigas do lote em vez de ser recusado
+                while priority == INTERACTIVE and pending and scheduler.max_queue_depth and \
+                        scheduler.queue_depth() >= scheduler.max_queue_depth:
+                    yield finish(pending.popleft())
+                pending.append((index, filename, *submit(runtime, image_data, img)))
+            while len(pending) > window or (pending and pending[0][4] is not None):
+                yield finish(pending.popleft())
+    except ValueError:
+        # Envio malformado: as imagens já lidas recebem seus resultados antes do erro
+        while pending:
+            yield finish(pending.popleft())
+        raise
+    while pending:
+        yield finish(pending.popleft())
 
 @app.route('/')
 def index():
@@ -268,12 +864,24 @@ def index():
                 <p>Verifica o status do servidor e do modelo de IA</p>
             </div>
             
+            <div class="endpoint">
+                <h3><span class="method">GET</span> /readyz</h3>
+                <p>Prontidão do modelo: 200 quando pronto, 503 (com Retry-After) enquanto carrega</p>
+            </div>
+            
+            <div class="endpoint">
+                <h3><span class="method">POST</span> /admin/reload</h3>
+                <p>Recarrega o modelo sem reiniciar o servidor (JSON opcional: <code>model_path</code>, <code>wait</code>)</p>
+            </div>
+            
             <div class="endpoint">
                 <h3><span class="method">POST</span> /predict</h3>
                 <p>Classifica uma imagem de plâncton</p>
                 <p><strong>Parâmetros:</strong></p>
                 <ul>
                     <li><code>file</code>: Arquivo de imagem (PNG, JPG, JPEG, GIF, BMP, TIFF)</li>
+                    <li><code>model</code> (opcional): Modelo do diretório de modelos (nome do arquivo sem extensão)</li>
+                    <li><code>models</code> (opcional): Vários modelos separados por vírgula, com um único forward do backbone</li>
                 </ul>
                 <p><strong>Resposta:</strong> JSON com a classificação e confiança</p>
             </div>
@@ -284,13 +892,54 @@ def index():
                 <p><strong>Parâmetros JSON:</strong></p>
                 <ul>
                     <li><code>image</code>: String base64 da imagem</li>
+                    <li><code>model</code> (opcional): Modelo do diretório de modelos</li>
+                    <li><code>models</code> (opcional): Lista de modelos com o mesmo backbone</li>
                 </ul>
                 <p><strong>Resposta:</strong> JSON com a classificação e confiança</p>
             </div>
             
+            <div class="endpoint">
+                <h3><span class="method">POST</span> /predict_raw</h3>
+                <p>Classifica a imagem enviada no corpo da requisição, sem multipart nem base64</p>
+                <p><strong>Parâmetros:</strong></p>
+                <ul>
+                    <li>Corpo: bytes da imagem com <code>Content-Type: application/octet-stream</code> ou <code>image/*</code></li>
+                    <li><code>?model=</code> / <code>?models=</code> (opcionais): Como em /predict</li>
+                    <li><code>X-Filename</code> (cabeçalho opcional): Nome do arquivo</li>
+                </ul>
+                <p><strong>Resposta:</strong> A mesma de /predict</p>
+            </div>
+            
+            <div class="endpoint">
+                <h3><span class="method">POST</span> /predict_batch</h3>
+                <p>Classifica muitas imagens em uma requisição, com um resultado por linha (NDJSON) à medida que ficam prontos</p>
+                <p><strong>Parâmetros:</strong></p>
+                <ul>
+                    <li>Corpo: multipart com vários arquivos (.zip/.tar são abertos), ou um .zip/.tar com <code>Content-Type: application/zip</code> / <code>application/x-tar</code></li>
+                    <li><code>?model=</code> / <code>?models=</code> (opcionais): Como em /predict</li>
+                </ul>
+                <p><strong>Resposta:</strong> Uma linha JSON por imagem (índice, nome, predição ou erro) e uma linha final com o resumo</p>
+            </div>
+            
+            <div class="endpoint">
+                <h3><span class="method">POST</span> /jobs</h3>
+                <p>Cria um trabalho assíncrono para uma amostra inteira; responde 202 imediatamente</p>
+                <p><strong>Parâmetros:</strong></p>
+                <ul>
+                    <li>JSON: <code>{"directory": "..."}</code> ou <code>{"paths": [...]}</code>, com <code>model</code> / <code>models</code> opcionais</li>
+                    <li>Ou o mesmo corpo de /predict_batch (multipart ou .zip/.tar)</li>
+                </ul>
+                <p><strong>Acompanhamento:</strong> <code>GET /jobs/&lt;id&gt;</code>, <code>GET /jobs/&lt;id&gt;/results?offset=&amp;limit=</code>, <code>POST /jobs/&lt;id&gt;/cancel</code></p>
+            </div>
+            
+            <div class="endpoint">
+                <h3><span class="method">GET</span> /metrics</h3>
+                <p>Métricas de inferência: profundidade da fila e histograma de tamanhos de lote</p>
+            </div>
+            
             <div class="endpoint">
                 <h3><span class="method">GET</span> /classes</h3>
-                <p>Lista todas as classes de plâncton que o modelo pode identificar</p>
+                <p>Lista todas as classes de plâncton que o modelo pode identificar (<code>?model=</code> para outro modelo)</p>
             </div>
             
             <h2>Classes de Plâncton Suportadas:</h2>
@@ -327,8 +976,22 @@ def status():
         }
     }
     
+    # Modelo ainda carregando em segundo plano
+    if not MODEL_LOADER.ready and not MODEL_LOADER.failed:
+        return jsonify({
+            'status': 'loading',
+            'message': 'Servidor ativo; modelo de IA em carregamento',
+            'readiness': MODEL_LOADER.status(),
+            'server_info': server_info,
+            'endpoints': [
+                'GET /',
+                'GET /status',
+                'GET /readyz'
+            ]
+        })
+
     # Verificar se o PyTorch está disponível
-    if not pytorch_available:
+    if not inference_available:
         return jsonify({
             'status': 'limited',
             'message': 'Servidor ativo, mas PyTorch não está disponível',
@@ -337,6 +1000,7 @@ def status():
             'endpoints': [
                 'GET /',
                 'GET /status',
+                'GET /readyz',
                 'GET /classes'
             ]
         })
@@ -347,7 +1011,7 @@ def status():
             'status': 'error',
             'message': 'Classificador de plâncton não inicializado',
             'model_loaded': False,
-            'pytorch_available': True,
+            'pytorch_available': pytorch_available,
             'server_info': server_info
         }), 500
         
@@ -358,14 +1022,30 @@ def status():
             'status': 'online',
             'message': 'Servidor de reconhecimento de plâncton ativo',
             'model_info': model_info,
+            'scheduler_stats': inference_scheduler.get_stats() if inference_scheduler else None,
+            'runtime_config': RUNTIME_CONFIG.to_dict(),
+            'startup_timings': MODEL_LOADER.status()['startup_timings'],
+            'model_reload': MODEL_RELOADER.status(),
+            'model_registry': MODEL_REGISTRY.get_stats(),
+            'multi_head': multi_head_classifier.get_stats() if multi_head_classifier else None,
+            'jobs': dict(JOB_STORE.get_stats(), current_job=JOB_RUNNER.current_job) if JOB_STORE else None,
             'server_info': server_info,
-            'pytorch_available': True,
+            'pytorch_available': pytorch_available,
             'endpoints': [
                 'GET /',
                 'GET /status',
+                'GET /readyz',
+                'GET /metrics',
                 'POST /predict',
                 'POST /predict_base64',
-                'GET /classes'
+                'POST /predict_raw',
+                'POST /predict_batch',
+                'POST /jobs',
+                'GET /jobs/<id>',
+                'GET /jobs/<id>/results',
+                'POST /jobs/<id>/cancel',
+                'GET /classes',
+                'POST /admin/reload'
             ]
         })
     except Exception as e:
@@ -374,14 +1054,84 @@ def status():
         return jsonify({
             'status': 'error',
             'message': f'Erro ao obter status: {str(e)}',
-            'pytorch_available': True,
+            'pytorch_available': pytorch_available,
             'server_info': server_info
         }), 500
 
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Prontidão para classificar: 200 com o modelo pronto, 503 durante o carregamento ou após falha."""
+    readiness = MODEL_LOADER.status()
+    response = jsonify(readiness)
+    if not readiness['ready']:
+        response.status_code = 503
+        if not MODEL_LOADER.failed:
+            response.headers['Retry-After'] = str(READINESS_RETRY_AFTER)
+    return response
+
+def admin_forbidden_response():
+    """403 quando a requisição não pode usar as rotas /admin; None se autorizada."""
+    if ADMIN_TOKEN:
+        authorized = request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+    else:
+        authorized = request.remote_addr in ('127.0.0.1', '::1')
+    if authorized:
+        return None
+    return jsonify({'success': False, 'error': 'Acesso negado à rota de administração'}), 403
+
+@app.route('/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """Recarrega o modelo em segundo plano e o troca pelo atual quando estiver aquecido.
+
+    POST aceita um JSON opcional com 'model_path' (padrão: o modelo em uso) e
+    'wait' (true aguarda o fim da recarga). GET retorna o estado da última recarga.
+    """
+    forbidden = admin_forbidden_response()
+    if forbidden:
+        return forbidden
+    if request.method == 'GET':
+        return jsonify(MODEL_RELOADER.status())
+
+    if not MODEL_LOADER.ready:
+        return model_loading_response() or (jsonify({
+            'success': False,
+            'error': 'O modelo inicial não foi carregado; reinicie o servidor'
+        }), 503)
+
+    options = request.get_json(silent=True) or {}
+    if MODEL_RELOADER.reload(options.get('model_path'), trigger='admin') is None:
+        return jsonify({'success': False, 'error': 'Recarga já em andamento', 'reload': MODEL_RELOADER.status()}), 409
+    if options.get('wait'):
+        success = MODEL_RELOADER.wait(WARMUP_TIMEOUT + INFERENCE_TIMEOUT)
+        return jsonify({'success': success, 'reload': MODEL_RELOADER.status()}), 200 if success else 500
+    return jsonify({'success': True, 'reload': MODEL_RELOADER.status()}), 202
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Retorna as métricas de inferência (fila, tamanhos de lote, recusas, coalescência e cache de predições)."""
+    schedulers = [scheduler.get_stats() for scheduler in {inference_scheduler, registry_scheduler} if scheduler]
+    return jsonify({
+        'scheduler': inference_scheduler.get_stats() if inference_scheduler else None,
+        'load_shedding': {
+            'max_queue_depth': MAX_QUEUE_DEPTH,
+            # Recusadas com 429 (fila cheia) e descartadas antes do forward (prazo de X-Deadline-Ms vencido)
+            'shed': sum(stats['shed'] for stats in schedulers),
+            'expired': sum(stats['expired'] for stats in schedulers),
+        },
+        # Requisições que aguardaram uma predição idêntica em andamento em vez de repeti-la
+        'coalescing': {'enabled': COALESCE_REQUESTS, **PREDICTIONS_IN_FLIGHT.get_stats()},
+        'runtime': RUNTIME_CONFIG.to_dict(),
+        'prediction_cache': plankton_classifier.prediction_cache.get_stats() if plankton_classifier else None
+    })
+
 @app.route('/classes', methods=['GET'])
 def get_classes():
     """Retorna as classes de plâncton suportadas."""
-    if not pytorch_available:
+    loading = model_loading_response()
+    if loading is not None:
+        return loading
+
+    if not inference_available:
         logger.warning("Tentativa de obter classes sem PyTorch disponível")
         # Retorna as classes padrão mesmo sem PyTorch
         default_classes = ["Copepod", "Diatom", "Dinoflagellate", "Radiolarian", "Foraminifera", "Cyanobacteria", "Other"]
@@ -400,10 +1150,18 @@ def get_classes():
             'classifier_initialized': False
         })
     
+    # ?model=<id> retorna as classes de outro modelo do registro (carregando-o se preciso)
+    model_id = requested_model(request.args)
+    unknown = unknown_model_response(model_id)
+    if unknown:
+        return unknown
+    classifier = MODEL_REGISTRY.get(model_id) if model_id else plankton_classifier
+
     return jsonify({
-        'classes': plankton_classifier.class_names,
-        'num_classes': len(plankton_classifier.class_names),
-        'pytorch_available': True,
+        'model': model_id or MODEL_REGISTRY.default_id,
+        'classes': classifier.class_names,
+        'num_classes': len(classifier.class_names),
+        'pytorch_available': pytorch_available,
         'classifier_initialized': True
     })
 
@@ -411,9 +1169,14 @@ def get_classes():
 def predict_file():
     """Classifica uma imagem de plâncton enviada como arquivo."""
     start_time = time.time()
+    deadline, priority = request_deadline(), request_priority()
     
+    loading = model_loading_response()
+    if loading is not None:
+        return loading
+
     # Verificar se o PyTorch está disponível
-    if not pytorch_available:
+    if not inference_available:
         logger.error("Tentativa de predição sem PyTorch disponível")
         return jsonify({
             'success': False,
@@ -427,6 +1190,10 @@ def predict_file():
             'success': False,
             'error': 'Serviço de classificação indisponível'
         }), 503
+
+    overloaded = overload_response(priority)
+    if overloaded is not None:
+        return overloaded
     
     try:
         # Verifica se foi enviado um arquivo
@@ -456,41 +1223,34 @@ def predict_file():
                 'allowed_types': list(ALLOWED_EXTENSIONS)
             }), 400
         
-        # Salva o arquivo temporariamente
         filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+
+        # Modelo pedido no campo 'model' (padrão: o modelo do servidor) ou várias cabeças em 'models'
+        model_id, heads = requested_model(), requested_heads()
+        heads_classifier, invalid = resolve_models(model_id, heads)
+        if invalid:
+            return invalid
         
         try:
-            file.save(filepath)
-            logger.info(f"Arquivo salvo temporariamente: {filepath}")
+            # Lê o upload diretamente da requisição, sem arquivo temporário
+            image_data = file.read()
             
             # Validar a imagem
-            is_valid, error_message, converted_path = validate_image(filepath)
-            if not is_valid:
+            img, error_message = open_image_bytes(image_data)
+            if img is None:
                 logger.warning(f"Validação de imagem falhou: {error_message}")
-                os.remove(filepath)
-                if converted_path and os.path.exists(converted_path):
-                    os.remove(converted_path)
                 return jsonify({
                     'success': False,
                     'error': error_message
                 }), 400
             
-            # Usar o arquivo convertido se existir
-            prediction_path = converted_path if converted_path else filepath
-            
             # Faz a predição
-            result = plankton_classifier.predict(prediction_path)
-            
-            # Remove os arquivos temporários
-            os.remove(filepath)
-            logger.info(f"Arquivo temporário removido: {filepath}")
-            if converted_path and os.path.exists(converted_path):
-                os.remove(converted_path)
-                logger.info(f"Arquivo convertido removido: {converted_path}")
+            result, prediction_fields = classify(image_data, img, model_id, heads, heads_classifier, deadline, priority)
             
             if not result.get('success', False):
+                rejected = admission_error_response(result)
+                if rejected:
+                    return rejected
                 logger.error(f"Erro na predição: {result.get('error', 'Erro desconhecido')}")
                 return jsonify({
                     'success': False,
@@ -504,19 +1264,14 @@ def predict_file():
             response = {
                 'success': True,
                 'filename': filename,
-                'prediction': result,
+                **prediction_fields,
                 'processing_time': round(total_time, 3)
             }
             
-            logger.info(f"Predição bem-sucedida para {filename}: {result.get('class')} ({result.get('confidence', 0):.2f})")
+            logger.info(f"Predição bem-sucedida para {filename}: {describe_prediction(prediction_fields)}")
             return jsonify(response)
             
         except Exception as e:
-            # Remove o arquivo em caso de erro
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                logger.info(f"Arquivo temporário removido após erro: {filepath}")
-            
             logger.error(f"Erro ao processar arquivo: {str(e)}")
             logger.debug(traceback.format_exc())
             
@@ -538,9 +1293,14 @@ def predict_file():
 def predict_base64():
     """Classifica uma imagem de plâncton enviada em base64."""
     start_time = time.time()
+    deadline, priority = request_deadline(), request_priority()
     
+    loading = model_loading_response()
+    if loading is not None:
+        return loading
+
     # Verificar se o PyTorch está disponível
-    if not pytorch_available:
+    if not inference_available:
         logger.error("Tentativa de predição sem PyTorch disponível")
         return jsonify({
             'success': False,
@@ -554,6 +1314,10 @@ def predict_base64():
             'success': False,
             'error': 'Serviço de classificação indisponível'
         }), 503
+
+    overloaded = overload_response(priority)
+    if overloaded is not None:
+        return overloaded
     
     try:
         # Verificar se o conteúdo é JSON
@@ -581,6 +1345,11 @@ def predict_base64():
                 'error': 'String base64 vazia'
             }), 400
         
+        model_id, heads = requested_model(data), requested_heads(data)
+        heads_classifier, invalid = resolve_models(model_id, heads)
+        if invalid:
+            return invalid
+
         # Decodifica a imagem base64
         try:
             # Remover cabeçalho de data URI se presente
@@ -604,100 +1373,26 @@ def predict_base64():
                 'error': f'Imagem muito grande: {len(image_data)/1024/1024:.1f}MB (máximo: {MAX_CONTENT_LENGTH/1024/1024:.1f}MB)'
             }), 413
         
-        # Verificar se os dados são uma imagem válida
-        try:
-            img = Image.open(io.BytesIO(image_data))
-            width, height = img.size
-            
-            # Verificar dimensões
-            if width < MIN_IMAGE_SIZE or height < MIN_IMAGE_SIZE:
-                logger.warning(f"Imagem base64 muito pequena: {width}x{height}px")
-                return jsonify({
-                    'success': False,
-                    'error': f'Imagem muito pequena: {width}x{height}px (mínimo: {MIN_IMAGE_SIZE}px)'
-                }), 400
-                
-            if width > MAX_IMAGE_SIZE or height > MAX_IMAGE_SIZE:
-                logger.warning(f"Imagem base64 muito grande: {width}x{height}px")
-                return jsonify({
-                    'success': False,
-                    'error': f'Imagem muito grande: {width}x{height}px (máximo: {MAX_IMAGE_SIZE}px)'
-                }), 400
-                
-            # Determinar formato da imagem
-            img_format = img.format.lower() if img.format else 'jpeg'
-            
-            # Verificar se o formato precisa ser convertido
-            needs_conversion = False
-            target_format = 'jpeg'  # Formato padrão para conversão
-            
-            if img_format in EXTENSION_FORMAT_MAP:
-                target_format = EXTENSION_FORMAT_MAP[img_format]
-                # Se o formato original não é diretamente suportado pelo modelo, converter
-                if img_format not in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff']:
-                    needs_conversion = True
-                    logger.info(f"Formato {img_format} será convertido para {target_format}")
-            else:
-                # Formato não reconhecido, usar padrão
-                needs_conversion = True
-                logger.info(f"Formato não reconhecido, convertendo para {target_format}")
-                
-            # Se precisar converter, fazer isso agora
-            if needs_conversion:
-                # Criar um novo buffer para a imagem convertida
-                converted_buffer = io.BytesIO()
-                # Salvar a imagem no formato alvo
-                img.save(converted_buffer, format=target_format)
-                # Atualizar os dados da imagem e o formato
-                image_data = converted_buffer.getvalue()
-                img_format = target_format.lower()
-                logger.info(f"Imagem convertida para {target_format}")
-                
-            # Garantir que o formato final seja válido para o nome do arquivo
-            if img_format.upper() not in [fmt.upper() for fmt in EXTENSION_FORMAT_MAP.values()]:
-                img_format = 'jpeg'
-                
-        except Exception as e:
-            logger.warning(f"Dados base64 não são uma imagem válida: {str(e)}")
+        # Verificar se os dados são uma imagem válida, sem gravá-los em disco
+        img, error_message = open_image_bytes(image_data)
+        if img is None:
+            logger.warning(f"Validação de imagem base64 falhou: {error_message}")
             return jsonify({
                 'success': False,
-                'error': 'Dados base64 não são uma imagem válida'
+                'error': error_message
             }), 400
         
-        # Salva a imagem temporariamente
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{img_format}') as temp_file:
-            temp_file.write(image_data)
-            temp_filepath = temp_file.name
-            
-        logger.info(f"Imagem base64 salva temporariamente: {temp_filepath}")
+        width, height = img.size
+        img_format = img.format.lower() if img.format else 'desconhecido'
         
         try:
-            # Validar a imagem (apenas para verificação adicional)
-            is_valid, error_message, converted_path = validate_image(temp_filepath)
-            if not is_valid:
-                logger.warning(f"Validação de imagem base64 falhou: {error_message}")
-                os.remove(temp_filepath)
-                if converted_path and os.path.exists(converted_path):
-                    os.remove(converted_path)
-                return jsonify({
-                    'success': False,
-                    'error': error_message
-                }), 400
-                
-            # Usar o arquivo convertido se existir
-            prediction_path = converted_path if converted_path else temp_filepath
-            
             # Faz a predição
-            result = plankton_classifier.predict(prediction_path)
-            
-            # Remove os arquivos temporários
-            os.remove(temp_filepath)
-            logger.info(f"Arquivo temporário removido: {temp_filepath}")
-            if converted_path and os.path.exists(converted_path):
-                os.remove(converted_path)
-                logger.info(f"Arquivo convertido removido: {converted_path}")
+            result, prediction_fields = classify(image_data, img, model_id, heads, heads_classifier, deadline, priority)
             
             if not result.get('success', False):
+                rejected = admission_error_response(result)
+                if rejected:
+                    return rejected
                 logger.error(f"Erro na predição base64: {result.get('error', 'Erro desconhecido')}")
                 return jsonify({
                     'success': False,
@@ -710,7 +1405,7 @@ def predict_base64():
             
             response = {
                 'success': True,
-                'prediction': result,
+                **prediction_fields,
                 'processing_time': round(total_time, 3),
                 'image_info': {
                     'format': img_format,
@@ -720,15 +1415,10 @@ def predict_base64():
                 }
             }
             
-            logger.info(f"Predição base64 bem-sucedida: {result.get('class')} ({result.get('confidence', 0):.2f})")
+            logger.info(f"Predição base64 bem-sucedida: {describe_prediction(prediction_fields)}")
             return jsonify(response)
             
         except Exception as e:
-            # Remove o arquivo em caso de erro
-            if os.path.exists(temp_filepath):
-                os.remove(temp_filepath)
-                logger.info(f"Arquivo temporário removido após erro: {temp_filepath}")
-            
             logger.error(f"Erro ao processar imagem base64: {str(e)}")
             logger.debug(traceback.format_exc())
             
@@ -746,6 +1436,390 @@ def predict_base64():
             'error': f'Erro interno do servidor: {str(e)}'
         }), 500
 
+@app.route('/predict_raw', methods=['POST'])
+def predict_raw():
+    """Classifica uma imagem enviada como corpo binário (application/octet-stream ou image/*).
+
+    Sem multipart nem base64: os bytes do corpo seguem direto para a validação e
+    o decodificador. O modelo vai na query string (?model= ou ?models=) e o nome
+    do arquivo, opcional, no cabeçalho X-Filename. A resposta é a mesma de /predict.
+    """
+    start_time = time.time()
+    deadline, priority = request_deadline(), request_priority()
+
+    loading = model_loading_response()
+    if loading is not None:
+        return loading
+
+    if not inference_available:
+        logger.error("Tentativa de predição sem PyTorch disponível")
+        return jsonify({
+            'success': False,
+            'error': 'PyTorch não está disponível. Reinstale o PyTorch para usar este recurso.'
+        }), 503
+
+    if plankton_classifier is None:
+        logger.error("Tentativa de predição com classificador não inicializado")
+        return jsonify({
+            'success': False,
+            'error': 'Serviço de classificação indisponível'
+        }), 503
+
+    overloaded = overload_response(priority)
+    if overloaded is not None:
+        return overloaded
+
+    try:
+        content_type = request.mimetype or ''
+        if content_type != 'application/octet-stream' and not content_type.startswith('image/'):
+            logger.warning(f"Content-Type não suportado em /predict_raw: {content_type or 'ausente'}")
+            return jsonify({
+                'success': False,
+                'error': 'Envie a imagem no corpo com Content-Type application/octet-stream ou image/*'
+            }), 415
+
+        filename = secure_filename(request.headers.get('X-Filename', '')) or None
+        if filename and not allowed_file(filename):
+            logger.warning(f"Tipo de arquivo não permitido: {filename}")
+            return jsonify({
+                'success': False,
+                'error': 'Tipo de arquivo não permitido',
+                'allowed_types': list(ALLOWED_EXTENSIONS)
+            }), 400
+
+        model_id, heads = requested_model(request.args), requested_heads(request.args)
+        heads_classifier, invalid = resolve_models(model_id, heads)
+        if invalid:
+            return invalid
+
+        # Corpo lido uma única vez, sem cópia para o formulário (acima de MAX_CONTENT_LENGTH o Flask responde 413)
+        image_data = request.get_data(cache=False)
+        img, error_message = open_image_bytes(image_data)
+        if img is None:
+            logger.warning(f"Validação de imagem falhou: {error_message}")
+            return jsonify({
+                'success': False,
+                'error': error_message
+            }), 400
+
+        result, prediction_fields = classify(image_data, img, model_id, heads, heads_classifier, deadline, priority)
+        if not result.get('success', False):
+            rejected = admission_error_response(result)
+            if rejected:
+                return rejected
+            logger.error(f"Erro na predição: {result.get('error', 'Erro desconhecido')}")
+            return jsonify({
+                'success': False,
+                'error': result.get('error', 'Erro na predição'),
+                'details': result
+            }), 500
+
+        logger.info(f"Predição bem-sucedida para {filename or 'corpo binário'}: {describe_prediction(prediction_fields)}")
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            **prediction_fields,
+            'processing_time': round(time.time() - start_time, 3)
+        })
+
+    except RequestEntityTooLarge:
+        # Respondido pelo handler de 413
+        raise
+    except Exception as e:
+        logger.error(f"Erro interno do servidor (raw): {str(e)}")
+        logger.debug(traceback.format_exc())
+
+        return jsonify({
+            'success': False,
+            'error': f'Erro interno do servidor: {str(e)}'
+        }), 500
+
+def upload_format():
+    """Formato de um envio em lote pelo Content-Type: multipart com os arquivos, ou .zip/.tar no corpo.
+
+    Returns:
+        tuple: ('multipart', 'zip' ou 'tar'; boundary do multipart; resposta de erro ou None)
+    """
+    content_type = request.mimetype or ''
+    if content_type == 'multipart/form-data':
+        boundary = request.mimetype_params.get('boundary')
+        if not boundary:
+            return None, None, (jsonify({'success': False, 'error': 'Cabeçalho multipart sem boundary'}), 400)
+        return jobs.MULTIPART, boundary, None
+    kind = batch_upload.ARCHIVE_CONTENT_TYPES.get(content_type)
+    if kind is None:
+        logger.warning(f"Content-Type não suportado em {request.path}: {content_type or 'ausente'}")
+        return None, None, (jsonify({
+            'success': False,
+            'error': 'Envie multipart/form-data com os arquivos, ou um .zip/.tar no corpo'
+        }), 415)
+    return kind, None, None
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """Classifica muitas imagens em uma requisição e transmite um resultado NDJSON por imagem.
+
+    Aceita multipart/form-data com vários arquivos (arquivos .zip/.tar entre eles são
+    abertos) ou um .zip/.tar no corpo (application/zip, application/x-tar, application/gzip).
+    O modelo vai na query string (?model= ou ?models=). Cada linha traz o índice, o nome
+    do arquivo e o resultado (ou o erro daquela imagem), na ordem do envio; a última
+    linha traz o resumo do lote. As imagens entram na fila em massa, atrás das
+    predições interativas (X-Priority: interactive muda isso).
+    """
+    loading = model_loading_response()
+    if loading is not None:
+        return loading
+
+    if not inference_available or plankton_classifier is None:
+        logger.error("Tentativa de predição em lote sem classificador disponível")
+        return jsonify({
+            'success': False,
+            'error': 'Serviço de classificação indisponível'
+        }), 503
+
+    kind, boundary, invalid = upload_format()
+    if invalid:
+        return invalid
+
+    priority = request_priority(BULK)
+    overloaded = overload_response(priority)
+    if overloaded is not None:
+        return overloaded
+
+    model_id, heads = requested_model(request.args), requested_heads(request.args)
+    heads_classifier, invalid = resolve_models(model_id, heads)
+    if invalid:
+        return invalid
+
+    try:
+        runtime = batch_runtime(model_id, heads, heads_classifier)
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+
+    # O envio inteiro vai para um temporário em disco antes de a resposta começar
+    request.max_content_length = int(PREDICT_BATCH_MAX_UPLOAD_MB * 1024 * 1024)
+    body = batch_upload.spool_stream(request.stream)
+    if kind == jobs.MULTIPART:
+        items = batch_upload.iter_multipart(body, boundary, MAX_CONTENT_LENGTH)
+    else:
+        items = batch_upload.iter_archive(body, kind, MAX_CONTENT_LENGTH)
+
+    def generate():
+        start_time = time.time()
+        counts = collections.Counter()
+        error = None
+        try:
+            for record in stream_predictions(itertools.islice(items, PREDICT_BATCH_MAX_IMAGES), lambda: runtime,
+                                             priority=priority):
+                counts['succeeded' if record['success'] else 'failed'] += 1
+                yield json.dumps(record, ensure_ascii=False) + '\n'
+            counts['skipped'] = sum(1 for _ in items)
+        except ValueError as e:
+            # Corpo multipart ou arquivo compactado malformado: as imagens já lidas foram respondidas
+            error = str(e)
+            logger.warning(f"Envio de /predict_batch interrompido: {error}")
+        finally:
+            body.close()
+
+        summary = {
+            'images': counts['succeeded'] + counts['failed'],
+            'succeeded': counts['succeeded'],
+            'failed': counts['failed'],
+            'skipped': counts['skipped'],
+            'processing_time': round(time.time() - start_time, 3)
+        }
+        if error:
+            summary['error'] = error
+        elif counts['skipped']:
+            summary['error'] = f'Limite de {PREDICT_BATCH_MAX_IMAGES} imagens por requisição excedido'
+        logger.info(f"Lote de {summary['images']} imagens classificado em {summary['processing_time']}s "
+                    f"({summary['failed']} com erro)")
+        yield json.dumps({'summary': summary}, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def job_manifest(data):
+    """Caminhos das imagens de um manifesto de /jobs: {"paths": [...]} ou {"directory": "..."}.
+
+    Os caminhos são resolvidos dentro de PLANKTON_JOBS_DATA_ROOT (relativos a ele, e sem
+    links simbólicos que saiam dele); chamado só com o diretório configurado.
+
+    Returns:
+        tuple: (caminhos absolutos, None) ou (None, mensagem de erro)
+    """
+    root = os.path.realpath(JOBS_DATA_ROOT)
+
+    def resolve(path):
+        """Caminho real dentro do diretório de dados, ou None se ele sair do diretório."""
+        resolved = os.path.realpath(os.path.join(root, str(path)))
+        return resolved if os.path.commonpath([root, resolved]) == root else None
+
+    if data.get('directory'):
+        directory = resolve(data['directory'])
+        if directory is None:
+            return None, f"Diretório fora de PLANKTON_JOBS_DATA_ROOT: {data['directory']}"
+        if not os.path.isdir(directory):
+            return None, f"Diretório não encontrado: {data['directory']}"
+        listed = batch_upload.list_images(directory, ALLOWED_EXTENSIONS)
+        if not listed:
+            return None, f"Nenhuma imagem encontrada em {data['directory']}"
+    elif isinstance(data.get('paths'), list) and data['paths']:
+        listed = [str(path) for path in data['paths']]
+    else:
+        return None, "Informe 'paths' (lista de arquivos) ou 'directory' no manifesto"
+
+    paths = []
+    for path in listed:
+        resolved = resolve(path)
+        if resolved is None:
+            return None, f'Caminho fora de PLANKTON_JOBS_DATA_ROOT: {path}'
+        paths.append(resolved)
+    return paths, None
+
+def queue_full_response(message):
+    response = jsonify({'success': False, 'error': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(JOBS_RETRY_AFTER)
+    return response
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Cria um trabalho de classificação assíncrono e responde 202 sem esperar as predições.
+
+    Aceita JSON com um manifesto ({"paths": [...]} ou {"directory": "..."}, mais "model" ou
+    "models"), ou o mesmo envio de /predict_batch (multipart ou .zip/.tar no corpo, com o
+    modelo na query string). O progresso fica em GET /jobs/<id> e os resultados em
+    GET /jobs/<id>/results.
+    """
+    unavailable = jobs_unavailable_response()
+    if unavailable is not None:
+        return unavailable
+
+    if not inference_available or plankton_classifier is None:
+        logger.error("Tentativa de criar trabalho sem classificador disponível")
+        return jsonify({
+            'success': False,
+            'error': 'Serviço de classificação indisponível'
+        }), 503
+
+    paths = kind = boundary = None
+    if request.mimetype == 'application/json':
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Manifesto JSON inválido'}), 400
+        if not JOBS_DATA_ROOT:
+            # Sem diretório de dados, um manifesto permitiria ler qualquer arquivo do servidor
+            return jsonify({'success': False, 'error': 'Manifestos desativados: defina PLANKTON_JOBS_DATA_ROOT '
+                                                       'ou envie as imagens (multipart ou .zip/.tar)'}), 403
+        model_id, heads = requested_model(data), requested_heads(data)
+        paths, error_message = job_manifest(data)
+        if error_message:
+            return jsonify({'success': False, 'error': error_message}), 400
+    else:
+        kind, boundary, invalid = upload_format()
+        if invalid:
+            return invalid
+        model_id, heads = requested_model(request.args), requested_heads(request.args)
+
+    _, invalid = resolve_models(model_id, heads)
+    if invalid:
+        return invalid
+
+    job_id = JOB_STORE.new_id()
+    try:
+        if paths is not None:
+            job = JOB_STORE.create(jobs.MANIFEST, json.dumps(paths), total=len(paths), model_id=model_id,
+                                   heads=heads, job_id=job_id)
+        else:
+            # Fila cheia: recusa antes de gravar o envio (create confere de novo, atomicamente)
+            active = JOB_STORE.get_stats()['jobs']
+            if active[jobs.QUEUED] + active[jobs.RUNNING] >= JOB_STORE.max_active:
+                return queue_full_response(f'Fila de trabalhos cheia (máximo: {JOB_STORE.max_active})')
+            request.max_content_length = int(PREDICT_BATCH_MAX_UPLOAD_MB * 1024 * 1024)
+            with open(JOB_STORE.upload_path(job_id), 'wb') as f:
+                shutil.copyfileobj(request.stream, f, batch_upload.CHUNK_SIZE)
+            job = JOB_STORE.create(kind, boundary, model_id=model_id, heads=heads, job_id=job_id)
+    except jobs.QueueFullError as e:
+        JOB_STORE.discard_upload(job_id)
+        logger.warning(str(e))
+        return queue_full_response(str(e))
+    except Exception:
+        JOB_STORE.discard_upload(job_id)
+        raise
+
+    JOB_RUNNER.notify()
+    logger.info(f"Trabalho {job.id} criado ({job.source_kind}"
+                f"{f', {job.total} imagens' if job.total else ''})")
+    response = jsonify({'success': True, 'job': job.to_dict()})
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response
+
+def job_not_found(job_id):
+    return jsonify({'success': False, 'error': f'Trabalho não encontrado: {job_id}'}), 404
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Trabalhos mais recentes, com o progresso de cada um."""
+    unavailable = jobs_unavailable_response()
+    if unavailable is not None:
+        return unavailable
+    return jsonify({'success': True, 'jobs': [job.to_dict() for job in JOB_STORE.list()]})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Estado e progresso de um trabalho."""
+    unavailable = jobs_unavailable_response()
+    if unavailable is not None:
+        return unavailable
+    job = JOB_STORE.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    """Uma página dos resultados já gravados (?offset=, ?limit= até 1000), na ordem das imagens."""
+    unavailable = jobs_unavailable_response()
+    if unavailable is not None:
+        return unavailable
+    job = JOB_STORE.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(1000, max(1, int(request.args.get('limit', 100))))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'offset e limit devem ser inteiros'}), 400
+
+    results = JOB_STORE.results(job_id, offset, limit)
+    # None quando o trabalho terminou e não há mais resultados; senão, o offset da próxima página
+    next_offset = results[-1]['index'] + 1 if results else offset
+    if job.status not in jobs.ACTIVE_STATES and next_offset >= job.processed:
+        next_offset = None
+    return jsonify({
+        'success': True,
+        'job': job.to_dict(),
+        'offset': offset,
+        'results': results,
+        'next_offset': next_offset
+    })
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancela um trabalho da fila ou em execução; os resultados já gravados são mantidos."""
+    unavailable = jobs_unavailable_response()
+    if unavailable is not None:
+        return unavailable
+    job = JOB_STORE.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    if job.status not in jobs.ACTIVE_STATES:
+        return jsonify({'success': False, 'error': f'Trabalho já terminou ({job.status})', 'job': job.to_dict()}), 409
+    job = JOB_STORE.cancel(job_id)
+    logger.info(f"Cancelamento do trabalho {job_id} pedido ({job.status})")
+    return jsonify({'success': True, 'job': job.to_dict()})
+
 @app.errorhandler(413)
 def too_large(e):
     """Handler para arquivos muito grandes."""
@@ -766,9 +1840,15 @@ def not_found(e):
         'available_endpoints': [
             '/',
             '/status',
+            '/readyz',
+            '/metrics',
             '/predict',
             '/predict_base64',
-            '/classes'
+            '/predict_raw',
+            '/predict_batch',
+            '/jobs',
+            '/classes',
+            '/admin/reload'
         ]
     }), 404
 
@@ -797,22 +1877,9 @@ if __name__ == '__main__':
     logger.info("📡 Servidor rodando em: http://0.0.0.0:5000")
     logger.info("📋 Acesse http://localhost:5000 para ver a documentação da API")
     
-    # Verifica se o modelo está carregado
-    if plankton_classifier is None:
-        logger.error("❌ Classificador de plâncton não inicializado!")
-    else:
-        model_info = plankton_classifier.get_model_info()
-        if model_info.get('model_loaded', False):
-            logger.info("✅ Modelo de IA carregado com sucesso!")
-            logger.info(f"🔬 Classes suportadas: {', '.join(model_info.get('classes', []))}")
-            
-            # Informações adicionais do modelo
-            if 'parameters' in model_info:
-                logger.info(f"📊 Parâmetros do modelo: {model_info['parameters'].get('total', 0):,}")
-            if 'device' in model_info:
-                logger.info(f"💻 Dispositivo: {model_info['device'].get('type', 'cpu')}")
-        else:
-            logger.error("❌ Erro ao carregar o modelo de IA!")
+    # O modelo continua carregando em segundo plano; o resumo sai no log ao terminar
+    if not MODEL_LOADER.ready:
+        logger.info("⏳ Modelo de IA carregando em segundo plano (acompanhe em /readyz)")
     
     # Iniciar o servidor
     try:
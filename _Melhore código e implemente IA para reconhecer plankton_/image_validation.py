@@ -0,0 +1,211 @@
+"""
+Validação de imagens pelo cabeçalho, antes de qualquer decodificação de pixels.
+
+Uma única passada sobre os bytes já recebidos, do teste mais barato ao mais caro:
+
+1. tamanho do arquivo;
+2. assinatura (magic bytes) de um formato aceito: sem assinatura conhecida, a
+   imagem é recusada sem passar pelo PIL, que testaria plugin por plugin;
+3. largura e altura lidas do cabeçalho com struct (JPEG, PNG, GIF, BMP, WebP,
+   PSD e TIFF): imagens pequenas ou grandes demais, inclusive bombas de
+   descompressão (poucos KB que declaram dezenas de milhares de pixels por
+   lado), são recusadas em microssegundos;
+4. Image.open restrito ao formato identificado, que só lê o cabeçalho; a
+   imagem aberta segue para o pré-processamento, que decodifica os pixels uma
+   única vez.
+
+Formatos com assinatura mas sem leitor de cabeçalho aqui (HEIF) ou cabeçalhos
+fora do padrão esperado têm as dimensões conferidas depois do Image.open, que
+também só lê o cabeçalho.
+"""
+
+import io
+import logging
+import struct
+
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger("image_validation")
+
+MIN_FILE_SIZE = 100  # bytes; menos que isso não é uma imagem válida
+
+# Marcas (ftyp) de contêineres HEIF/HEIC
+_HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+
+# Marcadores JPEG de início de quadro (SOFn) que trazem as dimensões; C4, C8 e CC são outros segmentos
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def sniff_format(data):
+    """Formato (nome do plugin do PIL) pela assinatura dos primeiros bytes, ou None se desconhecido."""
+    if data[:3] == b"\xff\xd8\xff":
+        return "JPEG"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "PNG"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if data[:2] == b"BM":
+        return "BMP"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP"
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return "TIFF"
+    if data[:4] == b"8BPS":
+        return "PSD"
+    if data[4:8] == b"ftyp" and data[8:12] in _HEIF_BRANDS:
+        return "HEIF"
+    return None
+
+
+def _jpeg_size(data):
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:  # bytes de preenchimento entre segmentos
+            offset += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # marcadores sem comprimento
+            offset += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack_from(">HH", data, offset + 5)
+            return width, height
+        offset += 2 + struct.unpack_from(">H", data, offset + 2)[0]
+    return None
+
+
+def _png_size(data):
+    if data[12:16] != b"IHDR":
+        return None
+    return struct.unpack_from(">II", data, 16)
+
+
+def _gif_size(data):
+    return struct.unpack_from("<HH", data, 6)
+
+
+def _bmp_size(data):
+    if struct.unpack_from("<I", data, 14)[0] == 12:  # cabeçalho OS/2 (BITMAPCOREHEADER)
+        return struct.unpack_from("<HH", data, 18)
+    width, height = struct.unpack_from("<ii", data, 18)
+    return abs(width), abs(height)  # altura negativa: linhas de cima para baixo
+
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and data[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack_from("<HH", data, 26)
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and data[20] == 0x2F:
+        bits = struct.unpack_from("<I", data, 21)[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return (int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1)
+    return None
+
+
+def _tiff_size(data):
+    # Primeiro IFD: tags 256 (ImageWidth) e 257 (ImageLength), do tipo SHORT ou LONG
+    endian = "<" if data[:2] == b"II" else ">"
+    ifd = struct.unpack_from(endian + "I", data, 4)[0]
+    size = {}
+    for index in range(struct.unpack_from(endian + "H", data, ifd)[0]):
+        tag, field_type, _, value = struct.unpack_from(endian + "HHI4s", data, ifd + 2 + 12 * index)
+        if tag in (256, 257):
+            size[tag] = struct.unpack_from(endian + ("H" if field_type == 3 else "I"), value)[0]
+    return (size[256], size[257]) if len(size) == 2 else None
+
+
+def _psd_size(data):
+    height, width = struct.unpack_from(">II", data, 14)
+    return width, height
+
+
+_SIZE_READERS = {
+    "JPEG": _jpeg_size,
+    "PNG": _png_size,
+    "GIF": _gif_size,
+    "BMP": _bmp_size,
+    "WEBP": _webp_size,
+    "TIFF": _tiff_size,
+    "PSD": _psd_size,
+}
+
+
+def header_dimensions(data, image_format):
+    """(largura, altura) lidas do cabeçalho, ou None se o formato não tiver leitor ou o cabeçalho for inesperado."""
+    reader = _SIZE_READERS.get(image_format)
+    if reader is None:
+        return None
+    try:
+        return reader(data)
+    except (struct.error, IndexError):
+        return None
+
+
+def check_dimensions(width, height, min_dimension, max_dimension):
+    """Mensagem de erro para dimensões fora dos limites, ou "" se estiverem dentro."""
+    if width < min_dimension or height < min_dimension:
+        return f"Imagem muito pequena: {width}x{height}px (mínimo: {min_dimension}x{min_dimension}px)"
+    if width > max_dimension or height > max_dimension:
+        return f"Imagem muito grande: {width}x{height}px (máximo: {max_dimension}x{max_dimension}px)"
+    return ""
+
+
+def check_header(data, max_file_size, min_dimension, max_dimension):
+    """Etapas 1 a 3, sem o PIL.
+
+    Returns:
+        tuple: (formato, dimensões do cabeçalho ou None, mensagem de erro ou "")
+    """
+    file_size = len(data)
+    if file_size > max_file_size:
+        return None, None, (f"Arquivo muito grande: {file_size / 1024 / 1024:.1f}MB "
+                            f"(máximo: {max_file_size / 1024 / 1024:.1f}MB)")
+    if file_size < MIN_FILE_SIZE:
+        return None, None, f"Arquivo muito pequeno: {file_size} bytes"
+
+    image_format = sniff_format(data)
+    if image_format is None:
+        return None, None, "Arquivo não é uma imagem válida"
+
+    size = header_dimensions(data, image_format)
+    error_message = check_dimensions(*size, min_dimension, max_dimension) if size is not None else ""
+    return image_format, size, error_message
+
+
+def open_validated(data, max_file_size, min_dimension, max_dimension):
+    """Valida os bytes de uma imagem pelo cabeçalho e a abre (sem decodificar os pixels).
+
+    Args:
+        data (bytes): Conteúdo do arquivo de imagem
+        max_file_size (int): Tamanho máximo do arquivo em bytes
+        min_dimension (int): Largura e altura mínimas em pixels
+        max_dimension (int): Largura e altura máximas em pixels
+
+    Returns:
+        tuple: (PIL.Image.Image, "") ou (None, mensagem de erro)
+    """
+    image_format, size, error_message = check_header(data, max_file_size, min_dimension, max_dimension)
+    if error_message:
+        return None, error_message
+
+    try:
+        # Só o plugin do formato identificado é tentado; o HEIF depende de um plugin registrado no PIL
+        img = Image.open(io.BytesIO(data), formats=None if image_format == "HEIF" else [image_format])
+    except UnidentifiedImageError:
+        return None, "Arquivo não é uma imagem válida"
+    except Image.DecompressionBombError:
+        return None, f"Imagem muito grande (acima de {Image.MAX_IMAGE_PIXELS} pixels)"
+    except Exception as e:
+        logger.error(f"Erro ao abrir imagem: {str(e)}")
+        return None, f"Erro ao processar imagem: {str(e)}"
+
+    if size is None or tuple(size) != img.size:
+        # Sem dimensões no cabeçalho lido aqui (ou divergentes): vale o que o PIL leu
+        error_message = check_dimensions(*img.size, min_dimension, max_dimension)
+        if error_message:
+            return None, error_message
+    return img, ""
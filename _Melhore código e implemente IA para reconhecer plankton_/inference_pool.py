@@ -0,0 +1,424 @@
+"""
+Pool de processos de inferência com os pesos do modelo compartilhados.
+
+Em um único processo, decodificação, JSON e logging disputam o GIL com a
+inferência. O pool cria N processos por fork a partir do classificador já
+carregado no processo do servidor: os pesos ficam nas páginas herdadas (cópia
+sob escrita, nunca escritas) e, no modelo eager, em memória compartilhada
+(share_memory), de modo que a memória não cresce linearmente com os workers.
+Pesos já mapeados do arquivo (pacote .safetensors ou .pth com mmap) ficam onde
+estão: as páginas do page cache já são compartilhadas, e share_memory as
+copiaria para memória anônima.
+
+O servidor envia os bytes codificados de cada imagem por uma fila
+multiprocessing; cada worker forma micro-lotes como o MicroBatchScheduler,
+decodifica, classifica e devolve os resultados por uma fila de retorno, que uma
+thread do servidor entrega às requisições que aguardam.
+
+O fork precisa acontecer antes de qualquer forward no processo do servidor: o
+pool OpenMP do PyTorch não sobrevive ao fork e o filho travaria. Por isso cada
+worker faz o próprio aquecimento (classifier.warmup) ao iniciar e avisa o
+servidor, que aguarda todos em wait_warm. Em sistemas sem fork (Windows) o
+servidor continua com o agendador em processo.
+
+Depois que o servidor já executou forwards (um pool criado na recarga do
+modelo, com os modelos do registro e as cabeças já em uso no processo), o fork
+não é mais seguro: com classifier_factory os processos são criados por spawn e
+cada um carrega a própria cópia do modelo, sem compartilhar as páginas dos pesos.
+
+A fila multiprocessing não pode ser reordenada depois do envio; por isso o
+trabalho em massa (/predict_batch e /jobs) espera no servidor e só segue para
+os processos enquanto houver menos de um lote por processo em andamento, o que
+limita o que fica à frente de uma requisição interativa. Com os processos
+ocupados só por requisições interativas, o trabalho em massa ainda mantém uma
+fração 1/(interactive_weight + 1) dessa capacidade em andamento, para não parar.
+
+O limite de requisições interativas em andamento (max_queue_depth) e os prazos
+seguem o MicroBatchScheduler: acima do limite a requisição volta com um resultado "shed",
+e cada processo descarta, antes do forward, as imagens cujo prazo já venceu
+(time.monotonic é o mesmo relógio em todos os processos).
+"""
+
+import collections
+
+import itertools
+import logging
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+
+from inference_scheduler import (BULK, INTERACTIVE, PRIORITIES, LatencyTracker, PendingRequest, expired_result,
+                                 shed_result, wait_timeout)
+
+logger = logging.getLogger("inference_pool")
+
+FORK_AVAILABLE = "fork" in multiprocessing.get_all_start_methods()
+
+
+def _worker_main(worker_id, classifier, tasks, results, max_batch_size, max_wait_ms, intra_op_threads,
+                 warmup_batch_sizes, warmup_repeats, classifier_factory=None):
+    """Laço de um processo de inferência: aquece o modelo, forma lotes da fila de tarefas e devolve os resultados."""
+    if classifier_factory is not None:
+        # Processo criado por spawn: nada foi herdado do servidor, o modelo é carregado aqui
+        classifier = classifier_factory()
+    torch = sys.modules.get("torch")
+    if torch is not None and intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if classifier_factory is None and classifier.model_format == "onnx":
+        # A sessão do onnxruntime e seu pool de threads não sobrevivem ao fork
+        from onnx_backend import OnnxModel
+        classifier.model = OnnxModel(classifier.model.path, intra_op_threads=intra_op_threads)
+    try:
+        warmup = classifier.warmup(warmup_batch_sizes, warmup_repeats)
+    except Exception as e:
+        warmup = {"error": str(e)}
+    results.put(("warmup", worker_id, warmup))
+
+    running = True
+    while running:
+        task = tasks.get()
+        if task is None:
+            break
+
+        batch = [task]
+        deadline = time.monotonic() + max_wait_ms / 1000.0
+        while len(batch) < max_batch_size:
+            try:
+                task = tasks.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if task is None:
+                running = False
+                break
+            batch.append(task)
+
+        now = time.monotonic()
+        expired = [(task_id, expired_result()) for task_id, _, deadline in batch
+                   if deadline is not None and now >= deadline]
+        batch = [task for task in batch if task[2] is None or now < task[2]]
+        try:
+            outputs = classifier.predict_batch([source for _, source, _ in batch]) if batch else []
+        except Exception as e:
+            outputs = [{"error": f"Erro durante a predição: {str(e)}", "success": False}] * len(batch)
+            logger.exception(f"Erro durante a predição no processo de inferência {worker_id}")
+        results.put(("results", worker_id, expired + [(task_id, output)
+                                                      for (task_id, _, _), output in zip(batch, outputs)]))
+
+
+class InferencePool:
+    """Distribui as predições entre processos que compartilham o modelo carregado.
+
+    Tem a mesma interface de predict/get_stats/stop do MicroBatchScheduler.
+
+    Args:
+        classifier: PlanktonClassifierPyTorch já carregado (ainda sem nenhum forward, salvo com classifier_factory)
+        processes (int): Número de processos de inferência
+        max_batch_size (int): Número máximo de imagens por forward em cada processo
+        max_wait_ms (float): Espera máxima para completar um lote
+        intra_op_threads (int): Threads por operador em cada processo
+        warmup_batch_sizes (iterable): Tamanhos de lote aquecidos por cada processo ao iniciar
+        warmup_repeats (int): Execuções do aquecimento por tamanho de lote
+        max_queue_depth (int): Requisições interativas em andamento acima das quais novas são recusadas; 0 = sem limite
+        interactive_weight (int): Peso das requisições interativas sobre o trabalho em massa com os processos ocupados
+        classifier_factory: Função sem argumentos, serializável com pickle (ex.: functools.partial de uma função
+            de módulo), que cria o classificador em cada processo; com ela os processos são criados por spawn
+            e o classificador do servidor já pode ter executado forwards
+    """
+
+    def __init__(self, classifier, processes=2, max_batch_size=16, max_wait_ms=5.0, intra_op_threads=None,
+                 warmup_batch_sizes=(1,), warmup_repeats=2, max_queue_depth=0, interactive_weight=4,
+                 classifier_factory=None):
+        if not FORK_AVAILABLE and classifier_factory is None:
+            raise RuntimeError("O pool de processos de inferência requer fork (indisponível nesta plataforma)")
+        self.classifier = classifier
+        self.processes = max(1, int(processes))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.intra_op_threads = intra_op_threads
+        self.warmup_batch_sizes = list(warmup_batch_sizes)
+        self.warmup_repeats = warmup_repeats
+        self.max_queue_depth = max(0, int(max_queue_depth))
+        self.interactive_weight = max(1, int(interactive_weight))
+        self.classifier_factory = classifier_factory
+
+        self._context = multiprocessing.get_context("fork" if classifier_factory is None else "spawn")
+        self._tasks = None
+        self._results = None
+        self._workers = []
+        self._listener = None
+        self._running = False
+
+        self._pending = {}
+        # Tarefas interativas em andamento: só elas contam para max_queue_depth (o trabalho em massa tem o seu limite)
+        self._interactive_in_flight = 0
+        # Trabalho em massa ainda não enviado aos processos (ver _release_bulk)
+        self._bulk = collections.deque()
+        self._bulk_in_flight = 0
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count()
+
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._bulk_requests = 0
+        self._shed = 0
+        self._expired = 0
+        self._batches = 0
+        self._batched_requests = 0
+        self._per_worker = [0] * self.processes
+        self._latency = LatencyTracker()
+        # Tempos de aquecimento informados por cada processo
+        self._warmup = {}
+        self._warm = threading.Event()
+
+    def start(self):
+        if self._running:
+            return self
+        model = self.classifier.model
+        if (self.classifier_factory is None and self.classifier.model_format == "eager" and model is not None
+                and not self.classifier.weights_mapped):
+            # Pesos em memória compartilhada: os workers leem as mesmas páginas do servidor
+            model.share_memory()
+
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        self._workers = [
+            self._context.Process(
+                target=_worker_main, name=f"inference-worker-{i}", daemon=True,
+                args=(i, None if self.classifier_factory else self.classifier, self._tasks, self._results,
+                      self.max_batch_size, self.max_wait_ms, self.intra_op_threads, self.warmup_batch_sizes,
+                      self.warmup_repeats, self.classifier_factory))
+            for i in range(self.processes)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self._running = True
+        self._listener = threading.Thread(target=self._collect_results, name="inference-pool-results", daemon=True)
+        self._listener.start()
+        logger.info(f"Pool de inferência iniciado ({self.processes} processos, lote máximo: {self.max_batch_size}, "
+                    f"espera máxima: {self.max_wait_ms}ms, threads por processo: {self.intra_op_threads}, "
+                    f"início: {self._context.get_start_method()})")
+        return self
+
+    def stop(self, timeout=5.0):
+        """Encerra os processos depois que terminarem as tarefas já enviadas e o trabalho em massa retido.
+
+        O que não terminar dentro de timeout (por processo) volta com erro.
+        """
+        if not self._running:
+            return
+        # O trabalho em massa que espera no servidor segue para os processos antes dos sinais de parada:
+        # em uma recarga do modelo, o que já estava no pool termina no modelo anterior
+        while True:
+            with self._pending_lock:
+                if not self._bulk:
+                    self._running = False
+                    break
+                request = self._bulk.popleft()
+                self._bulk_in_flight += 1
+            self._enqueue(request.tensor, request)
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self._results.put(None)
+        self._listener.join(timeout)
+        self._workers = []
+
+        with self._pending_lock:
+            pending = list(self._pending.values()) + list(self._bulk)
+            self._pending.clear()
+            self._bulk.clear()
+            self._bulk_in_flight = 0
+            self._interactive_in_flight = 0
+        for request in pending:
+            request.set_result({"error": "Pool de inferência parado", "success": False})
+
+    def admit(self):
+        """False (e conta a recusa) se o limite de requisições interativas em andamento foi atingido."""
+        if not self.max_queue_depth or self.queue_depth() < self.max_queue_depth:
+            return True
+        with self._stats_lock:
+            self._shed += 1
+        return False
+
+    def submit(self, source, priority=INTERACTIVE, deadline=None):
+        """Envia uma imagem (bytes, caminho ou array) a um worker e retorna sem bloquear.
+
+        Args:
+            priority (str): INTERACTIVE ou BULK (espera no servidor até haver folga nos processos)
+            deadline (float): Prazo (time.monotonic) após o qual a imagem é descartada antes do forward
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridade desconhecida: {priority}")
+        if priority == INTERACTIVE:
+            return self._enqueue(source, deadline=deadline)[1]
+        request = PendingRequest(source, self.classifier, deadline, BULK)
+        with self._pending_lock:
+            self._bulk.append(request)
+        with self._stats_lock:
+            self._bulk_requests += 1
+        self._release_bulk()
+        return request
+
+    def _release_bulk(self):
+        """Envia trabalho em massa enquanto houver folga (menos de um lote por processo em andamento)
+        ou enquanto ele tiver menos que a sua fração da capacidade.
+
+        O que é enviado aqui não conta para max_queue_depth: a fila interativa fica livre para /predict.
+        """
+        capacity = self.processes * self.max_batch_size
+        share = max(1, capacity // (self.interactive_weight + 1))
+        while True:
+            with self._pending_lock:
+                if not self._bulk or (len(self._pending) >= capacity and self._bulk_in_flight >= share):
+                    return
+                request = self._bulk.popleft()
+                self._bulk_in_flight += 1
+            self._enqueue(request.tensor, request)
+
+    def _enqueue(self, source, request=None, deadline=None):
+        """Envia a tarefa aos processos; pedidos interativos (request None) respeitam max_queue_depth."""
+        bounded = request is None
+        request = request or PendingRequest(source, self.classifier, deadline)
+        task_id = next(self._ids)
+        if not self._running:
+            # Pool já desativado (ex.: substituído em uma recarga do modelo)
+            request.set_result({"error": "Pool de inferência parado", "success": False})
+            return task_id, request
+        with self._pending_lock:
+            depth = self._interactive_in_flight
+            shed = bounded and self.max_queue_depth and depth >= self.max_queue_depth
+            if not shed:
+                self._pending[task_id] = request
+                if bounded:
+                    self._interactive_in_flight += 1
+        with self._stats_lock:
+            if shed:
+                self._shed += 1
+            else:
+                self._requests += 1
+        if shed:
+            request.set_result(shed_result(depth))
+            return task_id, request
+        self._tasks.put((task_id, source, request.deadline))
+        return task_id, request
+
+    def predict(self, source, timeout=None, deadline=None, priority=INTERACTIVE):
+        """Classifica a imagem em um dos processos e aguarda o resultado."""
+        start_time = time.time()
+        if deadline is not None and time.monotonic() >= deadline:
+            with self._stats_lock:
+                self._expired += 1
+            return expired_result()
+        if priority == BULK:
+            task_id, request = None, self.submit(source, BULK, deadline)
+        else:
+            task_id, request = self._enqueue(source, deadline=deadline)
+        result = request.wait(wait_timeout(timeout, deadline))
+        if not request.done():
+            with self._pending_lock:
+                if task_id is not None:
+                    self._pop_pending(task_id)
+                elif request in self._bulk:
+                    self._bulk.remove(request)
+            if deadline is not None and time.monotonic() >= deadline:
+                # O processo descarta a imagem se ainda não a tiver começado
+                result = expired_result()
+        if result.get("success"):
+            result = dict(result, processing_time=round(time.time() - start_time, 3))
+        return result
+
+    def _collect_results(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                break
+            kind, worker_id, outputs = message
+            if kind == "warmup":
+                with self._stats_lock:
+                    self._warmup[worker_id] = outputs
+                    if len(self._warmup) == self.processes:
+                        self._warm.set()
+                continue
+            with self._stats_lock:
+                expired = sum(1 for _, output in outputs if output.get("expired"))
+                self._expired += expired
+                if expired < len(outputs):
+                    self._batches += 1
+                self._batched_requests += len(outputs) - expired
+                self._per_worker[worker_id] += len(outputs) - expired
+            now = time.monotonic()
+            for task_id, result in outputs:
+                with self._pending_lock:
+                    request = self._pop_pending(task_id)
+                # Requisições que desistiram (tempo limite) já saíram do dicionário
+                if request is not None:
+                    request.set_result(result)
+                    if not result.get("expired"):
+                        self._latency.record(request, now)
+            self._release_bulk()
+
+    def _pop_pending(self, task_id):
+        """Retira a tarefa de _pending e a desconta do contador da sua prioridade (com o lock)."""
+        request = self._pending.pop(task_id, None)
+        if request is not None:
+            if request.priority == BULK:
+                self._bulk_in_flight -= 1
+            else:
+                self._interactive_in_flight -= 1
+        return request
+
+    def wait_warm(self, timeout=None):
+        """Aguarda o aquecimento de todos os processos.
+
+        Returns:
+            dict: Tempos de aquecimento do primeiro processo (os demais são equivalentes)
+
+        Raises:
+            RuntimeError: Se o tempo esgotar ou algum processo falhar no aquecimento
+        """
+        if not self._warm.wait(timeout):
+            raise RuntimeError(f"Aquecimento dos processos de inferência não terminou em {timeout}s")
+        with self._stats_lock:
+            warmups = [self._warmup[i] for i in range(self.processes)]
+        failed = [warmup["error"] for warmup in warmups if "error" in warmup]
+        if failed:
+            raise RuntimeError(f"Falha no aquecimento de um processo de inferência: {failed[0]}")
+        return warmups[0]
+
+    def queue_depth(self):
+        """Requisições interativas em andamento (as que max_queue_depth limita)."""
+        with self._pending_lock:
+            return self._interactive_in_flight
+
+    def get_stats(self):
+        # Os contadores da fila são lidos antes: _pending_lock e _stats_lock nunca são tomados juntos
+        with self._pending_lock:
+            in_flight, interactive_in_flight, bulk_waiting = (len(self._pending), self._interactive_in_flight,
+                                                              len(self._bulk))
+        with self._stats_lock:
+            return {
+                "processes": self.processes,
+                "alive_processes": sum(worker.is_alive() for worker in self._workers),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "in_flight": in_flight,
+                "interactive_in_flight": interactive_in_flight,
+                "bulk_waiting": bulk_waiting,
+                "requests": self._requests,
+                "bulk_requests": self._bulk_requests,
+                "interactive_weight": self.interactive_weight,
+                "max_queue_depth_limit": self.max_queue_depth,
+                "shed": self._shed,
+                "expired": self._expired,
+                "batches": self._batches,
+                "average_batch_size": round(self._batched_requests / self._batches, 2) if self._batches else 0.0,
+                "requests_per_process": list(self._per_worker),
+                "warmed_processes": len(self._warmup),
+                "latency": self._latency.summary(),
+            }
@@ -0,0 +1,430 @@
+"""
+Agendador de micro-lotes para o classificador de plâncton.
+
+As threads de requisição do Flask pré-processam suas imagens e enfileiram os
+tensores aqui; uma thread de inferência agrupa o que estiver na fila em um único
+forward, limitado por um tamanho máximo de lote e por uma espera máxima em
+milissegundos, e devolve cada resultado à requisição que o aguarda. Com mais de
+um worker, os lotes continuam sendo formados um de cada vez, mas vários forwards
+podem rodar ao mesmo tempo (o número de threads de cada um vem de runtime_config.py).
+
+Prioridades: as requisições interativas (a classificação de uma imagem pelo
+operador) e o trabalho em massa (/predict_batch e os trabalhos de /jobs) ficam
+em filas separadas. A escolha é feita a cada lote: com as duas filas ocupadas,
+saem até interactive_weight lotes interativos para cada lote em massa, de modo
+que o operador passa à frente sem que o reprocessamento pare. Um lote em massa
+não espera por mais imagens; uma requisição interativa espera no máximo o
+forward em andamento. As latências (da fila ao resultado) das últimas
+requisições de cada prioridade são resumidas em percentis em get_stats.
+
+Controle de admissão: a fila interativa tem um limite (max_queue_depth); acima
+dele a requisição é recusada na hora com um resultado "shed", em vez de esperar
+sem limite. Uma requisição com prazo (deadline, em time.monotonic) que vence
+antes do forward é descartada com um resultado "expired", sem ocupar o lote.
+"""
+
+import collections
+import logging
+import math
+import threading
+import time
+import traceback
+
+logger = logging.getLogger("inference_scheduler")
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+# Latências guardadas por prioridade para os percentis (as mais recentes)
+LATENCY_SAMPLES = 2048
+
+
+class PendingRequest:
+    """Uma requisição enfileirada aguardando o resultado do seu lote."""
+
+    __slots__ = ("tensor", "classifier", "enqueued_at", "deadline", "priority", "result", "_event")
+
+    def __init__(self, tensor, classifier, deadline=None, priority=INTERACTIVE):
+        self.tensor = tensor
+        self.classifier = classifier
+        self.enqueued_at = time.monotonic()
+        self.deadline = deadline
+        self.priority = priority
+        self.result = None
+        self._event = threading.Event()
+
+    def set_result(self, result):
+        self.result = result
+        self._event.set()
+
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Bloqueia até o resultado ficar pronto.
+
+        Returns:
+            dict: Resultado da predição, ou um resultado de erro se o tempo esgotar
+        """
+        if not self._event.wait(timeout):
+            return {"error": f"Tempo limite de inferência excedido ({timeout}s)", "success": False}
+        return self.result
+
+    def expired(self, now=None):
+        return self.deadline is not None and (now or time.monotonic()) >= self.deadline
+
+
+def shed_result(depth):
+    return {"error": f"Servidor sobrecarregado: fila de inferência cheia ({depth} requisições)",
+            "success": False, "shed": True}
+
+
+def expired_result():
+    return {"error": "Prazo da requisição expirado antes da inferência", "success": False, "expired": True}
+
+
+def wait_timeout(timeout, deadline):
+    """Espera pelo resultado: o tempo limite, encurtado pelo prazo da requisição."""
+    if deadline is None:
+        return timeout
+    remaining = max(0.0, deadline - time.monotonic())
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def latency_percentiles(samples):
+    """Resumo (ms) de uma lista de latências em segundos: número de amostras, p50, p95 e p99."""
+    if not samples:
+        return {"samples": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ordered = sorted(samples)
+
+    def percentile(q):
+        return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)] * 1000, 2)
+
+    return {"samples": len(ordered), "p50_ms": percentile(0.50), "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99)}
+
+
+class LatencyTracker:
+    """Latências recentes por prioridade (janela de LATENCY_SAMPLES), seguras entre threads."""
+
+    def __init__(self, window=LATENCY_SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = {priority: collections.deque(maxlen=window) for priority in PRIORITIES}
+
+    def record(self, request, now=None):
+        with self._lock:
+            self._samples[request.priority].append((now or time.monotonic()) - request.enqueued_at)
+
+    def summary(self):
+        with self._lock:
+            samples = {priority: list(values) for priority, values in self._samples.items()}
+        return {priority: latency_percentiles(values) for priority, values in samples.items()}
+
+
+class MicroBatchScheduler:
+    """Agrupa requisições concorrentes em lotes para um único forward.
+
+    Args:
+        classifier: Instância de PlanktonClassifierPyTorch usada por padrão
+        max_batch_size (int): Número máximo de imagens por forward
+        max_wait_ms (float): Tempo máximo que a primeira requisição de um lote
+            espera por outras antes do lote ser despachado
+        workers (int): Threads de inferência (forwards simultâneos)
+        max_queue_depth (int): Requisições interativas na fila acima das quais novas são recusadas; 0 = sem limite
+        interactive_weight (int): Lotes interativos seguidos, com trabalho em massa esperando, antes de um lote em massa
+    """
+
+    def __init__(self, classifier, max_batch_size=16, max_wait_ms=5.0, workers=1, max_queue_depth=0,
+                 interactive_weight=4):
+        self.classifier = classifier
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.workers = max(1, int(workers))
+        self.max_queue_depth = max(0, int(max_queue_depth))
+        self.interactive_weight = max(1, int(interactive_weight))
+
+        self._queue = collections.deque()
+        self._bulk = collections.deque()
+        # Lotes interativos despachados desde o último lote em massa, com trabalho em massa esperando
+        self._interactive_streak = 0
+        self._cond = threading.Condition()
+        # Requisições enfileiradas ou em execução por classificador (ver wait_drained)
+        self._in_flight = collections.Counter()
+        # Um worker por vez forma o lote; os demais aguardam ou executam seus forwards
+        self._collect_lock = threading.Lock()
+        self._threads = []
+        self._running = False
+
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._bulk_requests = 0
+        self._bulk_batches = 0
+        self._shed = 0
+        self._expired = 0
+        self._batches = 0
+        self._max_queue_depth = 0
+        self._batch_size_histogram = collections.Counter()
+        self._queue_depth_histogram = collections.Counter()
+        self._total_batch_time = 0.0
+        self._latency = LatencyTracker()
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        self._threads = [threading.Thread(target=self._run, name=f"inference-scheduler-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Agendador de micro-lotes iniciado (lote máximo: {self.max_batch_size}, "
+                    f"espera máxima: {self.max_wait_ms}ms, workers: {self.workers})")
+        return self
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def admit(self):
+        """False (e conta a recusa) se a fila interativa estiver cheia; usado antes de ler a requisição."""
+        if not self.max_queue_depth or self.queue_depth() < self.max_queue_depth:
+            return True
+        with self._stats_lock:
+            self._shed += 1
+        return False
+
+    def submit(self, tensor, classifier=None, priority=INTERACTIVE, deadline=None):
+        """Enfileira um tensor já pré-processado e retorna sem bloquear.
+
+        Com a fila interativa cheia, o pedido volta já resolvido com um resultado "shed".
+
+        Args:
+            priority (str): INTERACTIVE ou BULK (fila em massa, sem limite de profundidade)
+            deadline (float): Prazo (time.monotonic) após o qual o pedido é descartado antes do forward
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridade desconhecida: {priority}")
+        bulk = priority == BULK
+        request = PendingRequest(tensor, classifier or self.classifier, deadline, priority)
+        with self._cond:
+            depth = len(self._queue)
+            shed = not bulk and self.max_queue_depth and depth >= self.max_queue_depth
+            if not shed:
+                (self._bulk if bulk else self._queue).append(request)
+                self._in_flight[request.classifier] += 1
+                depth += not bulk
+                self._cond.notify()
+        if shed:
+            request.set_result(shed_result(depth))
+            with self._stats_lock:
+                self._shed += 1
+            return request
+        with self._stats_lock:
+            self._requests += 1
+            if bulk:
+                self._bulk_requests += 1
+            else:
+                self._max_queue_depth = max(self._max_queue_depth, depth)
+        return request
+
+    def predict(self, source, timeout=None, classifier=None, deadline=None, priority=INTERACTIVE):
+        """Pré-processa a imagem na thread chamadora e aguarda o resultado do lote.
+
+        O classificador padrão é o do agendador; após uma recarga do modelo, quem já
+        tinha a referência ao anterior pode continuar nele. Com o prazo já vencido,
+        a imagem nem é decodificada.
+        """
+        classifier = classifier or self.classifier
+        start_time = time.time()
+        if deadline is not None and time.monotonic() >= deadline:
+            with self._stats_lock:
+                self._expired += 1
+            return expired_result()
+        tensor, error_msg = classifier.preprocess_input(source)
+        if tensor is None:
+            return {"error": error_msg, "success": False}
+
+        result = self.submit(tensor, classifier, priority, deadline).wait(wait_timeout(timeout, deadline))
+        if not result.get("success") and deadline is not None and time.monotonic() >= deadline:
+            # O cliente já desistiu; se ainda estiver na fila, o pedido é descartado antes do forward
+            result = expired_result()
+        if result.get("success"):
+            result = dict(result, processing_time=round(time.time() - start_time, 3))
+        return result
+
+    def _collect_batch(self):
+        """Retira da fila o próximo lote, ou None se o agendador foi parado."""
+        with self._collect_lock, self._cond:
+            first = None
+            while first is None:
+                while self._running and not self._queue and not self._bulk:
+                    self._cond.wait()
+                if not self._running:
+                    return None
+                first = self._pop_next()
+
+            batch = [first]
+            if first.priority == BULK:
+                # Só o que já está na fila em massa, sem esperar por mais imagens
+                while len(batch) < self.max_batch_size and self._bulk and \
+                        self._bulk[0].classifier is first.classifier:
+                    request = self._pop_live(self._bulk)
+                    if request is not None:
+                        batch.append(request)
+                return self._record_batch(batch, len(self._bulk))
+
+            dispatch_at = first.enqueued_at + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                if self._queue:
+                    # Só agrupa requisições destinadas ao mesmo modelo
+                    if self._queue[0].classifier is not first.classifier:
+                        break
+                    request = self._pop_live(self._queue)
+                    if request is not None:
+                        batch.append(request)
+                    continue
+                remaining = dispatch_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._record_batch(batch, len(self._queue))
+
+    def _pop_next(self):
+        """Primeiro pedido do próximo lote: interativo, salvo na vez do trabalho em massa (com o lock).
+
+        A prioridade só é decidida aqui, entre lotes: um lote já formado nunca é interrompido.
+        """
+        bulk_turn = self._bulk and (not self._queue or self._interactive_streak >= self.interactive_weight)
+        for queue in ((self._bulk, self._queue) if bulk_turn else (self._queue, self._bulk)):
+            request = self._pop_live(queue)
+            if request is not None:
+                if request.priority == BULK:
+                    self._interactive_streak = 0
+                    with self._stats_lock:
+                        self._bulk_batches += 1
+                elif self._bulk:
+                    self._interactive_streak += 1
+                return request
+        return None
+
+    def _pop_live(self, queue):
+        """Retira o próximo pedido ainda dentro do prazo; os vencidos são descartados (com o lock)."""
+        now = time.monotonic()
+        while queue:
+            request = queue.popleft()
+            if not request.expired(now):
+                return request
+            request.set_result(expired_result())
+            self._in_flight[request.classifier] -= 1
+            if self._in_flight[request.classifier] <= 0:
+                del self._in_flight[request.classifier]
+                # wait_drained espera pelo fim das requisições do classificador, inclusive as descartadas aqui
+                self._cond.notify_all()
+            with self._stats_lock:
+                self._expired += 1
+        return None
+
+    def _record_batch(self, batch, depth):
+        with self._stats_lock:
+            self._batches += 1
+            self._batch_size_histogram[len(batch)] += 1
+            self._queue_depth_histogram[_depth_bucket(depth)] += 1
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+
+            classifier = batch[0].classifier
+            batch_start = time.monotonic()
+            try:
+                results = classifier.predict_tensors([request.tensor for request in batch])
+            except Exception as e:
+                logger.error(f"Erro ao executar lote de inferência: {str(e)}")
+                logger.debug(traceback.format_exc())
+                results = [{"error": f"Erro durante a predição: {str(e)}", "success": False}] * len(batch)
+
+            with self._stats_lock:
+                self._total_batch_time += time.monotonic() - batch_start
+
+            now = time.monotonic()
+            for request, result in zip(batch, results):
+                request.set_result(result)
+                self._latency.record(request, now)
+            with self._cond:
+                self._in_flight[classifier] -= len(batch)
+                if self._in_flight[classifier] <= 0:
+                    del self._in_flight[classifier]
+                self._cond.notify_all()
+
+        # Libera quem ainda estiver esperando após a parada
+        with self._cond:
+            pending = list(self._queue) + list(self._bulk)
+            self._queue.clear()
+            self._bulk.clear()
+        for request in pending:
+            request.set_result({"error": "Agendador de inferência parado", "success": False})
+
+    def wait_drained(self, classifier, timeout=None):
+        """Aguarda até não haver requisições enfileiradas ou em execução para o classificador.
+
+        Returns:
+            bool: False se o tempo esgotar antes
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._in_flight.get(classifier) or not self._running, timeout)
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._queue)
+
+    def bulk_depth(self):
+        with self._cond:
+            return len(self._bulk)
+
+    def get_stats(self):
+        depth, bulk_depth = self.queue_depth(), self.bulk_depth()
+        with self._stats_lock:
+            avg_batch = (sum(size * count for size, count in self._batch_size_histogram.items()) / self._batches
+                         if self._batches else 0.0)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "workers": self.workers,
+                "queue_depth": depth,
+                "max_queue_depth": self._max_queue_depth,
+                "bulk_queue_depth": bulk_depth,
+                "requests": self._requests,
+                "bulk_requests": self._bulk_requests,
+                "bulk_batches": self._bulk_batches,
+                "interactive_weight": self.interactive_weight,
+                "max_queue_depth_limit": self.max_queue_depth,
+                "shed": self._shed,
+                "expired": self._expired,
+                "batches": self._batches,
+                "average_batch_size": round(avg_batch, 2),
+                "average_batch_time_ms": round(self._total_batch_time / self._batches * 1000, 2) if self._batches else 0.0,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_size_histogram.items())},
+                "queue_depth_histogram": {bucket: count for bucket, count in sorted(
+                    self._queue_depth_histogram.items(), key=lambda item: _bucket_order(item[0]))},
+                "latency": self._latency.summary(),
+            }
+
+
+def _depth_bucket(depth):
+    """Agrupa profundidades de fila em faixas de potência de 2 (0, 1, 2-3, 4-7, ...)."""
+    if depth < 2:
+        return str(depth)
+    low = 1 << (depth.bit_length() - 1)
+    return f"{low}-{2 * low - 1}"
+
+
+def _bucket_order(bucket):
+    return int(bucket.split("-")[0])
@@ -0,0 +1,143 @@
+"""
+Normalização de entrada embutida na primeira convolução do MobileNetV2.
+
+Com a normalização ImageNet x' = (x / 255 - média) / desvio, a primeira camada
+calcula conv(W, x') = conv(W / (255 * desvio), x) - conv(W / desvio, média). O
+primeiro termo é uma convolução direta sobre os pixels uint8; o segundo não
+depende da imagem e vira um bias. Com isso o modelo recebe tensores uint8 e o
+pré-processamento deixa de fazer as passadas de conversão e normalização em
+float.
+
+Nas bordas o preenchimento com zeros do modelo original equivale a pixels iguais
+à média, e não a zero; por isso o bias varia nas linhas e colunas de borda da
+saída. Essas correções são calculadas uma vez por tamanho de entrada e somadas
+apenas às bordas, de modo que o resultado é exato (salvo arredondamento em
+float32).
+
+Imagens monocromáticas podem ser passadas com um único canal: replicar o canal
+cinza três vezes equivale a somar os pesos da convolução sobre os canais.
+
+Ao rastrear o modelo para TorchScript/ONNX, a média é subtraída na própria
+conversão para float e a convolução usa o preenchimento com zeros, o que também é
+exato: o grafo fica sem as somas de borda e a convolução segue direto para o
+batchnorm, que os otimizadores (optimize_for_inference, onnxruntime) fundem.
+"""
+
+import threading
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class FoldedInputConv(nn.Module):
+    """Substitui a primeira convolução, recebendo pixels uint8 com 1 ou 3 canais.
+
+    Args:
+        conv (nn.Conv2d): Convolução original, treinada sobre entradas normalizadas
+        mean (sequence): Média por canal da normalização (escala 0-1)
+        std (sequence): Desvio padrão por canal da normalização (escala 0-1)
+    """
+
+    def __init__(self, conv, mean, std):
+        super().__init__()
+        if conv.in_channels != 3 or conv.groups != 1:
+            raise ValueError("A convolução de entrada deve ter 3 canais e groups=1")
+
+        weight = conv.weight.detach()
+        mean = torch.as_tensor(mean, dtype=weight.dtype, device=weight.device).view(1, 3, 1, 1)
+        std = torch.as_tensor(std, dtype=weight.dtype, device=weight.device).view(1, 3, 1, 1)
+
+        self.stride = conv.stride
+        self.padding = conv.padding
+        self.dilation = conv.dilation
+        self.kernel_size = conv.kernel_size
+
+        self.register_buffer("mean", mean)
+        self.register_buffer("std", std)
+        self.register_buffer("weight", weight / (255.0 * std))
+        # Pesos para entrada em tons de cinza: equivalente a replicar o canal
+        self.register_buffer("gray_weight", self.weight.sum(dim=1, keepdim=True))
+        # Valor dos pixels (escala 0-255) que a normalização leva a zero
+        self.register_buffer("pixel_mean", mean * 255.0)
+        self.register_buffer("original_bias", conv.bias.detach() if conv.bias is not None else None)
+
+        self._border_cache = {}
+        self._border_lock = threading.Lock()
+
+    def forward(self, x):
+        if torch.jit.is_tracing():
+            return F.conv2d(x.to(self.weight.dtype) - self.pixel_mean, self.weight, self.original_bias,
+                            self.stride, self.padding, self.dilation)
+
+        weight = self.gray_weight if x.shape[1] == 1 else self.weight
+        bias, borders = self._border_terms(x.shape[-2], x.shape[-1])
+        out = F.conv2d(x.to(weight.dtype), weight, bias, self.stride, self.padding, self.dilation)
+        for rows, cols, fix in borders:
+            out[:, :, rows, cols] += fix
+        return out
+
+    def _border_terms(self, height, width):
+        """Bias interno e correções das faixas de borda para um tamanho de entrada (em cache).
+
+        Returns:
+            tuple: (bias por canal, lista de (fatia_linhas, fatia_colunas, correção))
+        """
+        key = (height, width, self.weight.device)
+        terms = self._border_cache.get(key)
+        if terms is not None:
+            return terms
+
+        with self._border_lock, torch.inference_mode():
+            # Resposta da convolução a uma imagem constante igual à média: o bias exato
+            # em cada posição da saída, já considerando o preenchimento com zeros
+            mean_image = self.pixel_mean.expand(1, 3, height, width)
+            bias_map = -F.conv2d(mean_image, self.weight, None, self.stride, self.padding, self.dilation)
+            if self.original_bias is not None:
+                bias_map = bias_map + self.original_bias.view(1, -1, 1, 1)
+
+            out_h, out_w = bias_map.shape[-2:]
+            interior = bias_map[0, :, out_h // 2, out_w // 2].clone()
+            diff = bias_map - interior.view(1, -1, 1, 1)
+            # Tolerância para o ruído de arredondamento entre posições internas
+            differs = diff.abs() > 1e-6 * interior.abs().max()
+            top, bottom = _edge_counts(differs.any(dim=3).any(dim=1)[0].tolist())
+            left, right = _edge_counts(differs.any(dim=2).any(dim=1)[0].tolist())
+
+            # Faixas superior e inferior na largura toda; laterais sem repetir os cantos.
+            # Fatias simples (e não índices) mantêm o grafo rastreável independente do lote
+            inner_rows = slice(top, out_h - bottom)
+            borders = []
+            for rows, cols in ((slice(0, top), slice(None)), (slice(out_h - bottom, out_h), slice(None)),
+                               (inner_rows, slice(0, left)), (inner_rows, slice(out_w - right, out_w))):
+                fix = diff[:, :, rows, cols]
+                if fix.numel():
+                    borders.append((rows, cols, fix.clone()))
+
+            terms = (interior, borders)
+            self._border_cache[key] = terms
+        return terms
+
+    def unfold(self):
+        """Reconstrói a convolução original (entrada normalizada em float)."""
+        conv = nn.Conv2d(3, self.weight.shape[0], self.kernel_size, stride=self.stride, padding=self.padding,
+                         dilation=self.dilation, bias=self.original_bias is not None)
+        conv = conv.to(self.weight.device)
+        with torch.no_grad():
+            conv.weight.copy_(self.weight * (255.0 * self.std))
+            if self.original_bias is not None:
+                conv.bias.copy_(self.original_bias)
+        return conv
+
+    def extra_repr(self):
+        return (f"in_channels=3|1 (uint8), out_channels={self.weight.shape[0]}, "
+                f"kernel_size={self.kernel_size}, stride={self.stride}, padding={self.padding}")
+
+
+def _edge_counts(flags):
+    """Quantidade de posições marcadas no início e no fim de uma sequência de booleanos."""
+    leading = next((i for i, flag in enumerate(flags) if not flag), len(flags))
+    trailing = next((i for i, flag in enumerate(reversed(flags)) if not flag), len(flags))
+    if leading == len(flags):
+        return leading, 0
+    return leading, trailing
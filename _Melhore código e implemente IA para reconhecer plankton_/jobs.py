@@ -0,0 +1,361 @@
+"""
+Trabalhos de classificação assíncronos (/jobs), persistidos em SQLite.
+
+O reprocessamento de uma amostra inteira depois do cruzeiro não cabe em uma
+requisição síncrona. Um trabalho guarda a origem das imagens (um manifesto com
+caminhos locais, ou o envio multipart/.zip/.tar gravado em disco) e é executado
+por uma única thread, que passa as imagens pelo mesmo caminho de micro-lotes das
+rotas de predição, como trabalho de fundo (atendido depois das requisições
+interativas, ver inference_scheduler.py).
+
+Os resultados são gravados em blocos, na ordem das imagens, junto com o
+progresso. Se o servidor reiniciar no meio de um trabalho, ele volta para a fila
+e continua a partir da primeira imagem sem resultado gravado.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+logger = logging.getLogger("jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# Origens das imagens: manifesto (caminhos locais) ou envio gravado em disco
+MANIFEST = "manifest"
+MULTIPART = "multipart"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    model TEXT,
+    heads TEXT,
+    source_kind TEXT NOT NULL,
+    source TEXT,
+    total INTEGER,
+    processed INTEGER NOT NULL DEFAULT 0,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+) WITHOUT ROWID;
+"""
+
+
+class QueueFullError(Exception):
+    """A fila de trabalhos atingiu o limite de trabalhos ativos."""
+
+
+def _format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else None
+
+
+class Job:
+    """Um trabalho lido do banco."""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.status = row["status"]
+        self.model_id = row["model"]
+        self.heads = json.loads(row["heads"]) if row["heads"] else None
+        self.source_kind = row["source_kind"]
+        self.source = row["source"]
+        self.total = row["total"]
+        self.processed = row["processed"]
+        self.succeeded = row["succeeded"]
+        self.failed = row["failed"]
+        self.cancel_requested = bool(row["cancel_requested"])
+        self.error = row["error"]
+        self.created_at = row["created_at"]
+        self.started_at = row["started_at"]
+        self.finished_at = row["finished_at"]
+
+    @property
+    def manifest(self):
+        return json.loads(self.source) if self.source_kind == MANIFEST else None
+
+    def to_dict(self):
+        end = self.finished_at or (time.time() if self.started_at else None)
+        elapsed = end - self.started_at if self.started_at else None
+        return {
+            "id": self.id,
+            "status": self.status,
+            "model": self.model_id,
+            "models": self.heads,
+            "source": self.source_kind,
+            "total": self.total,
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "progress": round(self.processed / self.total, 4) if self.total else None,
+            "images_per_second": round(self.processed / elapsed, 2) if elapsed else None,
+            "cancel_requested": self.cancel_requested,
+            "error": self.error,
+            "created_at": _format_time(self.created_at),
+            "started_at": _format_time(self.started_at),
+            "finished_at": _format_time(self.finished_at),
+        }
+
+
+class JobStore:
+    """Trabalhos e resultados em um arquivo SQLite; os envios ficam em arquivos ao lado dele.
+
+    Args:
+        jobs_dir (str): Diretório do banco (jobs.sqlite3) e dos envios gravados
+        max_active (int): Máximo de trabalhos na fila ou em execução
+    """
+
+    def __init__(self, jobs_dir, max_active=16):
+        self.jobs_dir = jobs_dir
+        self.max_active = max(1, int(max_active))
+        os.makedirs(jobs_dir, exist_ok=True)
+        self.path = os.path.join(jobs_dir, "jobs.sqlite3")
+        # Uma conexão compartilhada pelas threads do servidor e do executor, serializada pelo lock
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+
+    def upload_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.upload")
+
+    def create(self, source_kind, source=None, total=None, model_id=None, heads=None, job_id=None):
+        """Cria um trabalho na fila.
+
+        Para envios, o corpo já deve estar gravado em upload_path(job_id) (ver new_id).
+
+        Raises:
+            QueueFullError: Se já houver max_active trabalhos na fila ou em execução
+        """
+        job_id = job_id or self.new_id()
+        with self._lock, self._db:
+            active = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", ACTIVE_STATES).fetchone()[0]
+            if active >= self.max_active:
+                raise QueueFullError(f"Fila de trabalhos cheia ({active} ativos; máximo: {self.max_active})")
+            self._db.execute(
+                "INSERT INTO jobs (id, status, model, heads, source_kind, source, total, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, model_id, json.dumps(heads) if heads else None, source_kind, source, total,
+                 time.time()))
+        return self.get(job_id)
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(row) if row is not None else None
+
+    def list(self, limit=50):
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [Job(row) for row in rows]
+
+    def next_queued(self):
+        """O trabalho mais antigo da fila, ou None."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                                   (QUEUED,)).fetchone()
+        return Job(row) if row is not None else None
+
+    def start(self, job_id):
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
+                             (RUNNING, time.time(), job_id))
+
+    def add_results(self, job_id, records):
+        """Grava um bloco de resultados e o progresso na mesma transação."""
+        succeeded = sum(1 for record in records if record.get("success"))
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO results (job_id, idx, record) VALUES (?, ?, ?)",
+                                 [(job_id, record["index"], json.dumps(record, ensure_ascii=False))
+                                  for record in records])
+            self._db.execute(
+                "UPDATE jobs SET processed = processed + ?, succeeded = succeeded + ?, failed = failed + ? "
+                "WHERE id = ?", (len(records), succeeded, len(records) - succeeded, job_id))
+
+    def cancel_requested(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    def cancel(self, job_id):
+        """Cancela um trabalho: um da fila termina aqui, um em execução para no próximo bloco.
+
+        Returns:
+            Job: O trabalho atualizado, ou None se não existir
+        """
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN (?, ?)",
+                             (job_id, *ACTIVE_STATES))
+            cancelled = self._db.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                                         (CANCELLED, time.time(), job_id, QUEUED)).rowcount
+        if cancelled:
+            self.discard_upload(job_id)
+        return self.get(job_id)
+
+    def finish(self, job_id, status, error=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, "
+                "total = CASE WHEN ? = ? THEN processed ELSE total END WHERE id = ?",
+                (status, error, time.time(), status, COMPLETED, job_id))
+        self.discard_upload(job_id)
+
+    def discard_upload(self, job_id):
+        try:
+            os.remove(self.upload_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def recover(self):
+        """Devolve à fila os trabalhos interrompidos por um reinício do servidor.
+
+        Returns:
+            int: Trabalhos recuperados
+        """
+        with self._lock, self._db:
+            return self._db.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)).rowcount
+
+    def results(self, job_id, offset=0, limit=100):
+        """Resultados gravados a partir da imagem offset, em ordem."""
+        with self._lock:
+            rows = self._db.execute("SELECT record FROM results WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?",
+                                    (job_id, offset, limit)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "path": self.path,
+            "max_active": self.max_active,
+            "jobs": {status: counts.get(status, 0) for status in (QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED)},
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JobRunner:
+    """Executa os trabalhos da fila, um por vez, em uma thread.
+
+    Args:
+        store (JobStore): Fila e resultados
+        run_fn: Função (trabalho, imagens a pular) -> iterador dos resultados por imagem
+            (dicts com "index" e "success"), na ordem das imagens
+        commit_every (int): Resultados por bloco gravado
+        commit_interval (float): Tempo máximo (segundos) entre gravações
+    """
+
+    def __init__(self, store, run_fn, commit_every=64, commit_interval=1.0):
+        self.store = store
+        self.run_fn = run_fn
+        self.commit_every = max(1, int(commit_every))
+        self.commit_interval = commit_interval
+        self.current_job = None
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        recovered = self.store.recover()
+        if recovered:
+            logger.info(f"{recovered} trabalho(s) interrompido(s) devolvido(s) à fila")
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="job-runner", daemon=True)
+        self._thread.start()
+        return self
+
+    def notify(self):
+        """Avisa que há um trabalho novo na fila."""
+        self._wakeup.set()
+
+    def stop(self, timeout=5.0):
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while self._running:
+            job = self.store.next_queued()
+            if job is None:
+                self._wakeup.wait(5.0)
+                self._wakeup.clear()
+                continue
+            self.current_job = job.id
+            try:
+                self._process(job)
+            finally:
+                self.current_job = None
+
+    def _process(self, job):
+        self.store.start(job.id)
+        logger.info(f"Trabalho {job.id} iniciado ({job.source_kind}, a partir da imagem {job.processed})")
+        buffer = []
+        last_commit = time.monotonic()
+        records = None
+        try:
+            records = self.run_fn(job, job.processed)
+            for record in records:
+                buffer.append(record)
+                if len(buffer) < self.commit_every and time.monotonic() - last_commit < self.commit_interval:
+                    continue
+                self.store.add_results(job.id, buffer)
+                buffer, last_commit = [], time.monotonic()
+                if self.store.cancel_requested(job.id) or not self._running:
+                    break
+            else:
+                if buffer:
+                    self.store.add_results(job.id, buffer)
+                self.store.finish(job.id, COMPLETED)
+                job = self.store.get(job.id)
+                logger.info(f"Trabalho {job.id} concluído: {job.processed} imagens ({job.failed} com erro)")
+                return
+        except Exception as e:
+            if buffer:
+                self.store.add_results(job.id, buffer)
+            self.store.finish(job.id, FAILED, str(e))
+            logger.error(f"Trabalho {job.id} falhou: {str(e)}")
+            logger.debug(traceback.format_exc())
+            return
+        finally:
+            if records is not None and hasattr(records, "close"):
+                records.close()
+
+        if self._running:
+            self.store.finish(job.id, CANCELLED)
+            logger.info(f"Trabalho {job.id} cancelado")
+        # Servidor parando: o trabalho continua em execução no banco e volta à fila no próximo início
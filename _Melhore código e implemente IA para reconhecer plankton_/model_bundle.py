@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Pacote único do modelo: pesos, classes, tamanho de entrada, constantes de
+pré-processamento e hash do conteúdo em um só arquivo versionado.
+
+O arquivo segue o layout safetensors (lido também pela biblioteca safetensors):
+8 bytes com o tamanho do cabeçalho, o cabeçalho JSON (tipo, forma e intervalo de
+bytes de cada tensor, mais os metadados do pacote em __metadata__) e os bytes dos
+tensores, alinhados ao tamanho do seu tipo. Na carga o arquivo é mapeado em
+memória (MAP_PRIVATE) e cada tensor é uma visão sobre o mapeamento: nenhuma
+cópia é feita, as páginas vêm do page cache sob demanda e são compartilhadas
+por todos os processos que carregam o mesmo pacote.
+
+O hash do conteúdo (pesos, classes, entrada e pré-processamento, sem a data de
+criação) identifica o modelo: é a versão usada nas chaves do cache de predições
+e nos artefatos exportados a partir do pacote. O hash do backbone (só os tensores
+features.*) identifica modelos que diferem apenas na camada final, cujas cabeças
+podem rodar sobre um mesmo backbone (ver multi_head.py). O cabeçalho é lido sem o PyTorch,
+o que permite ao backend onnxruntime conferir a origem do modelo ONNX.
+
+Uso (converte o checkpoint .pth e seus JSON em models/plankton_model.safetensors):
+    python model_bundle.py models/plankton_model.pth
+    python model_bundle.py models/plankton_model.safetensors --verify
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+
+BUNDLE_SUFFIX = ".safetensors"
+FORMAT_VERSION = 1
+# Chave de __metadata__ com os metadados do pacote (safetensors só aceita valores texto)
+METADATA_KEY = "plankton_bundle"
+HEADER_ALIGNMENT = 8
+# Limite do cabeçalho: protege contra arquivos corrompidos ou que não são pacotes
+MAX_HEADER_BYTES = 16 * 1024 * 1024
+
+# Tensores do extrator de features do MobileNetV2, comuns aos modelos ajustados só na camada final
+BACKBONE_PREFIX = "features."
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# Nomes de tipo do formato safetensors -> nome do dtype no PyTorch
+DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+
+def default_model_path(models_dir="models"):
+    """O pacote <models_dir>/plankton_model.safetensors, ou o checkpoint .pth legado se não houver pacote."""
+    path = os.path.join(models_dir, "plankton_model" + BUNDLE_SUFFIX)
+    if os.path.exists(path):
+        return path
+    return os.path.join(models_dir, "plankton_model.pth")
+
+
+def bundle_path(checkpoint_path):
+    """Caminho do pacote ao lado de um checkpoint .pth."""
+    return os.path.splitext(checkpoint_path)[0] + BUNDLE_SUFFIX
+
+
+def is_bundle(path):
+    return str(path).endswith(BUNDLE_SUFFIX)
+
+
+def default_preprocessing(input_shape):
+    return {"resize": list(input_shape), "mean": IMAGENET_MEAN, "std": IMAGENET_STD, "scale": 1 / 255.0}
+
+
+def read_header(path):
+    """Lê o cabeçalho do pacote sem mapear os pesos.
+
+    Returns:
+        tuple: (entradas dos tensores, metadados do pacote, deslocamento dos dados)
+
+    Raises:
+        ValueError: Se o arquivo não for um pacote válido
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(8)
+        if len(prefix) != 8:
+            raise ValueError(f"{path} não é um pacote de modelo (arquivo truncado)")
+        (header_size,) = struct.unpack("<Q", prefix)
+        if header_size > MAX_HEADER_BYTES:
+            raise ValueError(f"{path} não é um pacote de modelo (cabeçalho de {header_size} bytes)")
+        header = json.loads(f.read(header_size))
+
+    metadata = json.loads(header.pop("__metadata__", {}).get(METADATA_KEY, "null") or "null")
+    if not metadata:
+        raise ValueError(f"{path} não contém os metadados do pacote ({METADATA_KEY})")
+    if metadata.get("format_version", 0) > FORMAT_VERSION:
+        raise ValueError(f"{path} usa a versão {metadata['format_version']} do formato "
+                         f"(suportada: até {FORMAT_VERSION})")
+    return header, metadata, 8 + header_size
+
+
+def read_metadata(path):
+    """Metadados do pacote (classes, entrada, pré-processamento, content_hash)."""
+    return read_header(path)[1]
+
+
+def _content_digest(entries, metadata, chunks):
+    """Hash do conteúdo: layout dos tensores, metadados (sem data de criação) e bytes dos pesos."""
+    digest = hashlib.sha256()
+    described = {key: value for key, value in metadata.items() if key not in ("content_hash", "created")}
+    digest.update(json.dumps({"tensors": entries, "metadata": described}, sort_keys=True).encode("utf-8"))
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def backbone_digest(state_dict):
+    """Hash dos tensores do backbone (features.*), sem os contadores de batch norm que não afetam a inferência."""
+    import torch
+
+    digest = hashlib.sha256()
+    for name in sorted(state_dict):
+        if not name.startswith(BACKBONE_PREFIX) or name.endswith("num_batches_tracked"):
+            continue
+        tensor = state_dict[name].detach().to("cpu").contiguous()
+        digest.update(f"{name}:{tensor.dtype}:{list(tensor.shape)};".encode("utf-8"))
+        digest.update(tensor.reshape(-1).view(torch.uint8).numpy())
+    return digest.hexdigest()[:16]
+
+
+def save_bundle(state_dict, path, class_names, input_shape, model_type="MobileNetV2", preprocessing=None):
+    """Grava o state_dict e os metadados em um pacote (substituição atômica do arquivo).
+
+    Args:
+        state_dict (dict): Tensores do modelo float
+        path (str): Arquivo de saída (.safetensors)
+        class_names (list): Nomes das classes, na ordem das saídas do modelo
+        input_shape (tuple): (altura, largura) da entrada
+        model_type (str): Arquitetura
+        preprocessing (dict): Constantes de pré-processamento; padrão: normalização ImageNet
+
+    Returns:
+        dict: Metadados gravados, com o content_hash
+    """
+    import torch  # necessário apenas para gravar e carregar os pesos
+
+    tensors = {name: tensor.detach().to("cpu").contiguous() for name, tensor in state_dict.items()}
+    reverse_dtypes = {getattr(torch, name): code for code, name in DTYPES.items()}
+
+    # Tipos maiores primeiro: cada tensor começa em um deslocamento múltiplo do tamanho do seu tipo
+    names = sorted(tensors, key=lambda name: (-tensors[name].element_size(), name))
+    entries = {}
+    chunks = []
+    offset = 0
+    for name in names:
+        tensor = tensors[name]
+        data = tensor.reshape(-1).view(torch.uint8).numpy().tobytes()
+        entries[name] = {"dtype": reverse_dtypes[tensor.dtype], "shape": list(tensor.shape),
+                         "data_offsets": [offset, offset + len(data)]}
+        chunks.append(data)
+        offset += len(data)
+
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "model_type": model_type,
+        "num_classes": len(class_names),
+        "classes": list(class_names),
+        "input_shape": list(input_shape),
+        "preprocessing": preprocessing or default_preprocessing(input_shape),
+        "backbone_hash": backbone_digest(tensors),
+    }
+    metadata["content_hash"] = _content_digest(entries, metadata, chunks)
+    metadata["created"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    header = json.dumps({"__metadata__": {METADATA_KEY: json.dumps(metadata, ensure_ascii=False)}, **entries},
+                        ensure_ascii=False).encode("utf-8")
+    header += b" " * (-(8 + len(header)) % HEADER_ALIGNMENT)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for chunk in chunks:
+            f.write(chunk)
+    # Processos que já mapearam a versão anterior continuam lendo o arquivo antigo
+    os.replace(tmp_path, path)
+    return metadata
+
+
+def load_bundle(path, device="cpu", verify=False):
+    """Mapeia o pacote em memória e retorna os tensores como visões sobre o arquivo.
+
+    Args:
+        path (str): Pacote (.safetensors)
+        device: Dispositivo dos tensores; fora da CPU os pesos são copiados
+        verify (bool): Recalcula o hash do conteúdo (lê o arquivo inteiro)
+
+    Returns:
+        tuple: (state_dict, metadados)
+
+    Raises:
+        ValueError: Se o arquivo for inválido ou o hash não conferir
+    """
+    import torch
+
+    entries, metadata, data_start = read_header(path)
+    size = os.path.getsize(path)
+    # shared=False: MAP_PRIVATE, páginas do page cache, nunca escritas de volta no arquivo
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=size)
+    data = torch.empty(0, dtype=torch.uint8).set_(storage)
+
+    state_dict = {}
+    for name, entry in entries.items():
+        begin, end = (data_start + offset for offset in entry["data_offsets"])
+        if end > size:
+            raise ValueError(f"{path} está truncado (tensor {name})")
+        dtype = getattr(torch, DTYPES[entry["dtype"]])
+        state_dict[name] = data[begin:end].view(dtype).view(entry["shape"])
+
+    if verify:
+        chunks = (data[data_start + e["data_offsets"][0]:data_start + e["data_offsets"][1]].numpy()
+                  for e in sorted(entries.values(), key=lambda e: e["data_offsets"][0]))
+        if _content_digest(entries, metadata, chunks) != metadata.get("content_hash"):
+            raise ValueError(f"{path}: o hash do conteúdo não confere (arquivo corrompido ou alterado)")
+
+    if str(device) != "cpu":
+        state_dict = {name: tensor.to(device) for name, tensor in state_dict.items()}
+    return state_dict, metadata
+
+
+def load_checkpoint(checkpoint_path):
+    """Lê um checkpoint .pth e seus <nome>_classes.json / <nome>_info.json.
+
+    Returns:
+        tuple: (state_dict, metadados no formato do pacote, sem os hashes)
+    """
+    import torch
+
+    base = os.path.splitext(checkpoint_path)[0]
+    info = {}
+    if os.path.exists(base + "_info.json"):
+        with open(base + "_info.json", "r", encoding="utf-8") as f:
+            info = json.load(f)
+    class_names = info.get("classes")
+    if os.path.exists(base + "_classes.json"):
+        with open(base + "_classes.json", "r", encoding="utf-8") as f:
+            class_names = json.load(f)
+
+    state_dict = torch.load(checkpoint_path, map_location="cpu", weights_only=True)
+    num_classes = state_dict["classifier.1.weight"].shape[0]
+    if not class_names or len(class_names) != num_classes:
+        class_names = [f"classe_{i}" for i in range(num_classes)]
+    input_shape = info.get("input_shape", [224, 224])
+    return state_dict, {
+        "model_type": info.get("model_type", "MobileNetV2"),
+        "num_classes": num_classes,
+        "classes": class_names,
+        "input_shape": list(input_shape),
+        "preprocessing": default_preprocessing(input_shape),
+    }
+
+
+def load_model_file(path):
+    """state_dict e metadados de um pacote .safetensors ou de um checkpoint .pth."""
+    if is_bundle(path):
+        return load_bundle(path)
+    return load_checkpoint(path)
+
+
+def convert_checkpoint(checkpoint_path, output_path=None):
+    """Converte um checkpoint .pth e seus <nome>_classes.json / <nome>_info.json em um pacote."""
+    state_dict, metadata = load_checkpoint(checkpoint_path)
+    return save_bundle(state_dict, output_path or bundle_path(checkpoint_path), metadata["classes"],
+                       metadata["input_shape"], model_type=metadata["model_type"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cria ou confere o pacote único do modelo")
+    parser.add_argument("path", help="Checkpoint .pth a converter, ou pacote .safetensors a conferir")
+    parser.add_argument("--output", help="Pacote de saída (padrão: <checkpoint>.safetensors)")
+    parser.add_argument("--verify", action="store_true", help="Confere o hash do conteúdo do pacote")
+    args = parser.parse_args()
+
+    if is_bundle(args.path):
+        _, metadata = load_bundle(args.path, verify=args.verify)
+        status = "conferido" if args.verify else "lido"
+    else:
+        metadata = convert_checkpoint(args.path, args.output)
+        status = f"salvo em {args.output or bundle_path(args.path)}"
+    print(f"✅ Pacote {status}: {metadata['model_type']}, {metadata['num_classes']} classes, "
+          f"entrada {tuple(metadata['input_shape'])}, hash {metadata['content_hash']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Exportação do classificador para TorchScript congelado e otimizado para inferência
+e para ONNX (executado pelo onnxruntime, ver onnx_backend.py).
+
+O modelo em modo eager é rastreado (torch.jit.trace) e congelado (pesos viram
+constantes do grafo) na exportação. Ao carregar, torch.jit.optimize_for_inference
+funde conv + batchnorm e pré-empacota os pesos para a CPU da máquina atual; esse
+passo é feito na carga porque o grafo pré-empacotado não é serializável e depende
+da CPU. O artefato é salvo ao lado
+do checkpoint (ex.: models/plankton_model_torchscript.pt) e carregado sem
+reconstruir o MobileNetV2 pelo torchvision nem ler os pesos ImageNet, o que
+reduz o tempo de início dos processos do servidor.
+
+Os metadados embutidos (classes, tamanho e modo de entrada, hash do checkpoint de
+origem) permitem ao classificador descartar um artefato desatualizado.
+"""
+
+import inspect
+import json
+import os
+import time
+
+import torch
+
+from onnx_backend import METADATA_KEY as ONNX_METADATA_KEY
+
+# Nome do arquivo de metadados embutido no artefato TorchScript
+METADATA_FILE = "model.json"
+
+TORCHSCRIPT_SUFFIX = "_torchscript.pt"
+
+
+def torchscript_path(checkpoint_path):
+    """Caminho padrão do artefato TorchScript ao lado do checkpoint float."""
+    return os.path.splitext(checkpoint_path)[0] + TORCHSCRIPT_SUFFIX
+
+
+def export_torchscript(model, output_path, example_input, metadata):
+    """Rastreia e congela um modelo eager e o salva como TorchScript.
+
+    Args:
+        model (nn.Module): Modelo em modo eager, na CPU
+        output_path (str): Arquivo de saída
+        example_input (Tensor): Lote de exemplo com o tipo e o tamanho de entrada do modelo
+        metadata (dict): Metadados embutidos no artefato
+
+    Returns:
+        ScriptModule: O módulo congelado que foi salvo
+    """
+    model = model.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input)
+        frozen = torch.jit.freeze(traced)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    torch.jit.save(frozen, output_path, _extra_files={METADATA_FILE: json.dumps(metadata, ensure_ascii=False)})
+    return frozen
+
+
+def load_torchscript(path, optimize=True):
+    """Carrega um artefato exportado por export_torchscript (na CPU).
+
+    Args:
+        path (str): Artefato TorchScript
+        optimize (bool): Aplica torch.jit.optimize_for_inference após a carga
+
+    Returns:
+        tuple: (módulo TorchScript, metadados)
+    """
+    extra_files = {METADATA_FILE: ""}
+    model = torch.jit.load(path, map_location="cpu", _extra_files=extra_files).eval()
+    if optimize:
+        model = torch.jit.optimize_for_inference(model)
+    return model, json.loads(extra_files[METADATA_FILE] or "{}")
+
+
+def export_onnx(model, output_path, example_input, metadata, opset_version=17):
+    """Exporta um modelo eager para ONNX, com o tamanho do lote dinâmico e os metadados embutidos.
+
+    Args:
+        model (nn.Module): Modelo em modo eager, na CPU
+        output_path (str): Arquivo de saída (.onnx)
+        example_input (Tensor): Lote de exemplo com o tipo e o tamanho de entrada do modelo
+        metadata (dict): Metadados gravados em metadata_props
+        opset_version (int): Versão do opset ONNX
+    """
+    import onnx  # necessário apenas para exportar
+
+    model = model.eval()
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    options = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Versões novas do torch podem usar o exportador dynamo por padrão; as antigas não aceitam o argumento
+        options["dynamo"] = False
+    with torch.no_grad():
+        torch.onnx.export(model, (example_input,), output_path, input_names=["input"], output_names=["logits"],
+                          dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+                          opset_version=opset_version, **options)
+
+    proto = onnx.load(output_path)
+    entry = proto.metadata_props.add()
+    entry.key = ONNX_METADATA_KEY
+    entry.value = json.dumps(metadata, ensure_ascii=False)
+    onnx.save(proto, output_path)
+
+
+def build_metadata(source_digest, class_names, input_shape, input_mode, model_format="torchscript"):
+    return {
+        "format": model_format,
+        "source_digest": source_digest,
+        "classes": list(class_names),
+        "input_shape": list(input_shape),
+        "input_mode": input_mode,
+        "torch_version": torch.__version__,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
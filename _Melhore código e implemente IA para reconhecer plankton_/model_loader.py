@@ -0,0 +1,124 @@
+"""
+Carregamento do modelo em segundo plano.
+
+Importar torch/torchvision e montar o MobileNetV2 é a parte mais lenta do início
+do servidor. O carregador executa essa sequência em uma thread enquanto o
+servidor HTTP já atende: /readyz informa a fase atual e as rotas de predição
+respondem 503 com Retry-After até o modelo ficar pronto. Cada etapa é
+cronometrada para o resumo do tempo de início registrado no log.
+"""
+
+import contextlib
+import logging
+import threading
+import time
+import traceback
+
+logger = logging.getLogger("model_loader")
+
+# Rótulos das etapas no resumo do tempo de início
+STEP_LABELS = {
+    "imports": "importações",
+    "graph_build": "montagem do grafo",
+    "weight_load": "carga dos pesos",
+    "workers": "workers",
+    "warmup": "aquecimento",
+}
+
+
+class BackgroundModelLoader:
+    """Executa a função de carga em uma thread e expõe a fase e os tempos de cada etapa.
+
+    Args:
+        load_fn: Função chamada com o próprio carregador; usa set_phase/step para
+            informar o progresso e retorna quando o modelo estiver pronto
+    """
+
+    def __init__(self, load_fn):
+        self.load_fn = load_fn
+        self.phase = "pending"
+        self.error = None
+        self.timings = {}
+        self._started_at = None
+        self._finished_at = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.load_fn(self)
+            self.set_phase("ready")
+            logger.info(f"Modelo pronto em {self.elapsed():.2f}s ({self.format_timings()})")
+        except Exception as e:
+            with self._lock:
+                self.error = str(e)
+            self.set_phase("failed")
+            logger.error(f"Falha ao carregar o modelo em segundo plano: {str(e)}")
+            logger.debug(traceback.format_exc())
+        finally:
+            self._finished_at = time.perf_counter()
+            self._done.set()
+
+    def set_phase(self, phase):
+        with self._lock:
+            self.phase = phase
+        if phase not in ("ready", "failed"):
+            logger.info(f"Carregamento do modelo: {phase}")
+
+    @contextlib.contextmanager
+    def step(self, name, phase=None):
+        """Cronometra uma etapa (acumulando em timings[name]), opcionalmente mudando a fase."""
+        if phase:
+            self.set_phase(phase)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timings({name: time.perf_counter() - start})
+
+    def add_timings(self, timings):
+        with self._lock:
+            for name, seconds in timings.items():
+                self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @property
+    def ready(self):
+        return self.phase == "ready"
+
+    @property
+    def failed(self):
+        return self.phase == "failed"
+
+    def wait(self, timeout=None):
+        """Bloqueia até o fim do carregamento; retorna True se o modelo ficou pronto."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def elapsed(self):
+        if self._started_at is None:
+            return 0.0
+        return (self._finished_at or time.perf_counter()) - self._started_at
+
+    def format_timings(self):
+        with self._lock:
+            timings = dict(self.timings)
+        return " | ".join(f"{STEP_LABELS.get(name, name)} {seconds:.2f}s" for name, seconds in timings.items())
+
+    def status(self):
+        with self._lock:
+            return {
+                "phase": self.phase,
+                "ready": self.phase == "ready",
+                "elapsed_seconds": round(self.elapsed(), 3),
+                "startup_timings": {name: round(seconds, 3) for name, seconds in self.timings.items()},
+                "error": self.error,
+            }
@@ -0,0 +1,121 @@
+"""
+Quantização estática int8 (pós-treinamento) do MobileNetV2 para inferência em CPU.
+
+O checkpoint float (.pth) é carregado na variante quantizável do torchvision, as
+sequências conv-bn-relu são fundidas, observadores medem a faixa das ativações
+sobre um conjunto de calibração de imagens de plâncton e o modelo é convertido
+para int8. O resultado é salvo como um artefato TorchScript separado
+(ex.: models/plankton_model_int8.pt), com classes e parâmetros da quantização
+embutidos, e pode ser selecionado ao carregar o classificador.
+"""
+
+import json
+import os
+import time
+
+import torch
+import torch.ao.quantization as tq
+import torchvision.models.quantization as quantizable_models
+
+import model_bundle
+
+# Nome do arquivo de metadados embutido no artefato TorchScript
+METADATA_FILE = "quantization.json"
+
+QUANTIZED_SUFFIX = "_int8.pt"
+
+
+def default_engine():
+    """Backend de kernels quantizados para a CPU atual (x86/fbgemm em PCs, qnnpack em ARM)."""
+    engines = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in engines:
+            return engine
+    raise RuntimeError("Esta instalação do PyTorch não oferece kernels quantizados")
+
+
+def quantized_model_path(checkpoint_path):
+    """Caminho padrão do artefato int8 ao lado do checkpoint float."""
+    return os.path.splitext(checkpoint_path)[0] + QUANTIZED_SUFFIX
+
+
+def load_float_checkpoint(checkpoint_path):
+    """Carrega um checkpoint .pth (ou pacote .safetensors) do MobileNetV2 na variante quantizável (ainda em float).
+
+    Returns:
+        nn.Module: Modelo em modo de avaliação, na CPU
+    """
+    if model_bundle.is_bundle(checkpoint_path):
+        state_dict, _ = model_bundle.load_bundle(checkpoint_path)
+    else:
+        state_dict = torch.load(checkpoint_path, map_location="cpu", weights_only=True)
+    num_classes = state_dict["classifier.1.weight"].shape[0]
+    model = quantizable_models.mobilenet_v2(weights=None, quantize=False, num_classes=num_classes)
+    model.load_state_dict(state_dict)
+    return model.eval()
+
+
+def quantize_model(model, calibration_batches, engine=None):
+    """Aplica fusão conv-bn-relu, calibração e conversão para int8 (no próprio modelo).
+
+    Args:
+        model: Modelo retornado por load_float_checkpoint
+        calibration_batches: Iterável de tensores (N, 3, H, W) já normalizados
+        engine (str): Backend de kernels quantizados; padrão: default_engine()
+
+    Returns:
+        tuple: (modelo quantizado, número de imagens usadas na calibração)
+    """
+    engine = engine or default_engine()
+    torch.backends.quantized.engine = engine
+
+    model.eval()
+    model.fuse_model(is_qat=False)
+    model.qconfig = tq.get_default_qconfig(engine)
+    tq.prepare(model, inplace=True)
+
+    calibrated = 0
+    with torch.inference_mode():
+        for batch in calibration_batches:
+            model(batch)
+            calibrated += batch.shape[0]
+    if calibrated == 0:
+        raise ValueError("Nenhuma imagem de calibração foi fornecida")
+
+    tq.convert(model, inplace=True)
+    return model, calibrated
+
+
+def save_quantized_model(model, output_path, metadata):
+    """Salva o modelo quantizado como TorchScript com os metadados embutidos."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    scripted = torch.jit.script(model)
+    torch.jit.save(scripted, output_path, _extra_files={METADATA_FILE: json.dumps(metadata, ensure_ascii=False)})
+
+
+def load_quantized_model(path):
+    """Carrega um artefato int8 e ativa o backend de kernels com que foi calibrado.
+
+    Returns:
+        tuple: (modelo TorchScript, metadados)
+    """
+    extra_files = {METADATA_FILE: ""}
+    model = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+    metadata = json.loads(extra_files[METADATA_FILE] or "{}")
+
+    engine = metadata.get("engine")
+    if engine in torch.backends.quantized.supported_engines:
+        torch.backends.quantized.engine = engine
+    return model.eval(), metadata
+
+
+def build_metadata(checkpoint_path, class_names, input_shape, engine, calibration_images):
+    return {
+        "format": "torchscript-int8",
+        "source_checkpoint": os.path.basename(checkpoint_path),
+        "classes": list(class_names),
+        "input_shape": list(input_shape),
+        "engine": engine,
+        "calibration_images": calibration_images,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
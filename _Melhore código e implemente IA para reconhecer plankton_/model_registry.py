@@ -0,0 +1,268 @@
+"""
+Registro de modelos: vários modelos residentes sob um orçamento de memória.
+
+Cada cruzeiro pode ter seu próprio modelo ajustado, com outro conjunto de
+classes. O registro encontra os modelos em models/ (pacotes .safetensors e
+checkpoints .pth; o identificador é o nome do arquivo sem a extensão), carrega
+cada um na primeira requisição que o pede e mantém os carregados em memória
+enquanto a soma dos seus pesos couber no orçamento, descarregando o usado há
+mais tempo quando um novo não cabe.
+
+O modelo padrão do servidor é fixado: nunca é descarregado, mas ocupa parte do
+orçamento. Descarregar um modelo só remove a referência do registro; as
+requisições que já o usam terminam normalmente e a memória é liberada com a
+última delas.
+"""
+
+import collections
+import logging
+import os
+import threading
+import time
+import traceback
+
+from model_bundle import BUNDLE_SUFFIX
+
+logger = logging.getLogger("model_registry")
+
+CHECKPOINT_SUFFIX = ".pth"
+
+
+class RegisteredModel:
+    """Um modelo conhecido pelo registro e seus contadores."""
+
+    def __init__(self, model_id, path):
+        self.model_id = model_id
+        self.path = path
+        self.classifier = None
+        self.resident_bytes = 0
+        self.pinned = False
+        self.loads = 0
+        self.evictions = 0
+        self.load_failures = 0
+        self.requests = 0
+        self.last_used = None
+        self.last_load_seconds = None
+        self.last_error = None
+        # Serializa a carga: requisições simultâneas pelo mesmo modelo carregam uma vez só
+        self.load_lock = threading.Lock()
+
+    @property
+    def resident(self):
+        return self.classifier is not None
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "resident": self.resident,
+            "pinned": self.pinned,
+            "resident_bytes": self.resident_bytes if self.resident else 0,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "load_failures": self.load_failures,
+            "requests": self.requests,
+            "model_version": self.classifier.model_version if self.resident else None,
+            "num_classes": len(self.classifier.class_names) if self.resident else None,
+            "last_load_seconds": round(self.last_load_seconds, 3) if self.last_load_seconds is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class ModelRegistry:
+    """Modelos de um diretório, carregados sob demanda e descarregados por LRU.
+
+    Args:
+        models_dir (str): Diretório com os modelos (.safetensors e .pth)
+        load_fn: Função (caminho) -> classificador carregado; levanta exceção se falhar
+        budget_bytes (int): Memória máxima dos pesos residentes (inclui o modelo fixado); 0 = sem limite
+    """
+
+    def __init__(self, models_dir, load_fn, budget_bytes=0):
+        self.models_dir = models_dir
+        self.load_fn = load_fn
+        self.budget_bytes = max(0, int(budget_bytes))
+
+        self._lock = threading.Lock()
+        # Ordem de uso: o fim é o mais recente
+        self._models = collections.OrderedDict()
+        self.default_id = None
+
+    @staticmethod
+    def model_id_for(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def scan(self):
+        """Atualiza a lista de modelos disponíveis em models_dir.
+
+        Returns:
+            list: Identificadores encontrados
+        """
+        found = {}
+        if os.path.isdir(self.models_dir):
+            # Checkpoints antes dos pacotes: com os dois, o pacote do mesmo nome prevalece
+            for suffix in (CHECKPOINT_SUFFIX, BUNDLE_SUFFIX):
+                for name in sorted(os.listdir(self.models_dir)):
+                    if name.endswith(suffix):
+                        found[self.model_id_for(name)] = os.path.join(self.models_dir, name)
+
+        with self._lock:
+            for model_id, path in found.items():
+                entry = self._models.get(model_id)
+                if entry is None:
+                    self._models[model_id] = RegisteredModel(model_id, path)
+                    self._models.move_to_end(model_id, last=False)
+                elif not entry.resident:
+                    entry.path = path
+            # Modelos removidos do diretório saem do registro quando não estão em memória
+            for model_id in [m for m, entry in self._models.items()
+                             if m not in found and not entry.resident and not entry.pinned]:
+                del self._models[model_id]
+            return list(self._models)
+
+    def pin(self, path, classifier):
+        """Registra o modelo padrão (carregado pelo servidor) como residente e não descartável.
+
+        Chamado na inicialização e a cada recarga do modelo padrão.
+        """
+        model_id = self.model_id_for(path)
+        with self._lock:
+            if self.default_id is not None and self.default_id != model_id:
+                self._models[self.default_id].pinned = False
+                self._evict(self._models[self.default_id], reason="modelo padrão substituído")
+            entry = self._models.get(model_id)
+            if entry is None:
+                entry = self._models[model_id] = RegisteredModel(model_id, path)
+            entry.path = path
+            entry.classifier = classifier
+            entry.resident_bytes = classifier.memory_bytes()
+            entry.pinned = True
+            entry.loads += 1
+            entry.last_used = time.time()
+            self._models.move_to_end(model_id)
+            self.default_id = model_id
+            self._enforce_budget(keep=model_id)
+        return model_id
+
+    def known(self, model_id):
+        """True se o modelo está no registro (varre o diretório de novo antes de responder False)."""
+        with self._lock:
+            if model_id in self._models:
+                return True
+        return model_id in self.scan()
+
+    def path(self, model_id):
+        """Arquivo do modelo.
+
+        Raises:
+            KeyError: Se o modelo não existir em models_dir
+        """
+        entry = self._models.get(model_id) if self.known(model_id) else None
+        if entry is None:
+            raise KeyError(model_id)
+        return entry.path
+
+    def get(self, model_id):
+        """Classificador do modelo, carregando-o se preciso.
+
+        Raises:
+            KeyError: Se o modelo não existir em models_dir
+            RuntimeError: Se a carga falhar
+        """
+        entry = self._models.get(model_id) if self.known(model_id) else None
+        if entry is None:
+            raise KeyError(model_id)
+
+        classifier = self._touch(entry)
+        if classifier is not None:
+            return classifier
+
+        with entry.load_lock:
+            classifier = self._touch(entry)
+            if classifier is not None:
+                return classifier
+            start = time.perf_counter()
+            try:
+                classifier = self.load_fn(entry.path)
+            except Exception as e:
+                entry.load_failures += 1
+                entry.last_error = str(e)
+                logger.error(f"Falha ao carregar o modelo {model_id}: {str(e)}")
+                logger.debug(traceback.format_exc())
+                raise RuntimeError(f"Não foi possível carregar o modelo {model_id}: {str(e)}")
+            entry.last_load_seconds = time.perf_counter() - start
+            entry.last_error = None
+
+            with self._lock:
+                entry.classifier = classifier
+                entry.resident_bytes = classifier.memory_bytes()
+                entry.loads += 1
+                entry.requests += 1
+                entry.last_used = time.time()
+                self._models.move_to_end(model_id)
+                self._enforce_budget(keep=model_id)
+            logger.info(f"Modelo {model_id} carregado em {entry.last_load_seconds:.2f}s "
+                        f"({entry.resident_bytes / 1024 / 1024:.1f}MB; residentes: "
+                        f"{self.resident_bytes / 1024 / 1024:.1f}MB)")
+            return classifier
+
+    def touch(self, model_id):
+        """Conta uma requisição para um modelo servido fora do registro (o modelo padrão)."""
+        entry = self._models.get(model_id)
+        if entry is not None:
+            self._touch(entry)
+
+    def _touch(self, entry):
+        """Marca o modelo como usado agora e retorna seu classificador (None se não estiver em memória)."""
+        with self._lock:
+            classifier = entry.classifier
+            if classifier is not None:
+                entry.requests += 1
+                entry.last_used = time.time()
+                self._models.move_to_end(entry.model_id)
+            return classifier
+
+    @property
+    def resident_bytes(self):
+        return sum(entry.resident_bytes for entry in self._models.values() if entry.resident)
+
+    def _enforce_budget(self, keep):
+        """Descarrega os modelos usados há mais tempo até os residentes caberem no orçamento (com o lock)."""
+        if not self.budget_bytes:
+            return
+        for entry in list(self._models.values()):
+            if self.resident_bytes <= self.budget_bytes:
+                return
+            if entry.resident and not entry.pinned and entry.model_id != keep:
+                self._evict(entry, reason="orçamento de memória")
+        if self.resident_bytes > self.budget_bytes:
+            logger.warning(f"Modelos residentes ({self.resident_bytes / 1024 / 1024:.1f}MB) acima do orçamento "
+                           f"({self.budget_bytes / 1024 / 1024:.1f}MB): o modelo {keep} não cabe sozinho")
+
+    def _evict(self, entry, reason):
+        classifier = entry.classifier
+        if classifier is None:
+            return
+        entry.classifier = None
+        entry.evictions += 1
+        classifier.prediction_cache.clear()
+        logger.info(f"Modelo {entry.model_id} descarregado ({reason}; {entry.resident_bytes / 1024 / 1024:.1f}MB)")
+
+    def evict(self, model_id):
+        """Descarrega um modelo não fixado; retorna True se ele estava em memória."""
+        with self._lock:
+            entry = self._models.get(model_id)
+            if entry is None or entry.pinned or not entry.resident:
+                return False
+            self._evict(entry, reason="pedido explícito")
+            return True
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "models_dir": self.models_dir,
+                "default_model": self.default_id,
+                "budget_bytes": self.budget_bytes,
+                "resident_bytes": self.resident_bytes,
+                "resident_models": sum(1 for entry in self._models.values() if entry.resident),
+                "models": {model_id: entry.to_dict() for model_id, entry in self._models.items()},
+            }
@@ -0,0 +1,190 @@
+"""
+Recarga do modelo sem reiniciar o servidor (troca com buffer duplo).
+
+O novo modelo é carregado e aquecido em uma thread, em uma segunda instância do
+classificador, enquanto o atual continua atendendo. Pronto, ele é ativado com
+uma única troca de referências; as requisições em andamento terminam no modelo
+anterior, que é desativado depois que sua fila esvazia e liberado quando a
+última referência a ele cai. A recarga é disparada pela rota de administração
+ou pelo observador do arquivo do modelo (mtime/tamanho, verificados a cada
+intervalo).
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+import traceback
+import weakref
+
+logger = logging.getLogger("model_reloader")
+
+
+class ModelReloader:
+    """Coordena uma recarga por vez: preparar, ativar e desativar o modelo anterior.
+
+    Args:
+        prepare_fn: Função (caminho) -> runtime novo, já carregado e aquecido; levanta exceção se falhar
+        activate_fn: Função (runtime) -> runtime anterior; troca as referências globais
+        retire_fn: Função (runtime anterior) chamada após a troca para esperar suas requisições
+        model_path (str): Arquivo do modelo em uso (observado pelo watch)
+        version_fn: Função (runtime) -> versão do modelo, para o status
+        grace_seconds (float): Espera após a troca por requisições que já tinham o runtime anterior
+    """
+
+    def __init__(self, prepare_fn, activate_fn, retire_fn, model_path, version_fn=None, grace_seconds=1.0):
+        self.prepare_fn = prepare_fn
+        self.activate_fn = activate_fn
+        self.retire_fn = retire_fn
+        self.model_path = model_path
+        self.version_fn = version_fn or (lambda runtime: None)
+        self.grace_seconds = grace_seconds
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watcher = None
+        self._stop_watch = threading.Event()
+        self._previous = None
+        # mtime/tamanho do arquivo do modelo ativo (ou da última tentativa que falhou)
+        self._loaded_signature = None
+
+        self.state = "idle"
+        self.version = None
+        self.previous_version = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_trigger = None
+        self.last_started_at = None
+        self.last_duration = None
+        self.last_swap_at = None
+
+    def set_current(self, runtime):
+        """Registra o runtime carregado na inicialização do servidor."""
+        self.version = self.version_fn(runtime)
+        self._loaded_signature = _file_signature(self.model_path)
+
+    @property
+    def busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def reload(self, model_path=None, trigger="admin"):
+        """Inicia a recarga em segundo plano.
+
+        Returns:
+            threading.Thread: Thread da recarga, ou None se outra já estiver em andamento
+        """
+        with self._lock:
+            if self.busy:
+                return None
+            self.state = "loading"
+            self.last_trigger = trigger
+            self.last_error = None
+            self._thread = threading.Thread(target=self._run, args=(model_path or self.model_path,),
+                                            name="model-reload", daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def _run(self, model_path):
+        start = time.perf_counter()
+        self.last_started_at = time.time()
+        signature = _file_signature(model_path)
+        logger.info(f"Recarregando o modelo a partir de {model_path} ({self.last_trigger})")
+        try:
+            runtime = self.prepare_fn(model_path)
+            previous = self.activate_fn(runtime)
+            self.last_swap_at = time.time()
+            self.last_duration = time.perf_counter() - start
+            self.previous_version, self.version = self.version, self.version_fn(runtime)
+            self.model_path = model_path
+            self._loaded_signature = signature
+            self.reloads += 1
+            logger.info(f"Modelo {self.version} ativo após {self.last_duration:.2f}s "
+                        f"(anterior: {self.previous_version})")
+            del runtime
+
+            self.state = "retiring"
+            time.sleep(self.grace_seconds)
+            self.retire_fn(previous)
+            # Só uma referência fraca sobrevive: o modelo anterior é liberado quando a última requisição o solta
+            self._previous = [weakref.ref(item) for item in _as_tuple(previous) if item is not None]
+            del previous
+            gc.collect()
+            self.state = "idle"
+            logger.info("Modelo anterior desativado" + ("" if self.previous_released else " (ainda referenciado)"))
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            self.last_duration = time.perf_counter() - start
+            self.state = "failed"
+            if model_path == self.model_path:
+                # Não tenta de novo o mesmo arquivo com defeito até ele mudar outra vez
+                self._loaded_signature = signature
+            logger.error(f"Falha ao recarregar o modelo (o modelo atual continua ativo): {str(e)}")
+            logger.debug(traceback.format_exc())
+
+    def wait(self, timeout=None):
+        """Aguarda a recarga em andamento; retorna True se ela terminou sem erro."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.busy and self.state == "idle"
+
+    @property
+    def previous_released(self):
+        if self._previous is None:
+            return None
+        return all(ref() is None for ref in self._previous)
+
+    def watch(self, interval):
+        """Observa o arquivo do modelo e recarrega quando ele muda (mtime ou tamanho)."""
+        if self._watcher is not None or interval <= 0:
+            return self
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watch", daemon=True)
+        self._watcher.start()
+        logger.info(f"Observando {self.model_path} a cada {interval}s")
+        return self
+
+    def stop_watch(self):
+        self._stop_watch.set()
+
+    def _watch(self, interval):
+        while not self._stop_watch.wait(interval):
+            # self.model_path acompanha o arquivo ativado pela rota de administração
+            current = _file_signature(self.model_path)
+            if current is None or current == self._loaded_signature or self.busy:
+                continue
+            # Só recarrega quando o arquivo parar de mudar (cópias não atômicas)
+            time.sleep(interval)
+            if _file_signature(self.model_path) == current and self.reload(trigger="watch") is not None:
+                self.wait()
+
+    def status(self):
+        return {
+            "state": self.state,
+            "model_path": self.model_path,
+            "version": self.version,
+            "previous_version": self.previous_version,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_trigger": self.last_trigger,
+            "last_error": self.last_error,
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_swap_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_swap_at))
+                            if self.last_swap_at else None,
+            "previous_released": self.previous_released,
+            "watching": self._watcher is not None and not self._stop_watch.is_set(),
+        }
+
+
+def _as_tuple(runtime):
+    return runtime if isinstance(runtime, tuple) else (runtime,)
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
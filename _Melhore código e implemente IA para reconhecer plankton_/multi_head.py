@@ -0,0 +1,194 @@
+"""
+Várias cabeças de classificação sobre um único backbone.
+
+Os modelos dos cruzeiros são ajustes finos do mesmo MobileNetV2: o extrator de
+features fica congelado e só a camada final (classifier[1]) muda. Aqui o
+backbone roda uma vez por lote e as camadas finais de todos os modelos pedidos
+são concatenadas em uma única camada linear sobre as features agregadas, de modo
+que N taxonomias custam um forward do backbone mais uma multiplicação de
+1280 x (soma das classes), e cada cabeça ocupa só os seus pesos em memória.
+
+Uma cabeça só é aceita se o arquivo de origem tiver o mesmo backbone do modelo
+base (hash dos tensores features.*, ver model_bundle.backbone_digest), a mesma
+entrada e a mesma normalização.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import torch
+import torch.nn.functional as F
+
+import model_bundle
+from plankton_ai import format_predictions
+
+logger = logging.getLogger("multi_head")
+
+HEAD_WEIGHT = "classifier.1.weight"
+HEAD_BIAS = "classifier.1.bias"
+
+
+class Head:
+    """Camada final de um modelo e suas classes."""
+
+    __slots__ = ("model_id", "class_names", "weight", "bias", "version")
+
+    def __init__(self, model_id, class_names, weight, bias, version):
+        self.model_id = model_id
+        self.class_names = class_names
+        self.weight = weight
+        self.bias = bias
+        self.version = version
+
+
+def file_backbone_hash(state_dict, metadata):
+    """Hash do backbone gravado no pacote, ou calculado a partir dos tensores (checkpoint .pth ou pacote antigo)."""
+    return metadata.get("backbone_hash") or model_bundle.backbone_digest(state_dict)
+
+
+class MultiHeadClassifier:
+    """Classificador que aplica várias cabeças às features de um único forward do backbone.
+
+    Usado pelo agendador de micro-lotes como um classificador comum (preprocess_input
+    e predict_tensors); cada resultado traz, em "heads", o resultado de cada cabeça.
+
+    Args:
+        base: PlanktonClassifierPyTorch com o modelo eager carregado de um arquivo
+            (fornece o backbone, o pré-processamento e o dispositivo)
+    """
+
+    def __init__(self, base):
+        if base.model is None or base.model_format != "eager":
+            raise ValueError("Cabeças múltiplas exigem o modelo eager do PyTorch")
+        if not base.model_path or not os.path.exists(base.model_path):
+            raise ValueError("Cabeças múltiplas exigem o modelo base carregado de um arquivo")
+        self.base = base
+        self.model_version = base.model_version
+        self.backbone_hash = file_backbone_hash(*model_bundle.load_model_file(base.model_path))
+
+        self._heads = {}
+        # Cabeças concatenadas (refeitas quando uma cabeça é adicionada)
+        self._fused = None
+        self._lock = threading.Lock()
+
+    @property
+    def heads(self):
+        return list(self._heads)
+
+    def add_head(self, model_id, path):
+        """Carrega a camada final do modelo em path (só os seus pesos ficam em memória).
+
+        Raises:
+            ValueError: Se o modelo não compartilhar o backbone, a entrada ou a normalização do base
+        """
+        head = self._heads.get(model_id)
+        if head is not None:
+            return head
+
+        state_dict, metadata = model_bundle.load_model_file(path)
+        if file_backbone_hash(state_dict, metadata) != self.backbone_hash:
+            raise ValueError(f"O modelo {model_id} não compartilha o backbone do modelo base")
+        preprocessing = metadata.get("preprocessing") or {}
+        if tuple(metadata.get("input_shape", ())) != tuple(self.base.img_size) or \
+                [preprocessing.get("mean"), preprocessing.get("std")] != list(self.base.normalization):
+            raise ValueError(f"O modelo {model_id} usa outra entrada ou normalização que o modelo base")
+
+        # Cópias: o resto do arquivo (backbone) não fica referenciado
+        head = Head(model_id, list(metadata["classes"]),
+                    state_dict[HEAD_WEIGHT].detach().to(self.base.device, torch.float32).clone(),
+                    state_dict[HEAD_BIAS].detach().to(self.base.device, torch.float32).clone(),
+                    metadata.get("content_hash"))
+        with self._lock:
+            head = self._heads.setdefault(model_id, head)
+            self._fused = None
+        logger.info(f"Cabeça {model_id} adicionada ao backbone {self.backbone_hash} ({len(head.class_names)} classes)")
+        return head
+
+    def _fused_heads(self):
+        """(cabeças, pesos concatenados, bias concatenados) das cabeças carregadas."""
+        with self._lock:
+            if self._fused is None:
+                heads = list(self._heads.values())
+                weight = torch.cat([head.weight for head in heads]) if heads else None
+                bias = torch.cat([head.bias for head in heads]) if heads else None
+                self._fused = (heads, weight, bias)
+            return self._fused
+
+    def preprocess_input(self, source):
+        return self.base.preprocess_input(source)
+
+    def upload_source(self, image_data, img):
+        return self.base.upload_source(image_data, img)
+
+    def predict_tensors(self, tensors, top_k=3, start_time=None):
+        """Um forward do backbone e de todas as cabeças carregadas sobre o lote.
+
+        Returns:
+            list: Por tensor, {"success": True, "heads": {modelo: resultado}, ...}
+        """
+        start_time = start_time or time.time()
+        if not tensors:
+            return []
+        heads, weight, bias = self._fused_heads()
+        if not heads:
+            return [{"error": "Nenhuma cabeça carregada", "success": False} for _ in tensors]
+
+        try:
+            batch = self.base.stack_tensors(list(tensors))
+            per_head = []
+            with torch.inference_mode():
+                # O mesmo caminho de MobileNetV2.forward até a camada final (Dropout é identidade em eval)
+                pooled = torch.flatten(F.adaptive_avg_pool2d(self.base.model.features(batch), (1, 1)), 1)
+                logits = torch.addmm(bias, pooled, weight.t())
+                start = 0
+                for head in heads:
+                    end = start + len(head.class_names)
+                    probabilities = F.softmax(logits[:, start:end], dim=1)
+                    top_conf, top_idx = probabilities.topk(max(1, min(top_k, end - start)), dim=1)
+                    per_head.append((head, probabilities.cpu().tolist(), top_conf.cpu().tolist(),
+                                     top_idx.cpu().tolist()))
+                    start = end
+        except Exception as e:
+            return [{"error": f"Erro durante a predição: {str(e)}", "success": False} for _ in tensors]
+
+        processing_time = round(time.time() - start_time, 3)
+        formatted = {head.model_id: format_predictions(head.class_names, probs, confs, idxs, processing_time)
+                     for head, probs, confs, idxs in per_head}
+        return [{
+            "success": True,
+            "heads": {model_id: results[i] for model_id, results in formatted.items()},
+            "processing_time": processing_time,
+            "batch_size": len(tensors)
+        } for i in range(len(tensors))]
+
+    def predict_batch(self, inputs, model_ids=None, top_k=3):
+        """Classifica várias imagens; model_ids limita as cabeças incluídas nos resultados."""
+        start_time = time.time()
+        results = [None] * len(inputs)
+        tensors = []
+        positions = []
+        for i, source in enumerate(inputs):
+            tensor, error_msg = self.preprocess_input(source)
+            if tensor is None:
+                results[i] = {"error": error_msg, "success": False}
+            else:
+                tensors.append(tensor)
+                positions.append(i)
+
+        for i, result in zip(positions, self.predict_tensors(tensors, top_k=top_k, start_time=start_time)):
+            if model_ids is not None and result.get("success"):
+                result["heads"] = {model_id: result["heads"][model_id] for model_id in model_ids}
+            results[i] = result
+        return results
+
+    def get_stats(self):
+        heads = list(self._heads.values())
+        return {
+            "base_model": self.base.model_path,
+            "backbone_hash": self.backbone_hash,
+            "heads": {head.model_id: {"num_classes": len(head.class_names), "version": head.version}
+                      for head in heads},
+            "head_bytes": sum((head.weight.numel() + head.bias.numel()) * 4 for head in heads),
+        }
@@ -0,0 +1,63 @@
+"""
+Backend de inferência com onnxruntime (CPU).
+
+Executa o modelo exportado por export_model.py --format onnx. Este módulo não
+importa o PyTorch: com PLANKTON_INFERENCE_BACKEND=onnxruntime, os processos do
+servidor classificam imagens apenas com NumPy e onnxruntime, o que reduz memória e
+tempo de início.
+"""
+
+import json
+import os
+
+import numpy as np
+
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    onnxruntime = None
+    ONNXRUNTIME_AVAILABLE = False
+
+# Chave dos metadados do classificador no ONNX (metadata_props)
+METADATA_KEY = "plankton_classifier"
+
+ONNX_SUFFIX = ".onnx"
+
+
+def onnx_model_path(checkpoint_path):
+    """Caminho padrão do modelo ONNX ao lado do checkpoint float."""
+    return os.path.splitext(checkpoint_path)[0] + ONNX_SUFFIX
+
+
+class OnnxModel:
+    """Sessão do onnxruntime que recebe um lote NumPy (N, C, H, W) e devolve os logits.
+
+    Args:
+        path (str): Modelo ONNX
+        intra_op_threads (int): Threads por operador; None usa o padrão do onnxruntime
+    """
+
+    def __init__(self, path, intra_op_threads=None):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime não está instalado")
+
+        self.path = path
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        metadata = self.session.get_modelmeta().custom_metadata_map.get(METADATA_KEY)
+        self.metadata = json.loads(metadata) if metadata else {}
+
+    def __call__(self, batch):
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch)})[0]
+
+
+def softmax(logits):
+    """Softmax numericamente estável ao longo das classes."""
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
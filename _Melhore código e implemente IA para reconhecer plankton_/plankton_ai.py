@@ -2,14 +2,20 @@
 PYTORCH_AVAILABLE = False
 
 # Importações que não dependem do PyTorch
+import contextlib
 import os
+import io
 import json
+import hashlib
 import logging
 import time
 import traceback
-from functools import lru_cache
 from PIL import Image, UnidentifiedImageError
 
+from prediction_cache import PredictionCache
+import model_bundle
+from model_bundle import IMAGENET_MEAN, IMAGENET_STD
+
 # Importação do NumPy com tratamento de erro
 try:
     import numpy as np
@@ -20,15 +26,37 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "numpy==1.24.3"])
     import numpy as np
 
+# OpenCV é opcional: habilita o backend de imagem "opencv"
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    OPENCV_AVAILABLE = False
+
+# onnxruntime é opcional: habilita o backend de inferência "onnxruntime"
+from onnx_backend import ONNXRUNTIME_AVAILABLE, OnnxModel, onnx_model_path, softmax as numpy_softmax
+
+# Backends de inferência: "pytorch" (eager, TorchScript ou int8) ou "onnxruntime"
+INFERENCE_BACKENDS = ("pytorch", "onnxruntime")
+# Processos que usam apenas o onnxruntime não importam o PyTorch (menos memória e início mais rápido)
+SKIP_TORCH_IMPORT = os.environ.get("PLANKTON_INFERENCE_BACKEND", "pytorch") == "onnxruntime" and ONNXRUNTIME_AVAILABLE
+
 # Tentativa de importação do PyTorch
 try:
+    if SKIP_TORCH_IMPORT:
+        raise ImportError("PLANKTON_INFERENCE_BACKEND=onnxruntime")
     import torch
     import torch.nn as nn
     import torchvision.transforms as transforms
     import torchvision.models as models
+    from input_folding import FoldedInputConv
+    import model_quantization
+    import model_export
     PYTORCH_AVAILABLE = True
 except ImportError as e:
-    print(f"Erro ao importar PyTorch: {e}")
+    if not SKIP_TORCH_IMPORT:
+        print(f"Erro ao importar PyTorch: {e}")
     # Criar mocks para evitar quebra do código
     class DummyModule:
         def __init__(self, *args, **kwargs):
@@ -69,9 +97,257 @@ logging.basicConfig(
 logger = logging.getLogger("plankton_ai")
 
 
+# "float": o modelo recebe tensores normalizados em float (caminho original)
+# "uint8": o modelo recebe os pixels uint8, com a normalização embutida na primeira convolução
+INPUT_MODES = ("float", "uint8")
+
+# Modos PIL mantidos com um único canal quando o modelo aceita entrada em tons de cinza
+GRAYSCALE_MODES = ("1", "L", "LA")
+
+
+def open_image(source):
+    """Abre uma entrada (caminho, bytes, PIL.Image ou array NumPy) como PIL.Image.
+
+    Returns:
+        tuple: (imagem, mensagem_de_erro)
+    """
+    if isinstance(source, Image.Image):
+        return source, None
+
+    if isinstance(source, np.ndarray):
+        if source.dtype != np.uint8:
+            return None, f"Array de imagem deve ser uint8 (recebido: {source.dtype})"
+        if source.ndim not in (2, 3):
+            return None, f"Array de imagem com dimensões inválidas: {source.shape}"
+        return Image.fromarray(source), None
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        if len(source) == 0:
+            return None, "Dados de imagem vazios"
+        try:
+            return Image.open(io.BytesIO(source)), None
+        except UnidentifiedImageError:
+            return None, "Formato de imagem não reconhecido"
+
+    if os.path.getsize(source) == 0:
+        return None, "Arquivo de imagem vazio"
+    try:
+        return Image.open(source), None
+    except UnidentifiedImageError:
+        return None, "Formato de imagem não reconhecido"
+
+
+class ImageBackend:
+    """Interface de decodificação + redimensionamento usada pelo classificador.
+
+    Uma implementação recebe um caminho, bytes, PIL.Image ou array NumPy e devolve
+    um array uint8 contíguo (altura, largura, 3) já no tamanho de entrada do modelo,
+    ou (altura, largura) para imagens monocromáticas quando keep_grayscale=True.
+    """
+
+    name = None
+    # True quando o backend decodifica bytes por conta própria; nesse caso o servidor
+    # entrega os bytes do upload em vez da PIL.Image aberta na validação
+    prefers_encoded = False
+
+    def load(self, source, size, fast_decode=True, keep_grayscale=False):
+        """Decodifica e redimensiona uma imagem.
+
+        Args:
+            source: Caminho, bytes, PIL.Image ou array NumPy uint8
+            size (tuple): (altura, largura) de saída
+            fast_decode (bool): Permite decodificar em resolução reduzida
+            keep_grayscale (bool): Mantém imagens monocromáticas com um único canal
+                em vez de replicá-lo para RGB
+
+        Returns:
+            tuple: (array uint8 HxWx3 ou HxW, mensagem_de_erro)
+        """
+        raise NotImplementedError
+
+
+class PILImageBackend(ImageBackend):
+    """Decodificação e redimensionamento com Pillow (mesmo resultado do torchvision.Resize)."""
+
+    name = "pil"
+
+    def load(self, source, size, fast_decode=True, keep_grayscale=False):
+        img, error_msg = open_image(source)
+        if img is None:
+            return None, error_msg
+
+        target_h, target_w = size
+        if fast_decode:
+            img = self._reduce_for_model(img, target_w, target_h)
+        if keep_grayscale and img.mode in GRAYSCALE_MODES:
+            if img.mode != "L":
+                img = img.convert("L")
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img = img.resize((target_w, target_h), Image.BILINEAR)
+        # np.array (e não asarray) para obter um buffer gravável, aceito pelo torch.from_numpy
+        return np.array(img), None
+
+    @staticmethod
+    def _reduce_for_model(img, target_w, target_h):
+        """Reduz a imagem à menor escala que ainda cobre a entrada do modelo.
+
+        Para JPEG ainda não decodificado, draft() faz o próprio decodificador trabalhar
+        em 1/2, 1/4 ou 1/8 da resolução, poupando CPU e memória. Para os demais
+        formatos, reduce() aplica um filtro de caixa por um fator inteiro, o que
+        barateia o redimensionamento final para 224x224.
+        """
+        if img.format == "JPEG":
+            img.draft(None, (target_w, target_h))
+
+        factor = min(img.size[0] // target_w, img.size[1] // target_h)
+        if factor >= 2:
+            # reduce() não faz sentido para modos com paleta
+            if img.mode not in ("L", "RGB"):
+                img = img.convert("RGB")
+            img = img.reduce(factor)
+        return img
+
+
+class OpenCVImageBackend(ImageBackend):
+    """Decodificação com cv2.imdecode e redimensionamento com cv2.resize (INTER_AREA)."""
+
+    name = "opencv"
+    prefers_encoded = True
+
+    # Flags de decodificação reduzida do OpenCV (escala do decodificador JPEG)
+    _REDUCED_FLAGS = ((8, "IMREAD_REDUCED_COLOR_8"), (4, "IMREAD_REDUCED_COLOR_4"), (2, "IMREAD_REDUCED_COLOR_2"))
+    _REDUCED_GRAYSCALE_FLAGS = ((8, "IMREAD_REDUCED_GRAYSCALE_8"), (4, "IMREAD_REDUCED_GRAYSCALE_4"),
+                                (2, "IMREAD_REDUCED_GRAYSCALE_2"))
+
+    def load(self, source, size, fast_decode=True, keep_grayscale=False):
+        target_h, target_w = size
+
+        if isinstance(source, (str, os.PathLike)):
+            if os.path.getsize(source) == 0:
+                return None, "Arquivo de imagem vazio"
+            with open(source, "rb") as f:
+                source = f.read()
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            if len(source) == 0:
+                return None, "Dados de imagem vazios"
+            array = self._decode(source, target_w, target_h, fast_decode, keep_grayscale)
+            if array is None:
+                # Formatos que o OpenCV não lê (ex.: GIF) seguem pelo Pillow
+                img, error_msg = open_image(source)
+                if img is None:
+                    return None, error_msg
+                array = self._pil_to_array(img, keep_grayscale)
+        elif isinstance(source, Image.Image):
+            array = self._pil_to_array(source, keep_grayscale)
+        elif isinstance(source, np.ndarray):
+            if source.dtype != np.uint8:
+                return None, f"Array de imagem deve ser uint8 (recebido: {source.dtype})"
+            array = source
+        else:
+            return None, f"Tipo de entrada não suportado: {type(source).__name__}"
+
+        if array.ndim == 2:
+            if not keep_grayscale:
+                array = cv2.cvtColor(array, cv2.COLOR_GRAY2RGB)
+        elif array.shape[2] == 4:
+            array = cv2.cvtColor(array, cv2.COLOR_RGBA2RGB)
+        array = cv2.resize(array, (target_w, target_h), interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(array), None
+
+    @staticmethod
+    def _pil_to_array(img, keep_grayscale):
+        if keep_grayscale and img.mode in GRAYSCALE_MODES:
+            return np.asarray(img if img.mode == "L" else img.convert("L"))
+        return np.asarray(img if img.mode == "RGB" else img.convert("RGB"))
+
+    def _decode(self, data, target_w, target_h, fast_decode, keep_grayscale=False):
+        """Decodifica bytes para RGB (ou tons de cinza), em escala reduzida quando a imagem é grande."""
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        grayscale = False
+        scale = 1
+        try:
+            # Apenas o cabeçalho é lido aqui
+            header = Image.open(io.BytesIO(data))
+            grayscale = keep_grayscale and header.mode in GRAYSCALE_MODES
+            if fast_decode:
+                width, height = header.size
+                scale = min(width // target_w, height // target_h)
+        except Exception:
+            pass
+
+        flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+        for factor, flag_name in (self._REDUCED_GRAYSCALE_FLAGS if grayscale else self._REDUCED_FLAGS):
+            if scale >= factor:
+                flag = getattr(cv2, flag_name)
+                break
+
+        array = cv2.imdecode(buffer, flag)
+        if array is None:
+            return None
+        return array if grayscale else cv2.cvtColor(array, cv2.COLOR_BGR2RGB)
+
+
+IMAGE_BACKENDS = {
+    PILImageBackend.name: PILImageBackend,
+    OpenCVImageBackend.name: OpenCVImageBackend,
+}
+
+
+def get_image_backend(name):
+    """Instancia o backend de imagem pelo nome ("pil" ou "opencv")."""
+    name = (name or "pil").lower()
+    if name not in IMAGE_BACKENDS:
+        raise ValueError(f"Backend de imagem desconhecido: {name} (opções: {', '.join(IMAGE_BACKENDS)})")
+    if name == OpenCVImageBackend.name and not OPENCV_AVAILABLE:
+        logger.warning("OpenCV não está disponível; usando o backend de imagem PIL")
+        name = PILImageBackend.name
+    return IMAGE_BACKENDS[name]()
+
+
 class PlanktonClassifierPyTorch:
-    def __init__(self, model_path=None):
-        if not PYTORCH_AVAILABLE:
+    def __init__(self, model_path=None, cache_max_bytes=64 * 1024 * 1024, cache_ttl=None, fast_decode=False,
+                 image_backend="pil", input_mode="float", quantized_model_path=None, prefer_torchscript=True,
+                 inference_backend="pytorch", intra_op_threads=None):
+        if input_mode not in INPUT_MODES:
+            raise ValueError(f"Modo de entrada desconhecido: {input_mode} (opções: {', '.join(INPUT_MODES)})")
+        if inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Backend de inferência desconhecido: {inference_backend} "
+                             f"(opções: {', '.join(INFERENCE_BACKENDS)})")
+        if inference_backend == "onnxruntime" and not ONNXRUNTIME_AVAILABLE:
+            logger.warning("onnxruntime não está disponível; usando o backend de inferência PyTorch")
+            inference_backend = "pytorch"
+        self.input_mode = input_mode
+        self.inference_backend = inference_backend
+        # Checkpoint ou pacote pedido (identifica o modelo no registro do servidor)
+        self.model_path = model_path
+        # Threads por operador da sessão onnxruntime (com PyTorch, ver runtime_config.py)
+        self.intra_op_threads = intra_op_threads
+        # "eager" (torchvision), "torchscript" (export_model.py), "int8" (quantize_model.py)
+        # ou "onnx" (export_model.py --format onnx); artefatos exportados trazem seus metadados
+        self.model_format = "eager"
+        self.artifact_info = None
+        # Arquivo do artefato exportado em uso (None com o modelo eager)
+        self.artifact_path = None
+        # Pesos eager como visões sobre o arquivo mapeado em memória (pacote ou .pth com mmap, na CPU):
+        # já ficam no page cache, compartilhado entre processos
+        self.weights_mapped = False
+        # Grafo TorchScript exportado por export_model.py, preferido ao checkpoint quando presente
+        self.prefer_torchscript = prefer_torchscript
+
+        # Cache de predições por conteúdo; as chaves incluem a versão do modelo
+        self.prediction_cache = PredictionCache(max_bytes=cache_max_bytes, ttl_seconds=cache_ttl)
+        self.model_version = None
+        # Segundos gastos montando o grafo e carregando os pesos (resumo do início do servidor)
+        self.startup_timings = {}
+        # Tempos do último aquecimento por tamanho de lote (ver warmup)
+        self.warmup_info = None
+
+        if self.inference_backend == "onnxruntime":
+            self.model = None
+            self.device = "cpu"
+        elif not PYTORCH_AVAILABLE:
             logger.error("PyTorch não está disponível. O classificador não funcionará corretamente.")
             self.model = None
             self.device = None
@@ -89,127 +365,665 @@ class PlanktonClassifierPyTorch:
             "Other"
         ]
         self.img_size = (224, 224)
+        # Decodifica imagens grandes em escala reduzida antes do redimensionamento final; desligado por
+        # padrão porque muda a entrada do modelo em imagens acima de 2x o tamanho de entrada (benchmark_decode.py)
+        self.fast_decode = fast_decode
+        self.image_backend = get_image_backend(image_backend)
 
-        self.transform = transforms.Compose([
-            transforms.Resize(self.img_size),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                                 std=[0.229, 0.224, 0.225]),
-        ])
+        self._set_normalization(IMAGENET_MEAN, IMAGENET_STD)
 
-        if model_path and os.path.exists(model_path):
+        if self.inference_backend == "onnxruntime":
+            # Sem PyTorch não há como reconstruir o modelo: o ONNX exportado é obrigatório
+            result = self.load_model(model_path or "")
+            if not result["success"]:
+                logger.error(f"Erro ao carregar modelo ONNX: {result['message']}")
+        elif quantized_model_path and os.path.exists(quantized_model_path):
+            result = self.load_quantized_model(quantized_model_path)
+            if not result["success"]:
+                logger.error(f"Erro ao carregar modelo quantizado: {result['message']}")
+                self.create_model()
+        elif model_path and os.path.exists(model_path):
             self.load_model(model_path)
         else:
             self.create_model()
 
     def create_model(self):
+        """MobileNetV2 com pesos ImageNet e uma nova camada final (usado quando não há checkpoint)."""
+        self.weights_mapped = False
         if not PYTORCH_AVAILABLE:
             logger.error("Não é possível criar o modelo: PyTorch não está disponível")
             self.model = None
             return
 
         try:
-            self.model = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.IMAGENET1K_V1)
-            for param in self.model.parameters():
-                param.requires_grad = False
-            num_ftrs = self.model.classifier[1].in_features
-            self.model.classifier[1] = nn.Linear(num_ftrs, len(self.class_names))
-            self.model = self.model.to(self.device)
+            self.model_format = "eager"
+            self.artifact_info = None
+            with self._timed("graph_build"):
+                self.model = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.IMAGENET1K_V1)
+                for param in self.model.parameters():
+                    param.requires_grad = False
+                num_ftrs = self.model.classifier[1].in_features
+                self.model.classifier[1] = nn.Linear(num_ftrs, len(self.class_names))
+                self.model = self.model.to(self.device)
+            self._apply_input_mode()
+            self._set_model_version(f"imagenet-{int(time.time() * 1000)}")
             logger.info("Modelo PyTorch criado com sucesso!")
         except Exception as e:
             logger.error(f"Erro ao criar modelo: {str(e)}")
             self.model = None
 
-    def preprocess_image(self, image_path):
+    def build_model(self, num_classes):
+        """Monta o MobileNetV2 sem pesos, com a camada final para num_classes, para receber um checkpoint.
+
+        Não lê os pesos ImageNet (nem acessa a rede) e não inicializa parâmetros que
+        seriam sobrescritos: a arquitetura é criada no dispositivo "meta" e os tensores
+        do checkpoint são atribuídos diretamente em load_state_dict(assign=True).
+        """
+        self.model_format = "eager"
+        self.artifact_info = None
+        with self._timed("graph_build"):
+            with torch.device("meta"):
+                self.model = models.mobilenet_v2(weights=None, num_classes=num_classes)
+        return self.model
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        """Acumula a duração do bloco em startup_timings[name]."""
+        start = time.perf_counter()
         try:
-            if os.path.getsize(image_path) == 0:
-                return None, "Arquivo de imagem vazio"
+            yield
+        finally:
+            self.startup_timings[name] = self.startup_timings.get(name, 0.0) + time.perf_counter() - start
 
-            try:
-                img = Image.open(image_path)
-            except UnidentifiedImageError:
-                return None, "Formato de imagem não reconhecido"
+    @property
+    def quantized(self):
+        return self.model_format == "int8"
 
-            if img.mode != "RGB":
-                img = img.convert("RGB")
+    @property
+    def torchscript(self):
+        return self.model_format == "torchscript"
+
+    def set_input_mode(self, input_mode):
+        """Alterna entre entrada float normalizada e entrada uint8 no modelo já carregado."""
+        if input_mode not in INPUT_MODES:
+            raise ValueError(f"Modo de entrada desconhecido: {input_mode} (opções: {', '.join(INPUT_MODES)})")
+        self.input_mode = input_mode
+        if self.model is not None:
+            self._apply_input_mode()
+
+    def _set_normalization(self, mean, std):
+        """Define a média e o desvio padrão por canal usados no pré-processamento (e embutidos no modo uint8)."""
+        self.normalization = (list(mean), list(std))
+        if PYTORCH_AVAILABLE:
+            self.mean = torch.tensor(mean).view(3, 1, 1)
+            self.std = torch.tensor(std).view(3, 1, 1)
+        # Normalização em NumPy para o backend onnxruntime: x * escala - deslocamento
+        self._pixel_scale = (1.0 / (255.0 * np.array(std, dtype=np.float32))).reshape(3, 1, 1)
+        self._pixel_offset = (np.array(mean, dtype=np.float32) / np.array(std, dtype=np.float32)).reshape(3, 1, 1)
+
+    def _apply_input_mode(self):
+        """Embute (ou remove) a normalização na primeira convolução conforme input_mode."""
+        if self.model_format != "eager":
+            # Artefatos exportados são grafos fechados: o modo de entrada foi fixado na exportação
+            fixed_mode = self.artifact_info.get("input_mode", "float")
+            if self.input_mode != fixed_mode:
+                logger.warning(f"Modelo exportado aceita apenas input_mode='{fixed_mode}'; ignorando '{self.input_mode}'")
+                self.input_mode = fixed_mode
+            return
+        first_block = self.model.features[0]
+        conv = first_block[0]
+        if self.input_mode == "uint8" and not isinstance(conv, FoldedInputConv):
+            first_block[0] = FoldedInputConv(conv, *self.normalization)
+        elif self.input_mode == "float" and isinstance(conv, FoldedInputConv):
+            first_block[0] = conv.unfold()
+
+    def _float_state_dict(self):
+        """state_dict no formato original (primeira convolução sem a normalização embutida)."""
+        state_dict = self.model.state_dict()
+        conv = self.model.features[0][0]
+        if isinstance(conv, FoldedInputConv):
+            prefix = "features.0.0."
+            state_dict = {k: v for k, v in state_dict.items() if not k.startswith(prefix)}
+            state_dict.update({prefix + k: v for k, v in conv.unfold().state_dict().items()})
+        return state_dict
+
+    def _set_model_version(self, version):
+        """Registra a versão do modelo em uso e invalida as predições em cache."""
+        self.model_version = version
+        self.prediction_cache.clear()
+
+    def cache_key(self, image_data):
+        """Chave de cache para os bytes de uma imagem com o modelo atual."""
+        return PredictionCache.make_key(image_data, self.model_version)
+
+    def preprocess_input(self, source):
+        """Converte uma entrada em um tensor (C, H, W) pronto para ser empilhado em lote.
+
+        No modo "uint8" o tensor é uint8, com C=1 para imagens monocromáticas. Com o
+        backend onnxruntime o resultado é um array NumPy.
+        """
+        try:
+            uint8_input = self.input_mode == "uint8"
+            # Grafos exportados foram rastreados com 3 canais; só o modelo eager aceita 1 canal
+            array, error_msg = self.image_backend.load(source, self.img_size, self.fast_decode,
+                                                       keep_grayscale=uint8_input and self.model_format == "eager")
+            if array is None:
+                return None, error_msg
+
+            if self.model_format == "onnx":
+                chw = array.transpose(2, 0, 1)
+                if uint8_input:
+                    return np.ascontiguousarray(chw), None
+                normalized = chw * self._pixel_scale
+                normalized -= self._pixel_offset
+                return normalized, None
+
+            if uint8_input:
+                # Os pixels seguem como uint8 (1 ou 3 canais); a normalização está no modelo
+                if array.ndim == 2:
+                    return torch.from_numpy(array).unsqueeze(0), None
+                return torch.from_numpy(array).permute(2, 0, 1), None
 
-            img_tensor = self.transform(img).unsqueeze(0)
-            return img_tensor.to(self.device), None
+            # Equivalente a ToTensor + Normalize sobre o array já redimensionado
+            img_tensor = torch.from_numpy(array).permute(2, 0, 1).float().div_(255)
+            return img_tensor.sub_(self.mean).div_(self.std), None
         except Exception as e:
             return None, f"Erro no pré-processamento da imagem: {str(e)}"
 
-    def predict(self, image_path):
-        start_time = time.time()
-        if not PYTORCH_AVAILABLE:
-            return {"error": "PyTorch não disponível", "success": False}
+    def upload_source(self, image_data, img):
+        """Escolhe o que entregar ao pré-processamento para um upload já validado.
 
-        if self.model is None:
-            return {"error": "Modelo não carregado", "success": False}
+        Args:
+            image_data (bytes): Bytes originais do upload
+            img (PIL.Image.Image): A mesma imagem aberta (só o cabeçalho) na validação
+        """
+        return image_data if self.image_backend.prefers_encoded else img
+
+    def preprocess_image(self, image_path):
+        img_tensor, error_msg = self.preprocess_input(image_path)
+        if img_tensor is None:
+            return None, error_msg
+        return img_tensor.unsqueeze(0).to(self.device), None
+
+    def predict_tensors(self, tensors, top_k=3, start_time=None):
+        """Executa um único forward sobre tensores já pré-processados.
 
-        processed_img, error_msg = self.preprocess_image(image_path)
-        if processed_img is None:
-            return {"error": error_msg, "success": False}
+        Args:
+            tensors (list): Tensores (C, H, W) retornados por preprocess_input
+            top_k (int): Número de classes mais prováveis incluídas em cada resultado
+            start_time (float): Instante de início usado em processing_time
+
+        Returns:
+            list: Um dicionário de resultado por tensor, na mesma ordem
+        """
+        start_time = start_time or time.time()
+        unavailable = self._unavailable_error()
+        if unavailable:
+            return [{"error": unavailable, "success": False} for _ in tensors]
+        if not tensors:
+            return []
 
         try:
-            self.model.eval()
-            with torch.no_grad():
-                outputs = self.model(processed_img)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)[0]
-                confidence, predicted_class_idx = torch.max(probabilities, 0)
-
-            result = {
-                "predicted_class": self.class_names[predicted_class_idx.item()],
-                "confidence": float(confidence.item()),
-                "all_predictions": {c: float(probabilities[i].item()) for i, c in enumerate(self.class_names)},
-                "success": True,
-                "processing_time": round(time.time() - start_time, 3)
-            }
-            return result
+            k = max(1, min(top_k, len(self.class_names)))
+            if self.model_format == "onnx":
+                all_probs, top_conf, top_idx = self._forward_onnx(list(tensors), k)
+            else:
+                all_probs, top_conf, top_idx = self._forward_torch(list(tensors), k)
         except Exception as e:
-            return {"error": f"Erro durante a predição: {str(e)}", "success": False}
+            return [{"error": f"Erro durante a predição: {str(e)}", "success": False} for _ in tensors]
+
+        return format_predictions(self.class_names, all_probs, top_conf, top_idx,
+                                  round(time.time() - start_time, 3))
+
+    def stack_tensors(self, tensors):
+        """Empilha os tensores de preprocess_input em um lote no dispositivo do modelo."""
+        if len({t.shape[0] for t in tensors}) > 1:
+            # Lote misto (cinza e RGB): replicar o canal é equivalente aos pesos somados
+            tensors = [t.expand(3, -1, -1) if t.shape[0] == 1 else t for t in tensors]
+        return torch.stack(tensors).to(self.device)
+
+    def _forward_torch(self, tensors, k):
+        batch = self.stack_tensors(tensors)
+
+        self.model.eval()
+        with torch.inference_mode():
+            outputs = self.model(batch)
+            probabilities = torch.nn.functional.softmax(outputs, dim=1)
+            top_conf, top_idx = probabilities.topk(k, dim=1)
+
+        # Uma única cópia para Python por tensor, em vez de um .item() por classe
+        return probabilities.cpu().tolist(), top_conf.cpu().tolist(), top_idx.cpu().tolist()
+
+    def _forward_onnx(self, arrays, k):
+        probabilities = numpy_softmax(self.model(np.stack(arrays)))
+        top_idx = np.argsort(-probabilities, axis=1, kind="stable")[:, :k]
+        top_conf = np.take_along_axis(probabilities, top_idx, axis=1)
+        return probabilities.tolist(), top_conf.tolist(), top_idx.tolist()
+
+    def _unavailable_error(self):
+        """Mensagem de erro quando não há como classificar, ou None."""
+        if self.model is not None:
+            return None
+        if self.inference_backend == "pytorch" and not PYTORCH_AVAILABLE:
+            return "PyTorch não disponível"
+        return "Modelo não carregado"
+
+    def predict_batch(self, inputs, top_k=3):
+        """Classifica várias imagens com um único forward.
+
+        Args:
+            inputs (list): Caminhos, bytes, PIL.Image ou arrays NumPy uint8
+            top_k (int): Número de classes mais prováveis incluídas em cada resultado
+
+        Returns:
+            list: Um dicionário de resultado por entrada; entradas inválidas recebem
+                um resultado com "success": False sem interromper o lote
+        """
+        start_time = time.time()
+        unavailable = self._unavailable_error()
+        if unavailable:
+            return [{"error": unavailable, "success": False} for _ in inputs]
+
+        results = [None] * len(inputs)
+        tensors = []
+        positions = []
+        for i, source in enumerate(inputs):
+            img_tensor, error_msg = self.preprocess_input(source)
+            if img_tensor is None:
+                results[i] = {"error": error_msg, "success": False}
+            else:
+                tensors.append(img_tensor)
+                positions.append(i)
+
+        batch_results = self.predict_tensors(tensors, top_k=top_k, start_time=start_time)
+        for i, result in zip(positions, batch_results):
+            results[i] = result
+        return results
+
+    def predict(self, image_path):
+        return self.predict_batch([image_path])[0]
+
+    def warmup(self, batch_sizes=(1,), repeats=2):
+        """Executa lotes sintéticos de cada tamanho antes de o modelo atender requisições.
+
+        O primeiro forward de cada formato de entrada paga o crescimento do alocador,
+        a escolha dos kernels do oneDNN e, no TorchScript, a especialização do grafo
+        (que leva duas execuções). Com entrada uint8 uma imagem monocromática usa
+        outra convolução, aquecida com lote 1.
+
+        Args:
+            batch_sizes (iterable): Tamanhos de lote que o agendador pode formar
+            repeats (int): Execuções por tamanho de lote
+
+        Returns:
+            dict: Tempos por formato (também em warmup_info e get_model_info)
+        """
+        unavailable = self._unavailable_error()
+        if unavailable:
+            raise RuntimeError(unavailable)
+
+        color, _ = self.preprocess_input(np.zeros((*self.img_size, 3), dtype=np.uint8))
+        gray, _ = self.preprocess_input(np.zeros(self.img_size, dtype=np.uint8))
+        shapes = [(color, batch_size) for batch_size in sorted({int(b) for b in batch_sizes if int(b) > 0})]
+        if shapes and gray.shape[0] != color.shape[0]:
+            shapes.append((gray, 1))
+
+        timings = []
+        start = time.perf_counter()
+        for sample, batch_size in shapes:
+            durations = []
+            for _ in range(max(1, int(repeats))):
+                run_start = time.perf_counter()
+                result = self.predict_tensors([sample] * batch_size)[0]
+                durations.append((time.perf_counter() - run_start) * 1000)
+                if not result["success"]:
+                    raise RuntimeError(result["error"])
+            timings.append({"batch_size": batch_size, "channels": int(sample.shape[0]),
+                            "first_ms": round(durations[0], 1), "steady_ms": round(durations[-1], 1)})
+            logger.info(f"Aquecimento do lote {batch_size} ({sample.shape[0]} canal(is)): "
+                        f"1ª execução {durations[0]:.1f}ms, última {durations[-1]:.1f}ms")
+
+        self.warmup_info = {"repeats": max(1, int(repeats)), "total_seconds": round(time.perf_counter() - start, 3),
+                            "shapes": timings}
+        return self.warmup_info
+
+    def predict_image(self, img):
+        """Classifica uma PIL.Image já aberta (os pixels são decodificados uma única vez aqui)."""
+        return self.predict_batch([img])[0]
+
+    def predict_bytes(self, image_data):
+        """Classifica uma imagem em memória (ex.: o corpo de um upload) sem gravá-la em disco."""
+        key = self.cache_key(image_data)
+        cached = self.prediction_cache.get(key)
+        if cached is not None:
+            cached["cached"] = True
+            return cached
+
+        result = self.predict_batch([image_data])[0]
+        if result.get("success"):
+            self.prediction_cache.put(key, result)
+        return result
 
     def save_model(self, save_path):
         if self.model is None:
             return {"success": False, "message": "Nenhum modelo para salvar"}
+        if self.model_format != "eager":
+            return {"success": False, "message": "Modelos exportados são gerados a partir do checkpoint float "
+                                                 "(quantize_model.py / export_model.py)"}
         try:
+            if model_bundle.is_bundle(save_path):
+                mean, std = self.normalization
+                preprocessing = dict(model_bundle.default_preprocessing(self.img_size), mean=mean, std=std)
+                metadata = model_bundle.save_bundle(self._float_state_dict(), save_path, self.class_names,
+                                                    self.img_size, preprocessing=preprocessing)
+                return {"success": True, "message": f"Modelo salvo em {save_path} (hash {metadata['content_hash']})"}
+
             os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
-            torch.save(self.model.state_dict(), save_path)
-            with open(save_path.replace(".pth", "_classes.json"), "w", encoding="utf-8") as f:
+            torch.save(self._float_state_dict(), save_path)
+            base = os.path.splitext(save_path)[0]
+            with open(base + "_classes.json", "w", encoding="utf-8") as f:
                 json.dump(self.class_names, f, ensure_ascii=False, indent=4)
+            # Permite reconstruir a arquitetura sem os pesos ImageNet ao carregar o checkpoint
+            info = {
+                "num_classes": len(self.class_names),
+                "classes": self.class_names,
+                "input_shape": list(self.img_size),
+                "saved_date": time.strftime("%Y-%m-%d"),
+                "model_type": "MobileNetV2",
+            }
+            with open(base + "_info.json", "w", encoding="utf-8") as f:
+                json.dump(info, f, ensure_ascii=False, indent=4)
             return {"success": True, "message": f"Modelo salvo em {save_path}"}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
     def load_model(self, model_path):
+        if self.inference_backend == "onnxruntime":
+            # Aceita o próprio .onnx ou o checkpoint, cujo .onnx exportado fica ao lado
+            if model_path.endswith(".onnx"):
+                return self.load_onnx_model(model_path)
+            source_checkpoint = model_path if os.path.exists(model_path) else None
+            return self.load_onnx_model(onnx_model_path(model_path), source_checkpoint=source_checkpoint)
         if not PYTORCH_AVAILABLE:
             return {"success": False, "message": "PyTorch não disponível"}
         if not os.path.exists(model_path):
             return {"success": False, "message": f"Arquivo não encontrado: {model_path}"}
 
+        if self.prefer_torchscript:
+            torchscript_path = model_export.torchscript_path(model_path)
+            if os.path.exists(torchscript_path):
+                result = self.load_torchscript_model(torchscript_path, source_checkpoint=model_path)
+                if result["success"]:
+                    return result
+                logger.warning(f"Usando o modelo eager: {result['message']}")
+
         try:
-            self.create_model()
-            self.model.load_state_dict(torch.load(model_path, map_location=self.device))
+            if model_bundle.is_bundle(model_path):
+                # Pacote único: os pesos são visões sobre o arquivo mapeado em memória, sem cópia
+                with self._timed("weight_load"):
+                    state_dict, metadata = model_bundle.load_bundle(model_path, device=self.device)
+                num_classes = self._apply_bundle_metadata(metadata, state_dict)
+                mapped = True
+            else:
+                self._set_normalization(IMAGENET_MEAN, IMAGENET_STD)
+                with self._timed("weight_load"):
+                    state_dict, mapped = _load_checkpoint(model_path, self.device)
+                num_classes = self._load_class_names(model_path, state_dict)
+            self.build_model(num_classes)
+            with self._timed("weight_load"):
+                self.model.load_state_dict(state_dict, assign=True)
+            for param in self.model.parameters():
+                param.requires_grad = False
+            self._apply_input_mode()
             self.model.eval()
+            self._set_model_version(_checkpoint_digest(model_path))
+            # Fora da CPU os pesos são copiados para o dispositivo
+            self.weights_mapped = mapped and str(self.device) == "cpu"
             return {"success": True, "message": f"Modelo carregado: {model_path}"}
         except Exception as e:
+            self.model = None
             return {"success": False, "message": str(e)}
 
-    def get_model_info(self):
+    def _apply_bundle_metadata(self, metadata, state_dict):
+        """Define classes, tamanho de entrada e normalização a partir dos metadados do pacote."""
+        num_classes = metadata["num_classes"]
+        checkpoint_classes = state_dict["classifier.1.weight"].shape[0]
+        if len(metadata["classes"]) != num_classes or checkpoint_classes != num_classes:
+            raise ValueError(f"O pacote declara {num_classes} classes, mas tem {len(metadata['classes'])} nomes "
+                             f"e {checkpoint_classes} saídas")
+        self.class_names = list(metadata["classes"])
+        self.img_size = tuple(metadata["input_shape"])
+        preprocessing = metadata.get("preprocessing") or {}
+        self._set_normalization(preprocessing.get("mean", IMAGENET_MEAN), preprocessing.get("std", IMAGENET_STD))
+        return num_classes
+
+    def _load_class_names(self, model_path, state_dict=None):
+        """Define as classes do checkpoint e retorna o número de classes.
+
+        O número vem de <nome>_info.json (ou do próprio checkpoint, na falta dele); os
+        nomes, de <nome>_classes.json ou da lista em <nome>_info.json.
+        """
+        base = os.path.splitext(model_path)[0]
+        info = _read_json(base + "_info.json") or {}
+        names = _read_json(base + "_classes.json") or info.get("classes")
+        num_classes = info.get("num_classes") or (len(names) if names else None)
+        if state_dict is not None and "classifier.1.weight" in state_dict:
+            checkpoint_classes = state_dict["classifier.1.weight"].shape[0]
+            if num_classes is None:
+                num_classes = checkpoint_classes
+            elif num_classes != checkpoint_classes:
+                raise ValueError(f"{base}_info.json declara {num_classes} classes, mas o checkpoint tem {checkpoint_classes}")
+
+        if names and len(names) == num_classes:
+            self.class_names = list(names)
+        elif num_classes is not None:
+            self.class_names = [f"classe_{i}" for i in range(num_classes)]
+        return len(self.class_names)
+
+    def load_torchscript_model(self, model_path, source_checkpoint=None):
+        """Carrega o grafo TorchScript gerado por export_model.py (otimizado para CPU).
+
+        Args:
+            model_path (str): Artefato TorchScript
+            source_checkpoint (str): Checkpoint de origem; se informado, o artefato só é
+                usado quando foi exportado a partir desse mesmo arquivo
+        """
+        if not PYTORCH_AVAILABLE:
+            return {"success": False, "message": "PyTorch não disponível"}
+        if not os.path.exists(model_path):
+            return {"success": False, "message": f"Arquivo não encontrado: {model_path}"}
+        if self.device.type != "cpu":
+            return {"success": False, "message": "O artefato TorchScript é otimizado para CPU"}
+
+        try:
+            with self._timed("weight_load"):
+                model, metadata = model_export.load_torchscript(model_path, optimize=False)
+            if source_checkpoint is not None and metadata.get("source_digest") != _checkpoint_digest(source_checkpoint):
+                return {"success": False, "message": f"{model_path} está desatualizado em relação a {source_checkpoint}"}
+            with self._timed("graph_build"):
+                model = torch.jit.optimize_for_inference(model)
+
+            self.model = model
+            self.model_format = "torchscript"
+            self.artifact_info = metadata
+            self.artifact_path = model_path
+            if metadata.get("classes"):
+                self.class_names = list(metadata["classes"])
+            if metadata.get("input_shape"):
+                self.img_size = tuple(metadata["input_shape"])
+            self._apply_input_mode()
+            # Mesmo modelo do checkpoint: mantém a versão (e as entradas do cache) do .pth
+            self._set_model_version(metadata.get("source_digest") or f"torchscript-{_file_digest(model_path)}")
+            logger.info(f"Modelo TorchScript carregado: {model_path} (entrada: {self.input_mode})")
+            return {"success": True, "message": f"Modelo TorchScript carregado: {model_path}"}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    def load_quantized_model(self, model_path):
+        """Carrega o artefato int8 gerado por quantize_model.py (inferência apenas em CPU)."""
         if not PYTORCH_AVAILABLE:
             return {"success": False, "message": "PyTorch não disponível"}
+        if not os.path.exists(model_path):
+            return {"success": False, "message": f"Arquivo não encontrado: {model_path}"}
+
+        try:
+            with self._timed("weight_load"):
+                model, metadata = model_quantization.load_quantized_model(model_path)
+            if self.device.type != "cpu":
+                logger.warning("Kernels quantizados rodam apenas em CPU; usando a CPU")
+                self.device = torch.device("cpu")
+            self.model = model
+            self.model_format = "int8"
+            self.artifact_info = metadata
+            self.artifact_path = model_path
+            if metadata.get("classes"):
+                self.class_names = list(metadata["classes"])
+            if metadata.get("input_shape"):
+                self.img_size = tuple(metadata["input_shape"])
+            self._apply_input_mode()
+            self._set_model_version(f"int8-{_file_digest(model_path)}")
+            logger.info(f"Modelo quantizado int8 carregado: {model_path} (engine: {metadata.get('engine')})")
+            return {"success": True, "message": f"Modelo quantizado carregado: {model_path}"}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    def load_onnx_model(self, model_path, source_checkpoint=None):
+        """Carrega o modelo ONNX gerado por export_model.py --format onnx no onnxruntime.
+
+        Args:
+            model_path (str): Modelo ONNX
+            source_checkpoint (str): Checkpoint de origem; se informado, o modelo só é
+                usado quando foi exportado a partir desse mesmo arquivo
+        """
+        if not ONNXRUNTIME_AVAILABLE:
+            return {"success": False, "message": "onnxruntime não disponível"}
+        if not os.path.exists(model_path):
+            return {"success": False, "message": f"Arquivo não encontrado: {model_path}"}
+
+        try:
+            # A sessão lê os pesos e otimiza o grafo na criação
+            with self._timed("graph_build"):
+                model = OnnxModel(model_path, intra_op_threads=self.intra_op_threads)
+            metadata = model.metadata
+            if source_checkpoint is not None and metadata.get("source_digest") != _checkpoint_digest(source_checkpoint):
+                return {"success": False, "message": f"{model_path} está desatualizado em relação a {source_checkpoint}"}
+
+            self.model = model
+            self.model_format = "onnx"
+            self.artifact_info = metadata
+            self.artifact_path = model_path
+            self.device = "cpu"
+            if metadata.get("classes"):
+                self.class_names = list(metadata["classes"])
+            if metadata.get("input_shape"):
+                self.img_size = tuple(metadata["input_shape"])
+            self._apply_input_mode()
+            self._set_model_version(metadata.get("source_digest") or f"onnx-{_file_digest(model_path)}")
+            logger.info(f"Modelo ONNX carregado no onnxruntime: {model_path} (entrada: {self.input_mode})")
+            return {"success": True, "message": f"Modelo ONNX carregado: {model_path}"}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    def memory_bytes(self):
+        """Bytes dos pesos e buffers do modelo carregado (estimativa da memória que ele ocupa)."""
         if self.model is None:
-            return {"success": False, "message": "Modelo não carregado"}
+            return 0
+        if self.model_format != "eager":
+            # Grafos exportados guardam os pesos como constantes: o tamanho do artefato é a estimativa
+            return os.path.getsize(self.artifact_path)
+        # Storages únicos: visões sobre o mesmo mapeamento (pacote mmap) não são contadas duas vezes
+        storages = {}
+        for tensor in self.model.state_dict().values():
+            if isinstance(tensor, torch.Tensor) and not tensor.is_quantized:
+                storage = tensor.untyped_storage()
+                storages[storage.data_ptr()] = storage.nbytes()
+            elif isinstance(tensor, torch.Tensor):
+                storages[id(tensor)] = tensor.numel() * tensor.element_size()
+        return sum(storages.values())
+
+    def get_model_info(self):
+        unavailable = self._unavailable_error()
+        if unavailable:
+            return {"success": False, "message": unavailable}
         return {
             "classes": self.class_names,
             "num_classes": len(self.class_names),
             "input_shape": self.img_size,
             "device": str(self.device),
+            "image_backend": self.image_backend.name,
+            "input_mode": self.input_mode,
+            "inference_backend": self.inference_backend,
+            "model_format": self.model_format,
+            "quantized": self.quantized,
+            "quantization_engine": self.artifact_info.get("engine") if self.quantized else None,
+            "model_version": self.model_version,
+            "warmup": self.warmup_info,
+            "cache_stats": self.prediction_cache.get_stats(),
             "success": True
         }
 
 
-def create_plankton_classifier():
-    return PlanktonClassifierPyTorch()
+def format_predictions(class_names, all_probs, top_conf, top_idx, processing_time):
+    """Um dicionário de resultado por imagem a partir das probabilidades e do top-k de um lote."""
+    results = []
+    for probs, confs, idxs in zip(all_probs, top_conf, top_idx):
+        results.append({
+            "predicted_class": class_names[idxs[0]],
+            "confidence": float(confs[0]),
+            "all_predictions": dict(zip(class_names, probs)),
+            "top_predictions": [
+                {"class": class_names[i], "confidence": float(c)} for i, c in zip(idxs, confs)
+            ],
+            "success": True,
+            "processing_time": processing_time,
+            "batch_size": len(all_probs)
+        })
+    return results
+
+
+def _read_json(path):
+    """Conteúdo de um arquivo JSON, ou None se ele não existir."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _load_checkpoint(path, device):
+    """Lê o state_dict de um checkpoint .pth, mapeando o arquivo em memória (mmap) quando possível.
+
+    Com mmap os tensores são lidos do page cache sob demanda, sem uma cópia
+    intermediária, e as páginas são compartilhadas entre processos que carregam o
+    mesmo arquivo.
+
+    Returns:
+        tuple: (state_dict, True se o arquivo foi mapeado em memória)
+    """
+    try:
+        return torch.load(path, map_location=device, weights_only=True, mmap=True), True
+    except RuntimeError:
+        # Checkpoints no formato antigo (não zip) não podem ser mapeados
+        return torch.load(path, map_location=device, weights_only=True), False
+
+
+def _checkpoint_digest(path):
+    """Versão de um checkpoint: o hash do conteúdo gravado no pacote, ou o hash do arquivo .pth."""
+    if model_bundle.is_bundle(path):
+        return model_bundle.read_metadata(path)["content_hash"]
+    return _file_digest(path)
+
+
+def _file_digest(path, length=16):
+    """Hash SHA-256 (truncado) do conteúdo de um arquivo, usado como versão do modelo."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def create_plankton_classifier(**kwargs):
+    return PlanktonClassifierPyTorch(**kwargs)
 
 
 if __name__ == "__main__":
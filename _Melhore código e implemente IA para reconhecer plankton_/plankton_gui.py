@@ -528,7 +528,9 @@ class PlanktonAIApp:
                 try:
                     with open(self.current_image_path, 'rb') as f:
                         files = {'file': f}
-                        response = requests.post(f"{self.server_url}/predict", files=files, timeout=30)
+                        # O operador no microscópio passa à frente do reprocessamento em massa
+                        response = requests.post(f"{self.server_url}/predict", files=files,
+                                                 headers={'X-Priority': 'interactive'}, timeout=30)
                     
                     # Calcular tempo de processamento
                     elapsed_time = time.time() - start_time
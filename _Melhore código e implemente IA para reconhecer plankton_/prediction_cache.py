@@ -0,0 +1,111 @@
+"""
+Cache de predições endereçado por conteúdo.
+
+As chaves combinam o hash SHA-256 dos bytes da imagem com a versão do modelo,
+de modo que reenviar a mesma ROI devolve o resultado anterior sem decodificar a
+imagem nem executar o modelo, e trocar o modelo invalida todas as entradas.
+"""
+
+import collections
+import hashlib
+import json
+import threading
+import time
+
+# Custo aproximado de uma entrada além do próprio resultado (chave, tupla, OrderedDict)
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+class PredictionCache:
+    """Cache LRU limitado por memória, com expiração opcional.
+
+    Args:
+        max_bytes (int): Memória máxima estimada ocupada pelas entradas; 0 desativa o cache
+        ttl_seconds (float): Tempo de vida de cada entrada; None para não expirar
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl_seconds=None):
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+
+        self._entries = collections.OrderedDict()  # chave -> (resultado, tamanho, expira_em)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(image_data, model_version):
+        return f"{model_version}:{hashlib.sha256(image_data).hexdigest()}"
+
+    def get(self, key):
+        """Retorna uma cópia do resultado armazenado, ou None em caso de falta."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            result, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        size = len(json.dumps(result)) + len(key) + _ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (dict(result), size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        """Descarta todas as entradas (ex.: quando o modelo é recarregado)."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Gera o modelo int8 (quantização estática pós-treinamento) a partir do checkpoint float.
+
+A calibração usa imagens reais de plâncton: quanto mais representativas das
+câmeras de campo, melhor a precisão do modelo quantizado. O artefato gerado é
+carregado pelo servidor com PLANKTON_QUANTIZED_MODEL e comparado ao modelo float
+com benchmark_quantization.py.
+
+Uso:
+    python quantize_model.py --calibration-dir amostras
+    python quantize_model.py --checkpoint models/plankton_model.pth --calibration-dir amostras \\
+        --max-images 300 --engine qnnpack
+"""
+
+import argparse
+import json
+import os
+import time
+
+import torch
+
+import model_bundle
+import model_quantization
+from plankton_ai import IMAGENET_MEAN, IMAGENET_STD, get_image_backend
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.gif', '.webp')
+MODEL_INPUT = (224, 224)
+
+
+def find_images(images_dir, max_images=None):
+    """Lista as imagens de um diretório (incluindo subdiretórios por classe)."""
+    paths = []
+    for root, _, files in os.walk(images_dir):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    paths.sort()
+    return paths[:max_images] if max_images else paths
+
+
+def load_class_names(checkpoint_path, num_classes):
+    """Classes do pacote, ou salvas ao lado do checkpoint (<nome>_classes.json ou <nome>_info.json)."""
+    if model_bundle.is_bundle(checkpoint_path):
+        return model_bundle.read_metadata(checkpoint_path)["classes"]
+    base = os.path.splitext(checkpoint_path)[0]
+    for suffix, key in (("_classes.json", None), ("_info.json", "classes")):
+        path = base + suffix
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            names = data[key] if key else data
+            if len(names) == num_classes:
+                return list(names)
+    return [f"classe_{i}" for i in range(num_classes)]
+
+
+def normalized_batches(paths, batch_size, size=MODEL_INPUT):
+    """Gera lotes (N, 3, H, W) normalizados como no classificador (modo float)."""
+    backend = get_image_backend("pil")
+    mean = torch.tensor(IMAGENET_MEAN).view(3, 1, 1)
+    std = torch.tensor(IMAGENET_STD).view(3, 1, 1)
+
+    batch = []
+    for path in paths:
+        array, error_msg = backend.load(path, size)
+        if array is None:
+            print(f"⚠️ Ignorando {path}: {error_msg}")
+            continue
+        batch.append(torch.from_numpy(array).permute(2, 0, 1).float().div_(255).sub_(mean).div_(std))
+        if len(batch) == batch_size:
+            yield torch.stack(batch)
+            batch = []
+    if batch:
+        yield torch.stack(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantização int8 do modelo de plâncton")
+    parser.add_argument("--checkpoint", default=model_bundle.default_model_path(), help="Checkpoint float (.pth) ou pacote (.safetensors)")
+    parser.add_argument("--calibration-dir", required=True, help="Diretório com imagens de calibração")
+    parser.add_argument("--output", help="Artefato int8 (padrão: <checkpoint>_int8.pt)")
+    parser.add_argument("--max-images", type=int, default=200, help="Máximo de imagens de calibração")
+    parser.add_argument("--batch-size", type=int, default=16, help="Tamanho do lote na calibração")
+    parser.add_argument("--engine", help="Backend quantizado (x86, fbgemm, qnnpack); padrão: o da CPU atual")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.checkpoint):
+        parser.error(f"Checkpoint não encontrado: {args.checkpoint}")
+    paths = find_images(args.calibration_dir, args.max_images)
+    if not paths:
+        parser.error(f"Nenhuma imagem encontrada em {args.calibration_dir}")
+
+    output_path = args.output or model_quantization.quantized_model_path(args.checkpoint)
+    engine = args.engine or model_quantization.default_engine()
+
+    start = time.perf_counter()
+    model = model_quantization.load_float_checkpoint(args.checkpoint)
+    class_names = load_class_names(args.checkpoint, model.classifier[1].out_features)
+    model, calibrated = model_quantization.quantize_model(
+        model, normalized_batches(paths, args.batch_size), engine=engine)
+    metadata = model_quantization.build_metadata(args.checkpoint, class_names, MODEL_INPUT, engine, calibrated)
+    model_quantization.save_quantized_model(model, output_path, metadata)
+
+    float_mb = os.path.getsize(args.checkpoint) / (1024 * 1024)
+    int8_mb = os.path.getsize(output_path) / (1024 * 1024)
+    print(f"✅ Modelo int8 salvo em {output_path}")
+    print(f"   Engine: {engine} | Imagens de calibração: {calibrated} | "
+          f"Tempo: {time.perf_counter() - start:.1f}s")
+    print(f"   Tamanho: {float_mb:.1f} MB (float) -> {int8_mb:.1f} MB (int8)")
+    print("   Compare precisão e latência com: python benchmark_quantization.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Orçamento de threads do runtime de inferência.
+
+O Werkzeug atende cada requisição em uma thread, e o PyTorch usa por padrão todos
+os núcleos em cada operador (intra-op). Sem um limite, N inferências simultâneas
+disparam N x núcleos threads OpenMP disputando a CPU. Esta configuração é a única
+dona desses números: quantos forwards rodam ao mesmo tempo (workers do agendador
+de micro-lotes, ou processos do pool de inferência) e quantas threads cada um
+usa, de modo que forwards x threads intra-op caiba nos núcleos disponíveis.
+
+Os valores vêm das variáveis de ambiente PLANKTON_INFERENCE_WORKERS,
+PLANKTON_INFERENCE_PROCESSES, PLANKTON_INTRA_OP_THREADS e PLANKTON_INTEROP_THREADS;
+o que não for informado é derivado do número de núcleos detectado.
+benchmark_threads.py mede as combinações e indica a melhor para a máquina.
+
+Este módulo não importa o PyTorch: com o backend onnxruntime o número de threads
+intra-op é repassado à sessão do onnxruntime.
+"""
+
+import logging
+import os
+import sys
+
+logger = logging.getLogger("runtime_config")
+
+# Bibliotecas que dimensionam seu pool de threads pelo ambiente ao serem carregadas
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def detect_cpu_count():
+    """Núcleos que este processo pode usar (afinidade de CPU e cota do cgroup, quando houver)."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cores = os.cpu_count() or 1
+
+    # Contêineres limitados por cota (docker --cpus) enxergam todos os núcleos do host
+    try:
+        with open("/sys/fs/cgroup/cpu.max", encoding="utf-8") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cores)
+
+
+class RuntimeConfig:
+    """Divisão dos núcleos entre inferências simultâneas e threads por operador.
+
+    Args:
+        inference_workers (int): Forwards executados ao mesmo tempo (threads do agendador)
+        intra_op_threads (int): Threads por operador em cada forward; padrão: núcleos / forwards simultâneos
+        interop_threads (int): Threads do pool inter-op do PyTorch
+        cpu_count (int): Núcleos disponíveis; padrão: detect_cpu_count()
+        inference_processes (int): Processos do pool de inferência (inference_pool.py);
+            acima de 1 substitui as threads do agendador, com um forward por processo
+    """
+
+    def __init__(self, inference_workers=1, intra_op_threads=None, interop_threads=1, cpu_count=None,
+                 inference_processes=1):
+        self.cpu_count = cpu_count or detect_cpu_count()
+        self.inference_workers = max(1, int(inference_workers))
+        self.inference_processes = max(1, int(inference_processes))
+        self.intra_op_threads = max(1, int(intra_op_threads or self.cpu_count // self.concurrent_forwards))
+        self.interop_threads = max(1, int(interop_threads))
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """Lê a configuração das variáveis PLANKTON_* (valores ausentes ou 0 usam o padrão)."""
+        environ = os.environ if environ is None else environ
+        return cls(
+            inference_workers=int(environ.get("PLANKTON_INFERENCE_WORKERS") or 1),
+            intra_op_threads=int(environ.get("PLANKTON_INTRA_OP_THREADS") or 0) or None,
+            interop_threads=int(environ.get("PLANKTON_INTEROP_THREADS") or 1),
+            inference_processes=int(environ.get("PLANKTON_INFERENCE_PROCESSES") or 1),
+        )
+
+    @property
+    def use_process_pool(self):
+        return self.inference_processes > 1
+
+    @property
+    def concurrent_forwards(self):
+        return self.inference_processes if self.use_process_pool else self.inference_workers
+
+    @property
+    def oversubscribed(self):
+        return self.concurrent_forwards * self.intra_op_threads > self.cpu_count
+
+    def export_environment(self):
+        """Define OMP_NUM_THREADS e afins, sem sobrescrever valores já definidos.
+
+        Precisa ser chamado antes de importar torch, numpy ou cv2 para valer para os
+        pools criados na importação.
+        """
+        for name in THREAD_ENV_VARS:
+            os.environ.setdefault(name, str(self.intra_op_threads))
+
+    def apply(self):
+        """Aplica os limites às bibliotecas já importadas no processo."""
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(self.intra_op_threads)
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError:
+                # Só pode ser definido uma vez, antes de qualquer trabalho inter-op
+                if torch.get_num_interop_threads() != self.interop_threads:
+                    logger.warning(f"Threads inter-op já inicializadas ({torch.get_num_interop_threads()}); "
+                                   f"ignorando o valor {self.interop_threads}")
+
+        cv2 = sys.modules.get("cv2")
+        if cv2 is not None:
+            # A decodificação já é paralela entre as threads de requisição
+            cv2.setNumThreads(1)
+
+        unit = "processo(s)" if self.use_process_pool else "worker(s)"
+        if self.oversubscribed:
+            logger.warning(f"{self.concurrent_forwards} {unit} x {self.intra_op_threads} threads excedem "
+                           f"os {self.cpu_count} núcleos disponíveis")
+        logger.info(f"Runtime de inferência: {self.cpu_count} núcleos, {self.concurrent_forwards} {unit} "
+                    f"x {self.intra_op_threads} thread(s) intra-op, {self.interop_threads} inter-op")
+        return self
+
+    def to_dict(self):
+        return {
+            "cpu_count": self.cpu_count,
+            "inference_workers": self.inference_workers,
+            "inference_processes": self.inference_processes,
+            "intra_op_threads": self.intra_op_threads,
+            "interop_threads": self.interop_threads,
+        }
@@ -0,0 +1,97 @@
+"""
+Coalescência de requisições idênticas em andamento ("single-flight").
+
+Quando vários clientes enviam a mesma imagem ao mesmo tempo (operadores na
+mesma amostra, clientes repetindo após um tempo limite), só a primeira
+requisição decodifica e executa o forward; as demais, com a mesma chave, se
+juntam a ela e recebem o mesmo resultado. Diferente do cache de predições, nada
+é guardado depois: a entrada existe só enquanto o cálculo está em andamento, e
+a coalescência funciona mesmo com o cache desativado.
+"""
+
+import threading
+
+
+class _Call:
+    """Um cálculo em andamento e quem espera por ele."""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Executa fn uma vez por chave entre as chamadas simultâneas.
+
+    As chaves precisam identificar o resultado por completo (ex.: hash dos bytes e
+    versão do modelo); quem chega depois do fim do cálculo executa de novo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def do(self, key, fn, timeout=None):
+        """Executa fn(), ou aguarda a execução em andamento com a mesma chave.
+
+        Args:
+            key: Chave do cálculo (hashable)
+            fn: Função sem argumentos que produz o resultado
+            timeout (float): Espera máxima de quem se junta a uma execução; None = sem limite
+
+        Returns:
+            tuple: (resultado, compartilhado), com compartilhado True para quem aguardou a execução de outro
+
+        Raises:
+            TimeoutError: Se o tempo esgotar antes do fim da execução aguardada
+            Exception: A exceção levantada por fn, para quem executou e para quem aguardava
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                self.max_waiters = max(self.max_waiters, call.waiters)
+                leader = False
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Tempo limite excedido aguardando a execução em andamento ({timeout}s)")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "max_waiters": self.max_waiters,
+            }
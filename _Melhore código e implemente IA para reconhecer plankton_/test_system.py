@@ -46,6 +46,1060 @@ def test_plankton_classifier():
         print(f"❌ Erro no teste do classificador: {e}")
         return False
 
+def test_batch_prediction():
+    """Testa a predição em lote contra a predição individual."""
+    print("\n=== Testando Predição em Lote ===")
+
+    try:
+        import numpy as np
+
+        classifier = PlanktonClassifierPyTorch()
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 256, (240, 320, 3), dtype=np.uint8) for _ in range(4)]
+
+        results = classifier.predict_batch(images + [b""])
+        if len(results) != 5:
+            print(f"❌ Número de resultados incorreto: {len(results)}")
+            return False
+        if results[-1].get("success"):
+            print("❌ Entrada vazia deveria falhar sem interromper o lote")
+            return False
+
+        for image, batch_result in zip(images, results):
+            single_result = classifier.predict(image)
+            diff = max(abs(single_result["all_predictions"][c] - batch_result["all_predictions"][c])
+                       for c in classifier.class_names)
+            if diff > 1e-4:
+                print(f"❌ Lote difere da predição individual: {diff:.2e}")
+                return False
+
+        print(f"✅ {len(images)} imagens classificadas em um único forward")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste de predição em lote: {e}")
+        return False
+
+def test_micro_batching():
+    """Testa o agrupamento de requisições concorrentes pelo agendador de micro-lotes."""
+    print("\n=== Testando Agendador de Micro-Lotes ===")
+
+    try:
+        import threading
+        import numpy as np
+        from inference_scheduler import MicroBatchScheduler
+
+        classifier = PlanktonClassifierPyTorch()
+        scheduler = MicroBatchScheduler(classifier, max_batch_size=8, max_wait_ms=50).start()
+        rng = np.random.default_rng(1)
+        images = [rng.integers(0, 256, (240, 320, 3), dtype=np.uint8) for _ in range(8)]
+        results = [None] * len(images)
+
+        def worker(i):
+            results[i] = scheduler.predict(images[i], timeout=30)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(images))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        scheduler.stop()
+
+        if not all(result and result.get("success") for result in results):
+            print(f"❌ Alguma requisição falhou: {results}")
+            return False
+
+        stats = scheduler.get_stats()
+        print(f"✅ {stats['requests']} requisições em {stats['batches']} lotes "
+              f"(histograma: {stats['batch_size_histogram']})")
+        return stats["batches"] < stats["requests"]
+
+    except Exception as e:
+        print(f"❌ Erro no teste do agendador: {e}")
+        return False
+
+def test_admission_control():
+    """Testa a fila limitada (recusa imediata) e o descarte das requisições com prazo vencido antes do forward."""
+    print("\n=== Testando Controle de Admissão ===")
+
+    try:
+        import numpy as np
+        from inference_scheduler import MicroBatchScheduler
+
+        classifier = PlanktonClassifierPyTorch(input_mode="uint8", cache_max_bytes=0)
+        tensor = classifier.preprocess_input(np.zeros((240, 320, 3), dtype=np.uint8))[0]
+        # Agendador ainda parado: as requisições ficam na fila
+        scheduler = MicroBatchScheduler(classifier, max_batch_size=4, max_wait_ms=1, max_queue_depth=2)
+        expired = scheduler.submit(tensor, deadline=time.monotonic() - 1)
+        kept = scheduler.submit(tensor, deadline=time.monotonic() + 60)
+        shed = scheduler.submit(tensor)
+        if not shed.done() or not shed.result.get("shed") or scheduler.admit():
+            print(f"❌ Requisição acima do limite da fila deveria ser recusada: {shed.result}")
+            return False
+
+        scheduler.start()
+        expired_result, kept_result = expired.wait(30), kept.wait(30)
+        scheduler.stop()
+        stats = scheduler.get_stats()
+        if not expired_result.get("expired") or not kept_result.get("success"):
+            print(f"❌ Prazos incorretos: {expired_result} / {kept_result}")
+            return False
+        if (stats["shed"], stats["expired"], stats["batch_size_histogram"]) != (2, 1, {"1": 1}):
+            print(f"❌ Métricas incorretas: {stats}")
+            return False
+
+        print(f"✅ Fila limitada a {stats['max_queue_depth_limit']}: {stats['shed']} recusas, "
+              f"{stats['expired']} descarte por prazo antes do forward")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do controle de admissão: {e}")
+        return False
+
+def test_priorities():
+    """Testa as prioridades do agendador: interativas à frente, com a vez do trabalho em massa pelo peso."""
+    print("\n=== Testando Prioridades de Inferência ===")
+
+    try:
+        import numpy as np
+        from inference_scheduler import BULK, INTERACTIVE, MicroBatchScheduler
+
+        classifier = PlanktonClassifierPyTorch(input_mode="uint8", cache_max_bytes=0)
+        interactive_tensor = classifier.preprocess_input(np.zeros((240, 320, 3), dtype=np.uint8))[0]
+        bulk_tensor = interactive_tensor.clone()
+        order = []
+
+        class RecordingClassifier:
+            """Registra a prioridade de cada imagem na ordem dos forwards."""
+            def predict_tensors(self, tensors):
+                order.extend("b" if tensor is bulk_tensor else "i" for tensor in tensors)
+                return classifier.predict_tensors(tensors)
+
+        # Tudo enfileirado antes de o agendador iniciar: a ordem depende só da política
+        scheduler = MicroBatchScheduler(RecordingClassifier(), max_batch_size=1, max_wait_ms=0, interactive_weight=4)
+        requests_ = [scheduler.submit(bulk_tensor, priority=BULK) for _ in range(10)]
+        requests_ += [scheduler.submit(interactive_tensor, priority=INTERACTIVE) for _ in range(20)]
+        scheduler.start()
+        results = [request.wait(30) for request in requests_]
+        scheduler.stop()
+
+        if not all(result.get("success") for result in results):
+            print("❌ Alguma predição falhou")
+            return False
+        # 4 lotes interativos para cada lote em massa enquanto há interativos; depois o restante em massa
+        expected = "iiiib" * 5 + "b" * 5
+        if "".join(order) != expected:
+            print(f"❌ Ordem dos forwards incorreta: {''.join(order)} (esperado {expected})")
+            return False
+
+        stats = scheduler.get_stats()
+        latency = stats["latency"]
+        if latency[INTERACTIVE]["samples"] != 20 or latency[BULK]["samples"] != 10 or \
+                stats["bulk_requests"] != 10 or stats["bulk_batches"] != 10:
+            print(f"❌ Métricas por prioridade incorretas: {stats}")
+            return False
+
+        print(f"✅ Ordem dos forwards: {''.join(order)}")
+        print(f"✅ Latência p95: interativa {latency[INTERACTIVE]['p95_ms']}ms, em massa {latency[BULK]['p95_ms']}ms")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste de prioridades: {e}")
+        return False
+
+def test_bulk_saturation():
+    """Testa que o trabalho em massa, mesmo saturando os workers, não ocupa a fila interativa (nenhum 429)."""
+    print("\n=== Testando Saturação pelo Trabalho em Massa ===")
+
+    try:
+        import json
+        import numpy as np
+        from inference_scheduler import BULK, MicroBatchScheduler
+
+        classifier = PlanktonClassifierPyTorch(input_mode="uint8", cache_max_bytes=0)
+        tensor = classifier.preprocess_input(np.zeros((240, 320, 3), dtype=np.uint8))[0]
+        scheduler = MicroBatchScheduler(classifier, max_batch_size=4, max_wait_ms=1, max_queue_depth=2).start()
+        bulk = [scheduler.submit(tensor, priority=BULK) for _ in range(60)]
+        admitted = scheduler.admit()
+        interactive = [scheduler.predict(np.zeros((240, 320, 3), dtype=np.uint8), timeout=60) for _ in range(3)]
+        for request in bulk:
+            request.wait(60)
+        stats = scheduler.get_stats()
+        scheduler.stop()
+        if not admitted or not all(result.get("success") for result in interactive) or stats["shed"]:
+            print(f"❌ Agendador: interativas recusadas com a fila em massa cheia (shed={stats['shed']})")
+            return False
+    except Exception as e:
+        print(f"❌ Erro no teste de saturação (agendador): {e}")
+        return False
+
+    from inference_pool import FORK_AVAILABLE
+    if not FORK_AVAILABLE:
+        print("✅ Agendador: nenhuma interativa recusada; ⚠️ plataforma sem fork, pool não testado")
+        return True
+
+    # Pool em um processo novo (o fork precisa vir antes de qualquer forward); capacidade 8 > limite interativo 2
+    script = """
+import io, json
+import numpy as np
+from PIL import Image
+from inference_pool import InferencePool
+from inference_scheduler import BULK
+from plankton_ai import PlanktonClassifierPyTorch
+
+pool = InferencePool(PlanktonClassifierPyTorch(cache_max_bytes=0), processes=2, max_batch_size=4, max_wait_ms=5,
+                     intra_op_threads=1, warmup_batch_sizes=[1], max_queue_depth=2).start()
+pool.wait_warm(120)
+buffer = io.BytesIO()
+Image.fromarray(np.zeros((240, 320, 3), dtype=np.uint8)).save(buffer, "PNG")
+image = buffer.getvalue()
+bulk = [pool.submit(image, priority=BULK) for _ in range(60)]
+admitted = pool.admit()
+interactive = [pool.predict(image, timeout=120) for _ in range(3)]
+for request in bulk:
+    request.wait(120)
+stats = pool.get_stats()
+pool.stop()
+print(json.dumps({"admitted": admitted, "success": all(r.get("success") for r in interactive),
+                  "bulk_success": all(r.result.get("success") for r in bulk), "shed": stats["shed"]}))
+"""
+    try:
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=300,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if output.returncode != 0:
+            print(f"❌ Processo de teste falhou: {output.stderr[-500:]}")
+            return False
+        data = json.loads(output.stdout.strip().splitlines()[-1])
+        if not data["admitted"] or not data["success"] or not data["bulk_success"] or data["shed"]:
+            print(f"❌ Pool: interativas recusadas com o trabalho em massa em andamento: {data}")
+            return False
+        print("✅ Agendador e pool: 60 imagens em massa em andamento, nenhuma requisição interativa recusada")
+        return True
+    except Exception as e:
+        print(f"❌ Erro no teste de saturação (pool): {e}")
+        return False
+
+def test_single_flight():
+    """Testa a coalescência: requisições idênticas simultâneas recebem o resultado de uma única execução."""
+    print("\n=== Testando Coalescência de Requisições ===")
+
+    try:
+        import threading
+        from single_flight import SingleFlight
+
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(10)
+            return {"success": True, "predicted_class": "Copepod"}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flights.do("imagem", compute, timeout=10)))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        # Todas as threads já se juntaram à execução em andamento antes de ela terminar
+        deadline = time.time() + 10
+        while flights.get_stats()["coalesced"] < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        stats = flights.get_stats()
+        shared = sum(1 for _, was_shared in results if was_shared)
+        if len(calls) != 1 or shared != 5 or any(result != results[0][0] for result, _ in results):
+            print(f"❌ Coalescência incorreta: {len(calls)} execuções, {shared} compartilhadas")
+            return False
+        if (stats["executions"], stats["coalesced"], stats["in_flight"]) != (1, 5, 0):
+            print(f"❌ Métricas incorretas: {stats}")
+            return False
+
+        # Sem execução em andamento, a mesma chave executa de novo (não é um cache)
+        flights.do("imagem", compute)
+        if len(calls) != 2:
+            print("❌ Chave concluída não deveria ser reaproveitada")
+            return False
+
+        print(f"✅ 6 requisições idênticas, 1 execução ({stats['coalesced']} coalescidas)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste de coalescência: {e}")
+        return False
+
+def test_image_validation():
+    """Testa a validação pelo cabeçalho: dimensões lidas sem o PIL e recusa de entradas inválidas."""
+    print("\n=== Testando Validação pelo Cabeçalho ===")
+
+    try:
+        import io
+        import struct
+        import zlib
+        import numpy as np
+        from PIL import Image
+        import image_validation
+
+        def encode(width, height, image_format, **options):
+            buffer = io.BytesIO()
+            pixels = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(buffer, image_format, **options)
+            return buffer.getvalue()
+
+        for image_format, options in [("JPEG", {}), ("JPEG", {"progressive": True}), ("PNG", {}), ("GIF", {}),
+                                      ("BMP", {}), ("WEBP", {}), ("WEBP", {"lossless": True}), ("TIFF", {})]:
+            data = encode(321, 123, image_format, **options)
+            sniffed = image_validation.sniff_format(data)
+            size = image_validation.header_dimensions(data, sniffed)
+            if sniffed != image_format or size is None or tuple(size) != (321, 123):
+                print(f"❌ Cabeçalho {image_format} {options}: {sniffed} {size}")
+                return False
+
+        def validate(data):
+            return image_validation.open_validated(data, 16 * 1024 * 1024, 50, 4000)
+
+        img, error = validate(encode(321, 123, "JPEG"))
+        if img is None or img.size != (321, 123):
+            print(f"❌ Imagem válida recusada: {error}")
+            return False
+
+        # Bomba de descompressão: PNG pequeno cujo IHDR declara 50000x50000 pixels
+        bomb = bytearray(encode(64, 64, "PNG"))
+        bomb[16:24] = struct.pack(">II", 50000, 50000)
+        bomb[29:33] = struct.pack(">I", zlib.crc32(bytes(bomb[12:29])))
+        rejected = {
+            "texto": (b"nao sou uma imagem " * 20, "não é uma imagem"),
+            "pequena": (encode(20, 20, "PNG"), "muito pequena"),
+            "bomba": (bytes(bomb), "muito grande"),
+        }
+        for name, (data, expected) in rejected.items():
+            img, error = validate(data)
+            if img is not None or expected not in error:
+                print(f"❌ Entrada '{name}' deveria ser recusada ({expected}): {error}")
+                return False
+
+        print("✅ Dimensões lidas do cabeçalho em 6 formatos; texto, imagem pequena e bomba recusados")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste de validação: {e}")
+        return False
+
+def test_warmup():
+    """Testa o aquecimento por tamanho de lote e seu registro em get_model_info."""
+    print("\n=== Testando Aquecimento do Modelo ===")
+
+    try:
+        classifier = PlanktonClassifierPyTorch(input_mode="uint8", cache_max_bytes=0)
+        classifier.warmup([4, 1, 2, 2, 0], repeats=2)
+        warmup = classifier.get_model_info()["warmup"]
+        sizes = [(shape["batch_size"], shape["channels"]) for shape in warmup["shapes"]]
+        # Lotes 1, 2 e 4 coloridos e, com entrada uint8 no modelo eager, o lote monocromático
+        if sizes != [(1, 3), (2, 3), (4, 3), (1, 1)]:
+            print(f"❌ Formatos aquecidos inesperados: {sizes}")
+            return False
+        if warmup["repeats"] != 2 or not all(shape["steady_ms"] > 0 for shape in warmup["shapes"]):
+            print(f"❌ Tempos de aquecimento ausentes: {warmup}")
+            return False
+
+        print("✅ Aquecimento: " + ", ".join(f"lote {shape['batch_size']} {shape['first_ms']:.0f}→"
+                                            f"{shape['steady_ms']:.0f}ms" for shape in warmup["shapes"]))
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do aquecimento: {e}")
+        return False
+
+def test_runtime_config():
+    """Testa o orçamento de threads e o agendador com vários workers."""
+    print("\n=== Testando Orçamento de Threads ===")
+
+    try:
+        import numpy as np
+        from inference_scheduler import MicroBatchScheduler
+        from runtime_config import RuntimeConfig
+
+        config = RuntimeConfig.from_env({"PLANKTON_INFERENCE_WORKERS": "2"})
+        if config.inference_workers != 2 or config.intra_op_threads != max(1, config.cpu_count // 2):
+            print(f"❌ Divisão de núcleos inesperada: {config.to_dict()}")
+            return False
+        split = RuntimeConfig(inference_workers=4, cpu_count=16)
+        if split.intra_op_threads != 4 or split.oversubscribed:
+            print(f"❌ 16 núcleos deveriam virar 4 workers x 4 threads: {split.to_dict()}")
+            return False
+        if not RuntimeConfig(inference_workers=2, intra_op_threads=8, cpu_count=8).oversubscribed:
+            print("❌ 2 workers x 8 threads em 8 núcleos deveriam exceder o orçamento")
+            return False
+
+        classifier = PlanktonClassifierPyTorch()
+        scheduler = MicroBatchScheduler(classifier, max_batch_size=2, max_wait_ms=1, workers=2).start()
+        rng = np.random.default_rng(2)
+        tensors = [classifier.preprocess_input(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8))[0]
+                   for _ in range(6)]
+        results = [pending.wait(30) for pending in [scheduler.submit(tensor) for tensor in tensors]]
+        scheduler.stop()
+        if not all(result.get("success") for result in results):
+            print(f"❌ Alguma requisição falhou com 2 workers: {results}")
+            return False
+
+        print(f"✅ Orçamento de threads: {config.to_dict()}; 2 workers atenderam {len(results)} requisições")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do orçamento de threads: {e}")
+        return False
+
+def test_inference_pool():
+    """Testa o pool de processos de inferência (em um processo novo, sem forwards anteriores)."""
+    print("\n=== Testando Pool de Processos de Inferência ===")
+
+    from inference_pool import FORK_AVAILABLE
+    if not FORK_AVAILABLE:
+        print("⚠️ Plataforma sem fork; teste ignorado")
+        return True
+
+    # O fork precisa acontecer antes do primeiro forward do processo que cria o pool
+    script = """
+import functools, io, json, threading
+import numpy as np
+from PIL import Image
+from inference_pool import InferencePool
+from plankton_ai import PlanktonClassifierPyTorch
+
+pool = InferencePool(PlanktonClassifierPyTorch(cache_max_bytes=0), processes=2, max_batch_size=4,
+                     max_wait_ms=20, intra_op_threads=1, warmup_batch_sizes=[1, 2, 4]).start()
+warmup = pool.wait_warm(120)
+rng = np.random.default_rng(4)
+images = []
+for _ in range(8):
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)).save(buffer, "PNG")
+    images.append(buffer.getvalue())
+results = [None] * len(images)
+
+def worker(i):
+    results[i] = pool.predict(images[i], timeout=60)
+
+threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(images))]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+stats = pool.get_stats()
+# Trabalho em massa ainda retido no servidor ao parar (como na recarga do modelo) termina nos processos
+held = [pool.submit(image, priority="bulk") for image in images * 3]
+pool.stop(timeout=60)
+
+# Depois de forwards neste processo (como na recarga do modelo) o pool cria os processos por spawn
+classifier = PlanktonClassifierPyTorch(cache_max_bytes=0)
+classifier.predict_batch(images[:4])
+spawned = InferencePool(classifier, processes=2, max_batch_size=4, intra_op_threads=1,
+                        classifier_factory=functools.partial(PlanktonClassifierPyTorch, cache_max_bytes=0)).start()
+spawned.wait_warm(120)
+spawned_results = [spawned.predict(image, timeout=60) for image in images[:4]]
+spawned_stats = spawned.get_stats()
+spawned.stop()
+print(json.dumps({"success": all(r.get("success") for r in results), "stats": stats,
+                  "warmed_sizes": [shape["batch_size"] for shape in warmup["shapes"]],
+                  "held_success": all(request.result.get("success") for request in held),
+                  "spawn_success": all(r.get("success") for r in spawned_results),
+                  "spawn_warmed": spawned_stats["warmed_processes"]}))
+"""
+    try:
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=300,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if output.returncode != 0:
+            print(f"❌ Processo de teste falhou: {output.stderr[-500:]}")
+            return False
+        data = json.loads(output.stdout.strip().splitlines()[-1])
+        if not data["success"]:
+            print("❌ Alguma requisição falhou no pool")
+            return False
+        if data["stats"]["warmed_processes"] != 2 or data["warmed_sizes"][:3] != [1, 2, 4]:
+            print(f"❌ Cada processo deveria aquecer os lotes 1, 2 e 4: {data}")
+            return False
+        if not data["held_success"]:
+            print("❌ Trabalho em massa retido no servidor falhou ao parar o pool")
+            return False
+        if not data["spawn_success"] or data["spawn_warmed"] != 2:
+            print(f"❌ Pool criado por spawn após forwards no processo falhou: {data}")
+            return False
+
+        print(f"✅ Pool com {data['stats']['processes']} processos: {data['stats']['requests']} requisições "
+              f"(por processo: {data['stats']['requests_per_process']}); pool por spawn após forwards: ok")
+        return data["stats"]["alive_processes"] == 2
+
+    except Exception as e:
+        print(f"❌ Erro no teste do pool de processos: {e}")
+        return False
+
+def test_prediction_cache():
+    """Testa o cache de predições por conteúdo e sua invalidação ao trocar o modelo."""
+    print("\n=== Testando Cache de Predições ===")
+
+    try:
+        import io
+        import numpy as np
+        from PIL import Image
+
+        classifier = PlanktonClassifierPyTorch()
+        buffer = io.BytesIO()
+        Image.fromarray(np.random.default_rng(2).integers(0, 256, (240, 320, 3), dtype=np.uint8)).save(buffer, "PNG")
+        image_data = buffer.getvalue()
+
+        first = classifier.predict_bytes(image_data)
+        second = classifier.predict_bytes(image_data)
+        if first.get("cached") or not second.get("cached"):
+            print("❌ Segunda predição deveria vir do cache")
+            return False
+
+        classifier._set_model_version("nova-versao")
+        if classifier.predict_bytes(image_data).get("cached"):
+            print("❌ Cache deveria ser invalidado ao trocar o modelo")
+            return False
+
+        stats = classifier.get_model_info()["cache_stats"]
+        print(f"✅ Cache: {stats['hits']} acertos, {stats['misses']} falhas, {stats['size']} itens")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do cache: {e}")
+        return False
+
+def test_uint8_input():
+    """Testa a entrada uint8 com a normalização embutida na primeira convolução."""
+    print("\n=== Testando Entrada uint8 ===")
+
+    # Diferença máxima aceita nas probabilidades (apenas arredondamento em float32)
+    tolerance = 1e-4
+
+    try:
+        import io
+        import numpy as np
+        import torch
+        from PIL import Image
+
+        classifier = PlanktonClassifierPyTorch()
+        rng = np.random.default_rng(3)
+        images = []
+        for array in (rng.integers(0, 256, (300, 400, 3), dtype=np.uint8),
+                      rng.integers(0, 256, (300, 400), dtype=np.uint8)):
+            buffer = io.BytesIO()
+            Image.fromarray(array).save(buffer, "PNG")
+            images.append(buffer.getvalue())
+
+        float_results = classifier.predict_batch(images)
+        classifier.set_input_mode("uint8")
+        tensors = [classifier.preprocess_input(image_data)[0] for image_data in images]
+        if [tuple(t.shape) for t in tensors] != [(3, 224, 224), (1, 224, 224)] or tensors[0].dtype != torch.uint8:
+            print(f"❌ Tensores uint8 inesperados: {[(tuple(t.shape), t.dtype) for t in tensors]}")
+            return False
+
+        uint8_results = classifier.predict_batch(images)
+        drift = max(abs(f["all_predictions"][c] - u["all_predictions"][c])
+                    for f, u in zip(float_results, uint8_results) for c in classifier.class_names)
+        if drift > tolerance:
+            print(f"❌ Diferença entre os caminhos float e uint8 acima da tolerância: {drift:.2e}")
+            return False
+
+        print(f"✅ Entrada uint8 (RGB e monocromática) equivalente ao caminho float (diferença máx.: {drift:.2e})")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste da entrada uint8: {e}")
+        return False
+
+def test_quantized_model():
+    """Testa a geração e o carregamento do modelo int8."""
+    print("\n=== Testando Modelo Quantizado int8 ===")
+
+    try:
+        import tempfile
+        import torch
+        import model_quantization
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, "modelo.pth")
+            float_classifier = PlanktonClassifierPyTorch()
+            float_classifier.save_model(checkpoint)
+
+            model = model_quantization.load_float_checkpoint(checkpoint)
+            calibration = [torch.randn(4, 3, 224, 224) for _ in range(2)]
+            model, calibrated = model_quantization.quantize_model(model, calibration)
+            quantized_path = model_quantization.quantized_model_path(checkpoint)
+            metadata = model_quantization.build_metadata(checkpoint, float_classifier.class_names, (224, 224),
+                                                         torch.backends.quantized.engine, calibrated)
+            model_quantization.save_quantized_model(model, quantized_path, metadata)
+
+            classifier = PlanktonClassifierPyTorch(quantized_model_path=quantized_path)
+            info = classifier.get_model_info()
+            if not info.get("quantized") or info["classes"] != float_classifier.class_names:
+                print(f"❌ Modelo quantizado não foi carregado: {info}")
+                return False
+
+            batch = [torch.randn(3, 224, 224) for _ in range(3)]
+            results = classifier.predict_tensors(batch)
+            if not all(r.get("success") for r in results):
+                print(f"❌ Predição com o modelo int8 falhou: {results}")
+                return False
+
+        print(f"✅ Modelo int8 gerado ({calibrated} imagens de calibração) e carregado (engine: {info['quantization_engine']})")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do modelo quantizado: {e}")
+        return False
+
+def test_offline_checkpoint_load():
+    """Testa a carga do checkpoint sem acesso aos pesos ImageNet (em um processo novo, sem rede)."""
+    print("\n=== Testando Carga do Checkpoint sem Rede ===")
+    import tempfile
+
+    script = """
+import json, os, sys, tempfile
+import torch
+from torchvision import models
+from plankton_ai import PlanktonClassifierPyTorch
+
+tmp_dir = tempfile.mkdtemp()
+checkpoint = os.path.join(tmp_dir, 'modelo.pth')
+torch.save(models.mobilenet_v2(weights=None, num_classes=5).state_dict(), checkpoint)
+with open(os.path.join(tmp_dir, 'modelo_info.json'), 'w', encoding='utf-8') as f:
+    json.dump({'num_classes': 5, 'classes': ['a', 'b', 'c', 'd', 'e']}, f)
+
+classifier = PlanktonClassifierPyTorch(model_path=checkpoint, prefer_torchscript=False, input_mode='uint8')
+sample, _ = classifier.preprocess_input(torch.zeros(224, 224, 3, dtype=torch.uint8).numpy())
+result = classifier.predict_tensors([sample])[0]
+print(json.dumps({'format': classifier.model_format, 'classes': classifier.class_names,
+                  'success': result.get('success'), 'timings': classifier.startup_timings}))
+"""
+    # Cache do torch hub vazio e proxy inválido: qualquer download dos pesos ImageNet falharia
+    with tempfile.TemporaryDirectory() as torch_home:
+        env = dict(os.environ, TORCH_HOME=torch_home, HTTP_PROXY="http://127.0.0.1:9",
+                   HTTPS_PROXY="http://127.0.0.1:9")
+        try:
+            output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=300,
+                                    env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if output.returncode != 0:
+                print(f"❌ Processo de teste falhou: {output.stderr[-500:]}")
+                return False
+            data = json.loads(output.stdout.strip().splitlines()[-1])
+
+            if data["format"] != "eager" or data["classes"] != ["a", "b", "c", "d", "e"] or not data["success"]:
+                print(f"❌ O checkpoint deveria carregar com as 5 classes de modelo_info.json: {data}")
+                return False
+
+            print(f"✅ Checkpoint carregado sem os pesos ImageNet (etapas: {data['timings']})")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro no teste da carga sem rede: {e}")
+            return False
+
+def test_model_bundle():
+    """Testa o pacote único do modelo: metadados, carga sem cópia e hash do conteúdo."""
+    print("\n=== Testando Pacote Único do Modelo ===")
+
+    try:
+        import tempfile
+        import torch
+        import model_bundle
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "modelo.safetensors")
+            original = PlanktonClassifierPyTorch(input_mode="float", cache_max_bytes=0)
+            original.class_names = original.class_names[:5]
+            original.model.classifier[1] = torch.nn.Linear(original.model.classifier[1].in_features, 5)
+            original.model.eval()
+            original.save_model(path)
+
+            loaded = PlanktonClassifierPyTorch(model_path=path, input_mode="float", cache_max_bytes=0)
+            metadata = model_bundle.read_metadata(path)
+            if loaded.class_names != original.class_names or loaded.model_version != metadata["content_hash"]:
+                print(f"❌ Classes ou versão do pacote incorretas: {loaded.class_names}, {loaded.model_version}")
+                return False
+
+            batch = torch.randn(2, 3, 224, 224)
+            with torch.inference_mode():
+                diff = (original.model(batch) - loaded.model(batch)).abs().max().item()
+            if diff > 1e-6:
+                print(f"❌ Pesos diferentes após a carga do pacote: {diff:.2e}")
+                return False
+
+            # Um byte alterado nos pesos é detectado pela conferência do hash
+            with open(path, "r+b") as f:
+                f.seek(-1, os.SEEK_END)
+                last = f.read(1)
+                f.seek(-1, os.SEEK_END)
+                f.write(bytes([last[0] ^ 0xFF]))
+            try:
+                model_bundle.load_bundle(path, verify=True)
+                print("❌ Pacote corrompido deveria falhar na conferência do hash")
+                return False
+            except ValueError:
+                pass
+
+        print(f"✅ Pacote com {metadata['num_classes']} classes carregado sem cópia (hash {metadata['content_hash']})")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do pacote do modelo: {e}")
+        return False
+
+def test_torchscript_export():
+    """Testa a exportação TorchScript e sua preferência sobre o checkpoint."""
+    print("\n=== Testando Exportação TorchScript ===")
+
+    try:
+        import tempfile
+        import torch
+        import model_export
+        from plankton_ai import _file_digest
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, "modelo.pth")
+            eager = PlanktonClassifierPyTorch(input_mode="uint8")
+            eager.save_model(checkpoint)
+            eager.load_model(checkpoint)
+
+            metadata = model_export.build_metadata(_file_digest(checkpoint), eager.class_names, eager.img_size, "uint8")
+            example = torch.randint(0, 256, (1, 3, 224, 224), dtype=torch.uint8)
+            model_export.export_torchscript(eager.model, model_export.torchscript_path(checkpoint), example, metadata)
+
+            scripted = PlanktonClassifierPyTorch(model_path=checkpoint, input_mode="uint8")
+            if scripted.get_model_info()["model_format"] != "torchscript":
+                print("❌ O artefato TorchScript deveria ser preferido ao checkpoint")
+                return False
+
+            batch = [torch.randint(0, 256, (3, 224, 224), dtype=torch.uint8) for _ in range(3)]
+            drift = max(abs(a["all_predictions"][c] - b["all_predictions"][c])
+                        for a, b in zip(eager.predict_tensors(batch), scripted.predict_tensors(batch))
+                        for c in eager.class_names)
+            if drift > 1e-4:
+                print(f"❌ Diferença entre eager e TorchScript acima da tolerância: {drift:.2e}")
+                return False
+
+        print(f"✅ TorchScript preferido ao checkpoint e equivalente ao modo eager (diferença máx.: {drift:.2e})")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste da exportação TorchScript: {e}")
+        return False
+
+def test_onnx_backend():
+    """Testa a exportação ONNX e o backend onnxruntime."""
+    print("\n=== Testando Backend onnxruntime ===")
+
+    try:
+        import tempfile
+        import numpy as np
+        import torch
+        from PIL import Image
+        import model_export
+        from onnx_backend import ONNXRUNTIME_AVAILABLE, onnx_model_path
+        from plankton_ai import _file_digest
+
+        if not ONNXRUNTIME_AVAILABLE:
+            print("⚠️ onnxruntime não instalado; teste ignorado")
+            return True
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, "modelo.pth")
+            eager = PlanktonClassifierPyTorch(input_mode="uint8")
+            eager.save_model(checkpoint)
+            eager.load_model(checkpoint)
+
+            metadata = model_export.build_metadata(_file_digest(checkpoint), eager.class_names, eager.img_size,
+                                                   "uint8", model_format="onnx")
+            example = torch.randint(0, 256, (1, 3, 224, 224), dtype=torch.uint8)
+            model_export.export_onnx(eager.model, onnx_model_path(checkpoint), example, metadata)
+
+            runtime = PlanktonClassifierPyTorch(model_path=checkpoint, input_mode="uint8",
+                                                inference_backend="onnxruntime")
+            if runtime.get_model_info()["model_format"] != "onnx":
+                print("❌ O backend onnxruntime deveria carregar o modelo ONNX")
+                return False
+
+            image = Image.fromarray(np.random.default_rng(5).integers(0, 256, (300, 400, 3), dtype=np.uint8))
+            tensors = [eager.preprocess_input(image)[0] for _ in range(3)]
+            arrays = [runtime.preprocess_input(image)[0] for _ in range(3)]
+            drift = max(abs(a["all_predictions"][c] - b["all_predictions"][c])
+                        for a, b in zip(eager.predict_tensors(tensors), runtime.predict_tensors(arrays))
+                        for c in eager.class_names)
+            if drift > 1e-4:
+                print(f"❌ Diferença entre PyTorch e onnxruntime acima da tolerância: {drift:.2e}")
+                return False
+
+        print(f"✅ Backend onnxruntime equivalente ao PyTorch (diferença máx.: {drift:.2e})")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do backend onnxruntime: {e}")
+        return False
+
+def test_background_loading():
+    """Testa o carregamento do modelo em segundo plano e a rota /readyz (em um processo novo)."""
+    print("\n=== Testando Carregamento em Segundo Plano ===")
+    import tempfile
+
+    script = """
+import json, os, time
+start = time.perf_counter()
+import flask_server
+imported = time.perf_counter() - start
+jobs_dir_on_import = os.path.exists(flask_server.JOBS_DIR)
+client = flask_server.app.test_client()
+loading = client.get('/readyz')
+predict = client.post('/predict')
+ready = flask_server.MODEL_LOADER.wait(300)
+final = client.get('/readyz')
+print(json.dumps({'imported': imported, 'loading_status': loading.status_code,
+                  'retry_after': predict.headers.get('Retry-After'), 'predict_status': predict.status_code,
+                  'ready': ready, 'final_status': final.status_code, 'timings': final.get_json()['startup_timings'],
+                  'jobs_dir_on_import': jobs_dir_on_import, 'jobs_dir_ready': os.path.exists(flask_server.JOBS_DIR)}))
+"""
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = dict(os.environ, PLANKTON_JOBS_DIR=os.path.join(tmp_dir, "jobs"))
+            output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=300,
+                                    env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if output.returncode != 0:
+            print(f"❌ Processo de teste falhou: {output.stderr[-500:]}")
+            return False
+        data = json.loads(output.stdout.strip().splitlines()[-1])
+
+        if data["loading_status"] != 503 or data["predict_status"] != 503 or not data["retry_after"]:
+            print(f"❌ Durante o carregamento /readyz e /predict deveriam responder 503 com Retry-After: {data}")
+            return False
+        if not data["ready"] or data["final_status"] != 200:
+            print(f"❌ O modelo não ficou pronto: {data}")
+            return False
+        if data["jobs_dir_on_import"] or not data["jobs_dir_ready"]:
+            print(f"❌ A fila de trabalhos deveria ser criada no início do servidor, não na importação: {data}")
+            return False
+
+        print(f"✅ Servidor importado em {data['imported']:.2f}s; modelo pronto depois "
+              f"(etapas: {data['timings']})")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do carregamento em segundo plano: {e}")
+        return False
+
+def test_model_reload():
+    """Testa a recarga do modelo pela rota /admin/reload e pela observação do arquivo (em um processo novo)."""
+    print("\n=== Testando Recarga do Modelo ===")
+    import tempfile
+
+    script = """
+import io, json, os, sys, threading, time
+import torch
+from torchvision import models
+import model_bundle
+
+model_path, other_path = sys.argv[1], sys.argv[2]
+def write_bundle(path, classes):
+    model_bundle.save_bundle(models.mobilenet_v2(weights=None, num_classes=len(classes)).state_dict(), path,
+                             classes, [224, 224])
+write_bundle(model_path, ['a', 'b'])
+
+import flask_server
+flask_server.MODEL_LOADER.wait(300)
+client = flask_server.app.test_client()
+from PIL import Image
+buffer = io.BytesIO()
+Image.new('RGB', (200, 200), (40, 80, 120)).save(buffer, 'PNG')
+statuses = []
+done = threading.Event()
+
+def requests_during_reload():
+    local = flask_server.app.test_client()
+    while not done.is_set():
+        response = local.post('/predict', data={'file': (io.BytesIO(buffer.getvalue()), 'a.png')},
+                              content_type='multipart/form-data')
+        statuses.append(response.status_code)
+
+thread = threading.Thread(target=requests_during_reload)
+thread.start()
+write_bundle(other_path, ['c', 'd', 'e'])
+admin = client.post('/admin/reload', json={'model_path': other_path, 'wait': True}).get_json()['reload']
+classes_admin = client.get('/classes').get_json()['classes']
+
+# Observação do arquivo: um novo pacote no caminho em uso é recarregado sozinho
+time.sleep(1)
+write_bundle(other_path, ['f', 'g', 'h', 'i'])
+deadline = time.time() + 120
+while time.time() < deadline and len(client.get('/classes').get_json()['classes']) != 4:
+    time.sleep(0.2)
+done.set()
+thread.join()
+status = client.get('/status').get_json()['model_reload']
+print(json.dumps({'admin': admin, 'classes_admin': classes_admin, 'statuses': sorted(set(statuses)),
+                  'classes_watch': client.get('/classes').get_json()['classes'], 'status': status}))
+"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = os.path.join(tmp_dir, "modelo.safetensors")
+        other_path = os.path.join(tmp_dir, "outro.safetensors")
+        env = dict(os.environ, PLANKTON_MODEL_PATH=model_path, PLANKTON_MODEL_WATCH_INTERVAL="0.5",
+                   PLANKTON_JOBS_DIR=os.path.join(tmp_dir, "jobs"),
+                   PLANKTON_WARMUP_BATCH_SIZES="1,2")
+        try:
+            output = subprocess.run([sys.executable, "-c", script, model_path, other_path], capture_output=True, text=True,
+                                    timeout=600, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if output.returncode != 0:
+                print(f"❌ Processo de teste falhou: {output.stderr[-500:]}")
+                return False
+            data = json.loads(output.stdout.strip().splitlines()[-1])
+
+            if data["classes_admin"] != ["c", "d", "e"] or data["admin"]["state"] != "idle":
+                print(f"❌ A recarga por /admin/reload não trocou o modelo: {data['admin']}")
+                return False
+            if data["statuses"] != [200]:
+                print(f"❌ Requisições falharam durante a recarga: {data['statuses']}")
+                return False
+            if data["classes_watch"] != ["f", "g", "h", "i"] or data["status"]["reloads"] != 2:
+                print(f"❌ A observação do arquivo não recarregou o modelo: {data['status']}")
+                return False
+            if not data["status"]["previous_released"]:
+                print("❌ O modelo anterior não foi liberado após a troca")
+                return False
+
+            print(f"✅ Modelo recarregado 2 vezes sem erros nas requisições (última em "
+                  f"{data['status']['last_duration_seconds']}s, versão {data['status']['version']})")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro no teste da recarga do modelo: {e}")
+            return False
+
+def test_model_registry():
+    """Testa o registro de modelos: carga sob demanda, descarte LRU pelo orçamento e modelo fixado."""
+    print("\n=== Testando Registro de Modelos ===")
+
+    try:
+        import tempfile
+        import torch
+        from torchvision import models
+        import model_bundle
+        from model_registry import ModelRegistry
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            classes = {"padrao": ["a", "b"], "cruzeiro_1": ["c", "d", "e"], "cruzeiro_2": ["f", "g", "h", "i"]}
+            for model_id, names in classes.items():
+                model_bundle.save_bundle(models.mobilenet_v2(weights=None, num_classes=len(names)).state_dict(),
+                                         os.path.join(tmp_dir, model_id + ".safetensors"), names, [224, 224])
+
+            def load(path):
+                return PlanktonClassifierPyTorch(model_path=path, cache_max_bytes=0)
+
+            default = load(os.path.join(tmp_dir, "padrao.safetensors"))
+            model_bytes = default.memory_bytes()
+            # Cabem dois modelos: o padrão (fixado) e mais um
+            registry = ModelRegistry(tmp_dir, load, budget_bytes=int(model_bytes * 2.5))
+            if sorted(registry.scan()) != sorted(classes):
+                print(f"❌ Modelos encontrados incorretos: {registry.scan()}")
+                return False
+            registry.pin(default.model_path, default)
+
+            first = registry.get("cruzeiro_1")
+            if first.class_names != classes["cruzeiro_1"] or registry.get("cruzeiro_1") is not first:
+                print(f"❌ Modelo do registro incorreto ou carregado duas vezes: {first.class_names}")
+                return False
+            registry.get("cruzeiro_2")
+            registry.get("cruzeiro_1")
+            stats = registry.get_stats()
+            models_stats = stats["models"]
+
+            if stats["resident_bytes"] > stats["budget_bytes"] or stats["resident_models"] != 2:
+                print(f"❌ Orçamento de memória não respeitado: {stats['resident_bytes']} bytes, "
+                      f"{stats['resident_models']} modelos")
+                return False
+            if (models_stats["cruzeiro_1"]["loads"], models_stats["cruzeiro_1"]["evictions"]) != (2, 1) or \
+                    models_stats["cruzeiro_2"]["evictions"] != 1 or not models_stats["padrao"]["resident"]:
+                print(f"❌ Descarte LRU incorreto: {models_stats}")
+                return False
+            try:
+                registry.get("inexistente")
+                print("❌ Modelo inexistente deveria levantar KeyError")
+                return False
+            except KeyError:
+                pass
+
+        print(f"✅ 2 modelos residentes em {stats['resident_bytes'] / 1024 / 1024:.1f}MB "
+              f"(orçamento {stats['budget_bytes'] / 1024 / 1024:.1f}MB), modelo padrão fixado")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do registro de modelos: {e}")
+        return False
+
+def test_multi_head():
+    """Testa várias cabeças sobre um único backbone: resultados iguais aos dos modelos separados."""
+    print("\n=== Testando Cabeças sobre um Backbone ===")
+
+    try:
+        import tempfile
+        import torch
+        from torchvision import models
+        import numpy as np
+        import model_bundle
+        from multi_head import MultiHeadClassifier
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            torch.manual_seed(0)
+            state_dict = models.mobilenet_v2(weights=None, num_classes=2).state_dict()
+            paths = {}
+            for model_id, num_classes in {"base": 2, "cruzeiro": 3, "projeto": 5}.items():
+                heads = dict(state_dict)
+                heads["classifier.1.weight"] = torch.randn(num_classes, 1280) * 0.05
+                heads["classifier.1.bias"] = torch.randn(num_classes)
+                paths[model_id] = os.path.join(tmp_dir, model_id + ".safetensors")
+                model_bundle.save_bundle(heads, paths[model_id], [f"{model_id}_{i}" for i in range(num_classes)],
+                                         [224, 224])
+            other_path = os.path.join(tmp_dir, "outro.safetensors")
+            model_bundle.save_bundle(models.mobilenet_v2(weights=None, num_classes=4).state_dict(), other_path,
+                                     list("wxyz"), [224, 224])
+
+            multi = MultiHeadClassifier(PlanktonClassifierPyTorch(model_path=paths["base"], input_mode="uint8",
+                                                                  cache_max_bytes=0))
+            for model_id, path in paths.items():
+                multi.add_head(model_id, path)
+            try:
+                multi.add_head("outro", other_path)
+                print("❌ Modelo com outro backbone deveria ser recusado")
+                return False
+            except ValueError:
+                pass
+
+            # Lote misto: RGB e monocromática
+            rng = np.random.default_rng(0)
+            images = [rng.integers(0, 256, (260, 300, 3), dtype=np.uint8), rng.integers(0, 256, (260, 300), dtype=np.uint8)]
+            combined = multi.predict_batch(images, model_ids=["cruzeiro", "projeto"])
+            if sorted(combined[0]["heads"]) != ["cruzeiro", "projeto"]:
+                print(f"❌ Cabeças no resultado incorretas: {sorted(combined[0]['heads'])}")
+                return False
+            for model_id in ("cruzeiro", "projeto"):
+                separate = PlanktonClassifierPyTorch(model_path=paths[model_id], input_mode="uint8", cache_max_bytes=0)
+                for single, result in zip(separate.predict_batch(images), combined):
+                    head = result["heads"][model_id]
+                    diff = max(abs(single["all_predictions"][name] - head["all_predictions"][name])
+                               for name in single["all_predictions"])
+                    if head["predicted_class"] != single["predicted_class"] or diff > 1e-5:
+                        print(f"❌ Cabeça {model_id} divergiu do modelo separado (diferença {diff:.2e})")
+                        return False
+
+        stats = multi.get_stats()
+        print(f"✅ {len(stats['heads'])} cabeças sobre um backbone ({stats['head_bytes'] / 1024:.0f}KB de pesos extras), "
+              f"resultados iguais aos dos modelos separados")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste das cabeças sobre um backbone: {e}")
+        return False
+
 def test_flask_server():
     """Testa o servidor Flask."""
     print("\n=== Testando Servidor Flask ===")
@@ -53,6 +1107,15 @@ def test_flask_server():
     server_url = "http://localhost:5000"
     
     try:
+        # O modelo carrega em segundo plano: aguarda a prontidão antes de testar as rotas
+        print("🔍 Aguardando /readyz...")
+        for _ in range(60):
+            response = requests.get(f"{server_url}/readyz", timeout=10)
+            if response.status_code == 200 or not response.headers.get("Retry-After"):
+                break
+            time.sleep(float(response.headers["Retry-After"]))
+        print(f"✅ Prontidão: {response.json().get('phase')}")
+
         # Testa endpoint de status
         print("🔍 Testando endpoint /status...")
         response = requests.get(f"{server_url}/status", timeout=10)
@@ -96,6 +1159,36 @@ def test_flask_server():
                 else:
                     print(f"❌ Erro HTTP na predição: {response.status_code}")
                     return False
+
+                # Mesma imagem como corpo binário, sem multipart
+                with open(test_image, "rb") as f:
+                    response = requests.post(f"{server_url}/predict_raw", data=f.read(), timeout=30,
+                                             headers={"Content-Type": "application/octet-stream"})
+                if response.status_code != 200 or \
+                        response.json()["prediction"]["predicted_class"] != prediction["predicted_class"]:
+                    print(f"❌ /predict_raw divergiu de /predict: {response.status_code} {response.text[:200]}")
+                    return False
+                print("✅ /predict_raw retornou a mesma classe")
+
+                # Lote com a imagem de teste e um arquivo inválido: uma linha por imagem e o resumo
+                with open(test_image, "rb") as f:
+                    files = [("files", ("a.jpg", f.read())), ("files", ("b.jpg", b"invalido" * 20))]
+                response = requests.post(f"{server_url}/predict_batch", files=files, timeout=60)
+                lines = [json.loads(line) for line in response.text.splitlines()]
+                if response.status_code != 200 or len(lines) != 3 or \
+                        lines[0].get("prediction", {}).get("predicted_class") != prediction["predicted_class"] or \
+                        lines[1]["success"] or lines[2]["summary"]["failed"] != 1:
+                    print(f"❌ /predict_batch incorreto: {response.status_code} {response.text[:300]}")
+                    return False
+                print("✅ /predict_batch respondeu uma linha por imagem")
+
+                # Manifestos nunca leem arquivos fora de PLANKTON_JOBS_DATA_ROOT (sem ele, são recusados)
+                response = requests.post(f"{server_url}/jobs", json={"paths": ["/etc/passwd", "../../etc/hostname"]},
+                                         timeout=10)
+                if response.status_code not in (400, 403):
+                    print(f"❌ /jobs aceitou um manifesto fora do diretório de dados: {response.status_code}")
+                    return False
+                print(f"✅ Manifesto fora do diretório de dados recusado ({response.status_code})")
             else:
                 print(f"⚠️ Imagem de teste não encontrada: {test_image}")
             
@@ -114,6 +1207,128 @@ def test_flask_server():
         print(f"❌ Erro no teste do servidor: {e}")
         return False
 
+def test_batch_upload():
+    """Testa a leitura incremental dos envios de /predict_batch: multipart com arquivos e um .zip."""
+    print("\n=== Testando Envio em Lote ===")
+
+    try:
+        import io
+        import zipfile
+        import batch_upload
+        from werkzeug.datastructures import FileStorage
+        from werkzeug.test import encode_multipart
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as f:
+            f.writestr("estacao/roi_2.jpg", b"2" * 300)
+            f.writestr("__MACOSX/estacao/._roi_2.jpg", b"x")
+            f.writestr("estacao/grande.jpg", b"g" * 2000)
+        files = [("roi_0.jpg", b"0" * 300), ("roi_1.png", b"1" * 300), ("estacao.zip", archive.getvalue())]
+        boundary, body = encode_multipart({"cruzeiro": "2025", "files": [
+            FileStorage(io.BytesIO(data), filename=name) for name, data in files]})
+
+        items = list(batch_upload.iter_multipart(batch_upload.spool_stream(io.BytesIO(body)), boundary, 1000,
+                                                 chunk_size=64))
+        names = [name for name, _, _ in items]
+        if names != ["roi_0.jpg", "roi_1.png", "estacao/roi_2.jpg", "estacao/grande.jpg"]:
+            print(f"❌ Itens lidos incorretos: {names}")
+            return False
+        if items[1][1] != b"1" * 300 or items[2][1] != b"2" * 300:
+            print("❌ Conteúdo dos arquivos corrompido na leitura incremental")
+            return False
+        if items[3][1] is not None or "muito grande" not in items[3][2]:
+            print(f"❌ Arquivo acima do limite deveria virar um item de erro: {items[3]}")
+            return False
+        try:
+            list(batch_upload.iter_archive(io.BytesIO(b"PK corrompido"), "zip", 1000))
+            print("❌ Arquivo compactado corrompido deveria levantar ValueError")
+            return False
+        except ValueError:
+            pass
+
+        print(f"✅ {len(items)} itens lidos do multipart (1 .zip aberto), arquivo grande recusado sem interromper o lote")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste do envio em lote: {e}")
+        return False
+
+def test_jobs():
+    """Testa os trabalhos assíncronos: prioridade de fundo no agendador, cancelamento e retomada após reinício."""
+    print("\n=== Testando Trabalhos Assíncronos ===")
+
+    try:
+        import tempfile
+        import numpy as np
+        import jobs
+        from inference_scheduler import BULK, MicroBatchScheduler
+
+        # Uma requisição interativa passa à frente do trabalho de fundo já enfileirado
+        classifier = PlanktonClassifierPyTorch(input_mode="uint8", cache_max_bytes=0)
+        tensor = classifier.preprocess_input(np.zeros((240, 320, 3), dtype=np.uint8))[0]
+        scheduler = MicroBatchScheduler(classifier, max_batch_size=4, max_wait_ms=5).start()
+        background = [scheduler.submit(tensor, priority=BULK) for _ in range(40)]
+        if not scheduler.submit(tensor).wait(30).get("success"):
+            print("❌ Requisição interativa falhou")
+            return False
+        ahead = sum(request.done() for request in background)
+        for request in background:
+            request.wait(30)
+        scheduler.stop()
+        if ahead > 8:
+            print(f"❌ A requisição interativa esperou {ahead} imagens de fundo")
+            return False
+
+        def run_fn(job, skip):
+            skips.append(skip)
+            for index in range(skip, job.total):
+                time.sleep(0.002)
+                yield {"index": index, "success": index % 10 != 0}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            skips = []
+            store = jobs.JobStore(tmp_dir)
+            runner = jobs.JobRunner(store, run_fn, commit_every=10).start()
+            job = store.create(jobs.MANIFEST, "[]", total=5000)
+            runner.notify()
+            while store.get(job.id).processed < 20:
+                time.sleep(0.01)
+            store.cancel(job.id)
+            while store.get(job.id).status == jobs.RUNNING:
+                time.sleep(0.01)
+            cancelled = store.get(job.id)
+            runner.stop()
+            if cancelled.status != jobs.CANCELLED or not 20 <= cancelled.processed < 5000:
+                print(f"❌ Cancelamento incorreto: {cancelled.to_dict()}")
+                return False
+
+            # Reinício no meio de um trabalho: 30 resultados gravados e o trabalho ainda "running" no banco
+            job = store.create(jobs.MANIFEST, "[]", total=100)
+            store.start(job.id)
+            store.add_results(job.id, [{"index": i, "success": True} for i in range(30)])
+            store.close()
+
+            skips = []
+            store = jobs.JobStore(tmp_dir)
+            runner = jobs.JobRunner(store, run_fn, commit_every=10).start()
+            while store.get(job.id).status in jobs.ACTIVE_STATES:
+                time.sleep(0.01)
+            runner.stop()
+            resumed = store.get(job.id)
+            indexes = [record["index"] for record in store.results(job.id, 0, 1000)]
+            store.close()
+            if resumed.status != jobs.COMPLETED or skips != [30] or indexes != list(range(100)):
+                print(f"❌ Retomada incorreta: {resumed.to_dict()} (pulou {skips})")
+                return False
+
+        print(f"✅ Interativa à frente de {40 - ahead} imagens de fundo; cancelamento após {cancelled.processed} "
+              f"imagens; retomada a partir da imagem 30")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no teste dos trabalhos: {e}")
+        return False
+
 def test_integration():
     """Testa a integração completa do sistema."""
     print("\n=== Teste de Integração Completa ===")
@@ -161,6 +1376,29 @@ def main():
     # Executa os testes
     tests = [
         ("Classificador de IA", test_plankton_classifier),
+        ("Predição em Lote", test_batch_prediction),
+        ("Agendador de Micro-Lotes", test_micro_batching),
+        ("Controle de Admissão", test_admission_control),
+        ("Prioridades de Inferência", test_priorities),
+        ("Saturação pelo Trabalho em Massa", test_bulk_saturation),
+        ("Coalescência de Requisições", test_single_flight),
+        ("Validação pelo Cabeçalho", test_image_validation),
+        ("Aquecimento do Modelo", test_warmup),
+        ("Orçamento de Threads", test_runtime_config),
+        ("Pool de Processos", test_inference_pool),
+        ("Cache de Predições", test_prediction_cache),
+        ("Entrada uint8", test_uint8_input),
+        ("Modelo Quantizado int8", test_quantized_model),
+        ("Carga do Checkpoint sem Rede", test_offline_checkpoint_load),
+        ("Pacote Único do Modelo", test_model_bundle),
+        ("Exportação TorchScript", test_torchscript_export),
+        ("Backend onnxruntime", test_onnx_backend),
+        ("Carregamento em Segundo Plano", test_background_loading),
+        ("Recarga do Modelo", test_model_reload),
+        ("Registro de Modelos", test_model_registry),
+        ("Cabeças sobre um Backbone", test_multi_head),
+        ("Envio em Lote", test_batch_upload),
+        ("Trabalhos Assíncronos", test_jobs),
         ("Integração do Sistema", test_integration),
         ("Servidor Flask", test_flask_server)
     ]